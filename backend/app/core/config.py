@@ -18,6 +18,11 @@ def parse_cors_origins(v: Union[str, List[str]]) -> List[str]:
     return v
 
 
+def parse_comma_list(v: str) -> List[str]:
+    """Split a comma-separated setting into its non-empty, stripped items."""
+    return [item.strip() for item in v.split(",") if item.strip()]
+
+
 class Settings(BaseSettings):
     """Application settings."""
     
@@ -29,6 +34,18 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./webstar.db"
+    # Read replicas for public GET endpoints (comma-separated; empty = primary only)
+    DATABASE_REPLICA_URLS: str = ""
+    DATABASE_REPLICA_HEALTH_INTERVAL: float = 5.0  # Seconds between replica health checks
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 30.0  # Replicas further behind are skipped
+    # Reads by a user who wrote within this many seconds go to the primary
+    DATABASE_REPLICA_STICKY_SECONDS: float = 10.0
+    # Tuned single-node SQLite profile (see app/db/sqlite_tuning.py)
+    SQLITE_TUNED: bool = False
+    SQLITE_READ_POOL_SIZE: int = 8  # query_only connections next to the single async writer
+    SQLITE_CACHE_SIZE_MB: int = 16  # Page cache per connection
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_MAINTENANCE_INTERVAL: int = 300  # Seconds between WAL checkpoints / PRAGMA optimize
     
     # JWT
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -79,6 +96,13 @@ class Settings(BaseSettings):
     R2_SECRET_ACCESS_KEY: str = ""  # R2 API Token Secret Key
     R2_BUCKET_NAME: str = "webstar-uploads"
     R2_PUBLIC_URL: str = ""  # e.g., "https://pub-xxx.r2.dev" or custom domain
+    # Multipart uploads for large files (bytes); parts upload in parallel
+    R2_MULTIPART_THRESHOLD: int = 64 * 1024 * 1024
+    R2_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # Min 5MB (S3/R2 limit)
+    R2_MULTIPART_CONCURRENCY: int = 4
+    R2_MULTIPART_PART_RETRIES: int = 3
+    # Direct-to-R2 uploads: lifetime of presigned PUT URLs and upload tokens (seconds)
+    R2_PRESIGNED_UPLOAD_EXPIRATION: int = 900
     
     # Legacy S3 settings (deprecated, kept for backwards compatibility)
     AWS_ACCESS_KEY_ID: str = ""
@@ -111,6 +135,10 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
     
+    # Largest request body accepted, checked against Content-Length and while
+    # streaming (0 = the largest media upload limit plus multipart overhead)
+    MAX_REQUEST_SIZE: int = 0
+    
     # Media Compression Settings (FFmpeg)
     # Enable/disable automatic media compression before R2 upload
     COMPRESSION_ENABLED: bool = True
@@ -121,6 +149,81 @@ class Settings(BaseSettings):
     COMPRESSION_AUDIO_PRESET: str = "standard"
     # Image output format: "webp" (best compression) or "jpeg" (max compatibility)
     COMPRESSION_IMAGE_FORMAT: str = "webp"
+    # Image codec: "pillow" (in-process, no FFmpeg spawn per image) or "ffmpeg".
+    # FFmpeg is still used for inputs Pillow cannot decode (e.g. animated GIFs).
+    COMPRESSION_IMAGE_BACKEND: str = "pillow"
+    # Images already this small (and within the preset's max dimension) are stored as-is
+    COMPRESSION_IMAGE_SKIP_MAX_BYTES: int = 512 * 1024
+    # Longer audio/video uploads are rejected after probing (0 = no limit)
+    MEDIA_MAX_VIDEO_DURATION_SECONDS: int = 1800
+    MEDIA_MAX_AUDIO_DURATION_SECONDS: int = 3600
+    # Waveform peaks computed for audio uploads (served inline with portfolio items; 0 = off)
+    AUDIO_WAVEFORM_PEAKS: int = 1000
+    # Max FFmpeg processes per worker process (0 = number of CPU cores)
+    COMPRESSION_MAX_CONCURRENCY: int = 0
+    # Per-type limits (0 = auto: half the cores for video, all cores for image/audio)
+    COMPRESSION_MAX_VIDEO_JOBS: int = 0
+    COMPRESSION_MAX_IMAGE_JOBS: int = 0
+    COMPRESSION_MAX_AUDIO_JOBS: int = 0
+    # Responsive image derivatives generated at upload time (srcset / thumbnails).
+    # Widths at or above the source width are skipped.
+    IMAGE_VARIANTS_ENABLED: bool = True
+    IMAGE_VARIANT_WIDTHS: List[int] = [320, 640, 1280, 1920]
+    # Variant used for thumbnail_url (smallest variant at least this wide)
+    IMAGE_THUMBNAIL_WIDTH: int = 640
+    # Reuse stored results for uploads whose bytes (SHA-256), preset and format match
+    MEDIA_DEDUP_ENABLED: bool = True
+    # HLS adaptive-bitrate ladder for uploaded videos (manifest stored as hls_url).
+    # Rungs are short-side sizes from 1080/720/480/360; larger than source are skipped.
+    VIDEO_HLS_ENABLED: bool = False
+    VIDEO_HLS_RUNGS: List[int] = [1080, 720, 480, 360]
+    VIDEO_HLS_SEGMENT_SECONDS: int = 4
+    
+    # Background transcode queue (async uploads)
+    # Spooled originals for queued jobs; must be on disk shared by API and worker
+    TRANSCODE_SPOOL_DIR: str = "transcode_spool"
+    # Run worker threads inside the API process (disable when using transcode_worker.py)
+    TRANSCODE_EMBEDDED_WORKER: bool = True
+    TRANSCODE_WORKER_CONCURRENCY: int = 2
+    TRANSCODE_POLL_INTERVAL_SECONDS: float = 2.0
+    # Jobs stuck in "processing" longer than this are requeued (worker crashed/restarted)
+    TRANSCODE_JOB_TIMEOUT_SECONDS: int = 900
+    TRANSCODE_MAX_ATTEMPTS: int = 3
+    
+    # Resumable chunked uploads (/api/uploads/sessions); partial files live in TRANSCODE_SPOOL_DIR
+    # Idle sessions expire after this long; expired partial files are garbage-collected
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 3600
+    # Chunk size suggested to clients
+    UPLOAD_SESSION_CHUNK_SIZE: int = 8 * 1024 * 1024
+    UPLOAD_SESSION_GC_INTERVAL_SECONDS: int = 300
+    
+    # Orphaned media garbage collection (media_gc.py)
+    # Unreferenced objects younger than this are kept (uploads not yet attached to a row)
+    MEDIA_GC_GRACE_HOURS: int = 72
+    # Keys per delete_objects call (S3/R2 maximum is 1000)
+    MEDIA_GC_BATCH_SIZE: int = 1000
+    
+    # Account deletion (runs on the transcode worker process, see TRANSCODE_EMBEDDED_WORKER)
+    # Rows deleted per statement/commit, so a large account never holds long locks
+    ACCOUNT_DELETION_BATCH_SIZE: int = 500
+    
+    # Local /uploads serving (no R2): browser cache lifetime for uuid-named media, 0 disables
+    UPLOADS_CACHE_MAX_AGE: int = 31536000
+    
+    # Event loop lag monitor (/api/diagnostics/loop and /api/diagnostics/metrics)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: int = 50
+    # Blocking longer than this is recorded as a stall, with the route and a stack sample
+    LOOP_STALL_THRESHOLD_MS: int = 200
+    LOOP_STALL_HISTORY: int = 100
+    # Bearer token for scraping /api/diagnostics/metrics without an admin login (empty = admin only)
+    METRICS_TOKEN: str = ""
+    
+    # Per-request SQL counts and time (Server-Timing header, /api/diagnostics/queries)
+    QUERY_STATS_ENABLED: bool = True
+    # Requests running more statements or spending longer in the database log a warning (0 = no limit)
+    QUERY_BUDGET_STATEMENTS: int = 25
+    QUERY_BUDGET_MS: int = 250
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -133,6 +236,11 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         """Get CORS origins as a list."""
         return parse_cors_origins(self.CORS_ORIGINS)
+    
+    @property
+    def database_replica_urls_list(self) -> List[str]:
+        """Get read replica URLs as a list."""
+        return parse_comma_list(self.DATABASE_REPLICA_URLS)
 
 
 settings = Settings()
@@ -0,0 +1,279 @@
+"""Event-loop lag monitoring with blocking-call attribution.
+
+Route handlers are async def, so any synchronous work inside them (a sync
+DB session, subprocess.run, bcrypt, smtplib) stops every other request on
+the worker until it returns. This module measures how long the loop is
+held and who held it:
+
+- A heartbeat task sleeps for LOOP_MONITOR_INTERVAL_MS and records how
+  late it wakes up. That lateness is the event-loop lag.
+- A watchdog thread checks the heartbeat. Once the loop has been blocked
+  for LOOP_STALL_THRESHOLD_MS, it samples the loop thread's stack and
+  walks it for the ASGI scope of the request being handled, which gives
+  the route, method and request id (see app.core.request_id).
+- When the loop resumes, the stall is recorded with its full duration:
+  per-route totals plus the most recent LOOP_STALL_HISTORY stalls with
+  their stack samples.
+
+Stats are per process. Read them from /api/diagnostics/loop (JSON) or
+/api/diagnostics/metrics (Prometheus text format).
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.core.request_id import get_request_id
+from app.core.route_labels import prometheus_label, route_label
+
+logger = logging.getLogger(__name__)
+
+# Lag histogram bucket upper bounds, in seconds
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Heartbeats kept for the lag percentiles (about a minute at 50ms)
+LAG_WINDOW = 1200
+
+# Innermost frames kept in a stall's stack sample
+STACK_DEPTH = 25
+
+NO_REQUEST = "(no request)"
+
+
+@dataclass
+class Stall:
+    """One period where the event loop was blocked past the threshold."""
+    started_at: str
+    duration_ms: float
+    route: str = NO_REQUEST
+    method: Optional[str] = None
+    path: Optional[str] = None
+    request_id: Optional[str] = None
+    stack: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RouteStalls:
+    stalls: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+def _find_request(frame) -> Optional[dict]:
+    """The innermost HTTP ASGI scope among the locals of a stack."""
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            return scope
+        frame = frame.f_back
+    return None
+
+
+class LoopLagMonitor:
+    """Heartbeat task plus watchdog thread for one event loop."""
+    
+    def __init__(self, interval: float, threshold: float, history: int):
+        self.interval = interval
+        self.threshold = threshold
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_tick = 0.0
+        # Stack/request sampled by the watchdog for the stall in progress
+        self._sampled_tick = None
+        self._sample: Optional[Stall] = None
+        
+        self.samples = 0
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self.buckets = [0] * (len(LAG_BUCKETS) + 1)
+        self.recent_lags = deque(maxlen=LAG_WINDOW)
+        self.stalls_total = 0
+        self.routes: Dict[str, RouteStalls] = {}
+        self.recent_stalls = deque(maxlen=history)
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self) -> None:
+        """Start monitoring the running event loop (call from the loop)."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started (interval {self.interval * 1000:.0f}ms, "
+            f"stall threshold {self.threshold * 1000:.0f}ms)"
+        )
+    
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+    
+    async def _heartbeat(self) -> None:
+        while True:
+            self._last_tick = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - self._last_tick - self.interval)
+            self._record(lag)
+    
+    def _watch(self) -> None:
+        check_every = min(self.interval, self.threshold / 4)
+        while not self._stop.wait(check_every):
+            tick = self._last_tick
+            blocked = time.perf_counter() - tick - self.interval
+            if blocked >= self.threshold and self._sampled_tick != tick:
+                sample = self._take_sample(self.interval + blocked)
+                with self._lock:
+                    self._sampled_tick = tick
+                    self._sample = sample
+    
+    def _take_sample(self, blocked_for: float) -> Stall:
+        """Stack and request of the loop thread, taken while it is blocked."""
+        stall = Stall(started_at=_started(blocked_for), duration_ms=0.0)
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return stall
+        try:
+            stall.stack = [line.rstrip() for line in traceback.format_stack(frame, limit=STACK_DEPTH)]
+            scope = _find_request(frame)
+        except Exception as e:
+            logger.debug(f"Could not sample event loop stack: {str(e)}")
+            return stall
+        if scope:
+            stall.route = route_label(scope)
+            stall.method = scope.get("method")
+            stall.path = scope.get("path")
+            stall.request_id = get_request_id(scope) or None
+        return stall
+    
+    def _record(self, lag: float) -> None:
+        self.samples += 1
+        self.lag_sum += lag
+        self.lag_max = max(self.lag_max, lag)
+        self.recent_lags.append(lag)
+        for i, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        
+        if lag < self.threshold:
+            return
+        with self._lock:
+            # The watchdog may have missed a stall that only just crossed the threshold
+            sample = self._sample if self._sampled_tick == self._last_tick else None
+            self._sampled_tick = None
+            self._sample = None
+        stall = sample or Stall(started_at=_started(lag + self.interval), duration_ms=0.0)
+        stall.duration_ms = round(lag * 1000, 1)
+        
+        self.stalls_total += 1
+        stats = self.routes.setdefault(stall.route, RouteStalls())
+        stats.stalls += 1
+        stats.total_seconds += lag
+        stats.max_seconds = max(stats.max_seconds, lag)
+        self.recent_stalls.append(stall)
+        
+        where = f"{stall.method} {stall.route}" if stall.method else stall.route
+        innermost = "\n".join(stall.stack[-5:])
+        logger.warning(
+            f"Event loop blocked for {stall.duration_ms:.0f}ms in {where} "
+            f"(request {stall.request_id or '-'})\n{innermost}"
+        )
+    
+    def snapshot(self) -> dict:
+        """Lag summary, per-route stall totals and recent stalls."""
+        lags = sorted(self.recent_lags)
+        
+        def pct(p: float) -> float:
+            if not lags:
+                return 0.0
+            return round(lags[min(len(lags) - 1, int(p / 100 * len(lags)))] * 1000, 1)
+        
+        routes = sorted(self.routes.items(), key=lambda item: item[1].total_seconds, reverse=True)
+        return {
+            "enabled": True,
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000),
+            "stall_threshold_ms": round(self.threshold * 1000),
+            "samples": self.samples,
+            "lag_ms": {
+                "mean": round(statistics.fmean(lags) * 1000, 1) if lags else 0.0,
+                "p50": pct(50),
+                "p99": pct(99),
+                "max_window": round(lags[-1] * 1000, 1) if lags else 0.0,
+                "max": round(self.lag_max * 1000, 1),
+            },
+            "stalls_total": self.stalls_total,
+            "routes": [
+                {
+                    "route": route,
+                    "stalls": stats.stalls,
+                    "total_ms": round(stats.total_seconds * 1000, 1),
+                    "max_ms": round(stats.max_seconds * 1000, 1),
+                }
+                for route, stats in routes
+            ],
+            "recent_stalls": [asdict(stall) for stall in reversed(self.recent_stalls)],
+        }
+    
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP webstar_event_loop_lag_seconds Event loop lag per heartbeat.",
+            "# TYPE webstar_event_loop_lag_seconds histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(LAG_BUCKETS, self.buckets):
+            cumulative += count
+            lines.append(f'webstar_event_loop_lag_seconds_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'webstar_event_loop_lag_seconds_bucket{{le="+Inf"}} {self.samples}')
+        lines.append(f"webstar_event_loop_lag_seconds_sum {self.lag_sum:.6f}")
+        lines.append(f"webstar_event_loop_lag_seconds_count {self.samples}")
+        
+        lines.append("# HELP webstar_event_loop_stalls_total Event loop stalls over the threshold, by route.")
+        lines.append("# TYPE webstar_event_loop_stalls_total counter")
+        for route, stats in self.routes.items():
+            lines.append(f'webstar_event_loop_stalls_total{{route="{prometheus_label(route)}"}} {stats.stalls}')
+        lines.append("# HELP webstar_event_loop_stall_seconds_total Time the event loop was stalled, by route.")
+        lines.append("# TYPE webstar_event_loop_stall_seconds_total counter")
+        for route, stats in self.routes.items():
+            lines.append(f'webstar_event_loop_stall_seconds_total{{route="{prometheus_label(route)}"}} {stats.total_seconds:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+def _started(seconds_ago: float) -> str:
+    return (datetime.utcnow() - timedelta(seconds=seconds_ago)).isoformat()
+
+
+loop_monitor = LoopLagMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    threshold=settings.LOOP_STALL_THRESHOLD_MS / 1000,
+    history=settings.LOOP_STALL_HISTORY,
+)
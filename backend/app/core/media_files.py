@@ -0,0 +1,61 @@
+"""Static file serving for the local /uploads mount.
+
+Uploaded media is stored under a fresh uuid4 name (HLS ladders live in a
+"<uuid>_hls/" folder) and is never rewritten in place, so a URL always
+refers to the same bytes. MediaStaticFiles lets browsers and CDNs keep
+those files for a year without revalidating:
+
+- Cache-Control is "public, max-age=<UPLOADS_CACHE_MAX_AGE>, immutable" on
+  200, 206 and 304 responses for uuid-named paths. Anything else under
+  uploads/ gets "no-cache" and is revalidated with its ETag.
+- ETags are strong validators (size + mtime), so If-None-Match answers
+  304 and If-Range works for resumed downloads and video seeking.
+- Range requests (single and multi-range, 416 for unsatisfiable ranges)
+  are answered by Starlette's FileResponse. Full-file responses go out via
+  the ASGI pathsend extension (sendfile) on servers that offer it; other
+  responses are streamed in MEDIA_CHUNK_SIZE reads instead of Starlette's
+  64KB default, which cuts the per-chunk threadpool overhead when a player
+  seeks through a large video.
+"""
+import re
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Read size for streamed (ranged, or no pathsend) responses
+MEDIA_CHUNK_SIZE = 1024 * 1024
+
+# Paths with a uuid in them were written once under a fresh name
+UUID_PATH = re.compile(r"[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}", re.IGNORECASE)
+
+
+class MediaFileResponse(FileResponse):
+    chunk_size = MEDIA_CHUNK_SIZE
+
+
+class MediaStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for immutable, uuid-named media."""
+    
+    def __init__(self, *args, max_age: int = 31536000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+    
+    def cache_control(self, path: str) -> Optional[str]:
+        """Cache-Control value for a path relative to the mount, or None to send none."""
+        if self.max_age <= 0:
+            return None
+        if UUID_PATH.search(path):
+            return f"public, max-age={self.max_age}, immutable"
+        return "no-cache"
+    
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = MediaFileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        cache_control = self.cache_control(self.get_path(scope))
+        if cache_control and status_code == 200:
+            response.headers["cache-control"] = cache_control
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,249 @@
+"""Per-request SQL statement counts and time, with a per-route budget.
+
+N+1 queries (one query per project, per item, per result) do not show up
+in tests against a small database, only as slow pages once accounts grow.
+This module counts them on every request:
+
+- SQLAlchemy cursor events on every engine (sync, async, replicas) add
+  each statement and its duration to the current request's totals, kept
+  in a context variable that QueryStatsMiddleware sets per request. Work
+  outside a request (background workers, scripts) is not counted.
+- The response gets a Server-Timing header ("db;dur=<ms>;desc=..."), so
+  the totals show up in the browser's network panel.
+- Each request logs one line with the request id, route, statement count
+  and DB time (also passed as log record extras). A request over
+  QUERY_BUDGET_STATEMENTS or QUERY_BUDGET_MS logs a warning naming its
+  most repeated statement, which is usually the N+1.
+- Per-route totals are kept per process. Read them from
+  /api/diagnostics/queries (JSON) or /api/diagnostics/metrics (Prometheus).
+
+Statement counts include everything the request ran, so a sync session
+opened in a threadpool dependency is counted too. Time is wall time spent
+waiting on the database, including time an async query waited for the
+event loop.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.request_id import get_request_id
+from app.core.route_labels import prometheus_label, route_label
+
+logger = logging.getLogger(__name__)
+
+SERVER_TIMING_HEADER = b"server-timing"
+
+# Characters of SQL kept when a statement is quoted in logs and diagnostics
+STATEMENT_PREVIEW = 300
+
+@dataclass
+class RequestQueries:
+    """Statements run while handling one request."""
+    statements: int = 0
+    seconds: float = 0.0
+    executions: Dict[str, int] = field(default_factory=dict)  # SQL -> times run
+    
+    def add(self, statement: str, seconds: float) -> None:
+        self.statements += 1
+        self.seconds += seconds
+        self.executions[statement] = self.executions.get(statement, 0) + 1
+    
+    def most_repeated(self) -> Optional[tuple]:
+        """(SQL, times run) of the statement run most often, None without queries."""
+        if not self.executions:
+            return None
+        return max(self.executions.items(), key=lambda item: item[1])
+
+
+@dataclass
+class RouteQueries:
+    requests: int = 0
+    statements: int = 0
+    seconds: float = 0.0
+    max_statements: int = 0
+    max_seconds: float = 0.0
+    over_budget: int = 0
+    # Most repeated statement of the request with the most statements
+    worst_statement: Optional[str] = None
+    worst_repeats: int = 0
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+def _preview(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > STATEMENT_PREVIEW:
+        return statement[:STATEMENT_PREVIEW] + "..."
+    return statement
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _current.get()
+    started = getattr(context, "_query_stats_started", None)
+    if queries is not None and started is not None:
+        queries.add(statement, time.perf_counter() - started)
+
+
+class QueryStats:
+    """Per-route statement and DB time totals, plus the budget check."""
+    
+    def __init__(self, budget_statements: int, budget_seconds: float):
+        self.budget_statements = budget_statements
+        self.budget_seconds = budget_seconds
+        self.installed = False
+        self.requests = 0
+        self.over_budget = 0
+        self.routes: Dict[str, RouteQueries] = {}
+    
+    def install(self) -> None:
+        """Count statements on every engine, including ones created later."""
+        if self.installed:
+            return
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        self.installed = True
+    
+    def over(self, queries: RequestQueries) -> bool:
+        return (
+            (self.budget_statements > 0 and queries.statements > self.budget_statements)
+            or (self.budget_seconds > 0 and queries.seconds > self.budget_seconds)
+        )
+    
+    def record(self, scope, status: Optional[int], queries: RequestQueries) -> None:
+        """Add a finished request to its route's totals and log it."""
+        route = route_label(scope)
+        over_budget = self.over(queries)
+        
+        self.requests += 1
+        stats = self.routes.setdefault(route, RouteQueries())
+        stats.requests += 1
+        stats.statements += queries.statements
+        stats.seconds += queries.seconds
+        stats.max_seconds = max(stats.max_seconds, queries.seconds)
+        repeated = queries.most_repeated()
+        if queries.statements > stats.max_statements:
+            stats.max_statements = queries.statements
+            if repeated:
+                stats.worst_statement = _preview(repeated[0])
+                stats.worst_repeats = repeated[1]
+        if over_budget:
+            self.over_budget += 1
+            stats.over_budget += 1
+        
+        request_id = get_request_id(scope) or "-"
+        method = scope.get("method")
+        db_ms = round(queries.seconds * 1000, 1)
+        extra = {
+            "request_id": request_id,
+            "method": method,
+            "route": route,
+            "status": status,
+            "db_queries": queries.statements,
+            "db_ms": db_ms,
+        }
+        summary = (
+            f"request_id={request_id} method={method} route={route} status={status} "
+            f"db_queries={queries.statements} db_ms={db_ms}"
+        )
+        if over_budget:
+            hint = f"\nMost repeated ({repeated[1]}x): {_preview(repeated[0])}" if repeated else ""
+            logger.warning(
+                f"Query budget exceeded ({self.budget_statements} statements / "
+                f"{self.budget_seconds * 1000:.0f}ms): {summary}{hint}",
+                extra=extra,
+            )
+        else:
+            logger.info(f"DB usage: {summary}", extra=extra)
+    
+    def snapshot(self) -> dict:
+        """Budget and per-route totals, heaviest routes first."""
+        routes = sorted(self.routes.items(), key=lambda item: item[1].seconds, reverse=True)
+        return {
+            "enabled": True,
+            "budget": {
+                "statements": self.budget_statements,
+                "ms": round(self.budget_seconds * 1000),
+            },
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "routes": [
+                {
+                    "route": route,
+                    "requests": stats.requests,
+                    "statements": stats.statements,
+                    "avg_statements": round(stats.statements / stats.requests, 1),
+                    "max_statements": stats.max_statements,
+                    "db_ms": round(stats.seconds * 1000, 1),
+                    "avg_db_ms": round(stats.seconds / stats.requests * 1000, 2),
+                    "max_db_ms": round(stats.max_seconds * 1000, 1),
+                    "over_budget": stats.over_budget,
+                    "worst_statement": stats.worst_statement,
+                    "worst_repeats": stats.worst_repeats,
+                }
+                for route, stats in routes
+            ],
+        }
+    
+    def prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        metrics = (
+            ("webstar_db_requests_total", "Requests with DB instrumentation, by route.", "requests", "{}"),
+            ("webstar_db_statements_total", "SQL statements run by requests, by route.", "statements", "{}"),
+            ("webstar_db_seconds_total", "Time requests spent waiting on SQL statements, by route.", "seconds", "{:.6f}"),
+            ("webstar_db_over_budget_total", "Requests over the query budget, by route.", "over_budget", "{}"),
+        )
+        for name, help_text, attr, fmt in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for route, stats in self.routes.items():
+                lines.append(f'{name}{{route="{prometheus_label(route)}"}} {fmt.format(getattr(stats, attr))}')
+        return "\n".join(lines) + "\n"
+
+
+query_stats = QueryStats(
+    budget_statements=settings.QUERY_BUDGET_STATEMENTS,
+    budget_seconds=settings.QUERY_BUDGET_MS / 1000,
+)
+
+
+class QueryStatsMiddleware:
+    """Collect a request's SQL totals, send them as Server-Timing and record them."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        queries = RequestQueries()
+        token = _current.set(queries)
+        status = None
+        
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = f'db;dur={queries.seconds * 1000:.1f};desc="{queries.statements} queries"'
+                message = {**message, "headers": [*message.get("headers", []), (SERVER_TIMING_HEADER, timing.encode())]}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            query_stats.record(scope, status or 500, queries)
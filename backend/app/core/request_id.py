@@ -0,0 +1,45 @@
+"""Request ids for correlating logs, diagnostics and client reports.
+
+Every HTTP request gets an id, taken from an incoming X-Request-ID header
+(e.g. set by the load balancer) or generated. It is stored in the ASGI
+scope as scope["request_id"] and echoed in the response's X-Request-ID
+header.
+"""
+import re
+import uuid
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Incoming ids are passed through only if they look like an id
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def get_request_id(scope) -> str:
+    """Request id of an ASGI scope, or "" outside RequestIdMiddleware."""
+    return scope.get("request_id", "")
+
+
+class RequestIdMiddleware:
+    """Assign scope["request_id"] and return it in the X-Request-ID header."""
+    
+    def __init__(self, app):
+        self.app = app
+        self.header = REQUEST_ID_HEADER.lower().encode()
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        incoming = dict(scope.get("headers", [])).get(self.header, b"").decode("latin-1")
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        scope["request_id"] = request_id
+        
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != self.header]
+                headers.append((self.header, request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        await self.app(scope, receive, send_with_id)
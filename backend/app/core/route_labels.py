@@ -0,0 +1,33 @@
+"""Route templates for labelling per-route stats.
+
+Per-route totals (app.core.query_stats, app.core.loop_monitor) are keyed
+by the matched route's path template, "/api/projects/{project_id}", never
+the raw path: one key per route keeps the totals and Prometheus label
+sets bounded however many ids and scanner URLs the server sees.
+"""
+
+# Key for requests that matched no route (404s, scanners, middleware rejections)
+UNMATCHED = "(unmatched)"
+
+
+def route_label(scope) -> str:
+    """Path template of the matched route, including its router's prefix."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return UNMATCHED
+    # scope["route"] is the route as its APIRouter declared it (no include
+    # prefix); the prefix is what precedes the route's part of the path
+    path = scope.get("path", "")
+    try:
+        own_part = route.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return template
+    if own_part and path.endswith(own_part):
+        return path[:len(path) - len(own_part)] + template
+    return template
+
+
+def prometheus_label(value: str) -> str:
+    """Value escaped for a double-quoted Prometheus label."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -6,7 +6,6 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlmodel import Session, select
 
 from app.core.config import settings
 
@@ -72,15 +71,10 @@ security = HTTPBearer()
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(lambda: None)  # Will be overridden in router
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """Get current authenticated user from JWT token."""
-    from app.db.models import User
-    from app.db.base import get_session
-    
-    if session is None:
-        session = next(get_session())
+    from app.deps.auth import load_user
     
     token = credentials.credentials
     
@@ -103,7 +97,7 @@ async def get_current_user(
     except (ValueError, JWTError):
         raise credentials_exception
     
-    user = session.get(User, user_id)
+    user = await load_user(user_id)
     if user is None or not user.is_active:
         raise credentials_exception
     
@@ -0,0 +1,271 @@
+"""Early rejection of oversized and spoofed uploads.
+
+Starlette parses a multipart body completely before the route handler
+runs, so size limits and magic-byte checks in the handler only fire after
+the whole file has been transferred. This ASGI middleware runs in front of
+the parser instead:
+
+- A Content-Length over the route's limit is rejected before any of the
+  body is read.
+- Bytes are counted as they stream in, so a missing or understated
+  Content-Length does not get past the limit either.
+- For upload routes, the multipart stream is parsed alongside the app's
+  own parser: the media_type field is picked up as it arrives, the file
+  part is held to that type's size limit, and its first SNIFF_BYTES are
+  checked with libmagic. A spoofed file fails as soon as its first few KB
+  arrive. Browsers send form fields in append order, so the file often
+  comes before media_type: until the type is known the file is held to
+  the largest limit and the sniff waits for the type field (or the end of
+  the body, which means the route's default type).
+
+It is a pure ASGI middleware (not BaseHTTPMiddleware) because it has to
+wrap the receive channel.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from app.services.file_validation import file_validator, SNIFF_BYTES
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    import multipart
+    from multipart.multipart import parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Longest form field value kept while looking for the media type
+MAX_FIELD_BYTES = 64
+
+
+@dataclass
+class UploadRule:
+    """Limits for one multipart upload route."""
+    limits: Dict[str, int]  # Max file bytes per media type
+    default_media_type: str = "photo"  # Used when the form has no media_type field
+    type_field: Optional[str] = "media_type"
+    file_field: str = "file"
+    
+    @property
+    def max_request_size(self) -> int:
+        return max(self.limits.values()) + MULTIPART_OVERHEAD
+
+
+class _Rejected(Exception):
+    """Raised into the app's receive() call to stop reading the body."""
+
+
+@dataclass
+class _MultipartInspector:
+    """Follows a multipart stream and checks the file part as it arrives."""
+    rule: UploadRule
+    media_type: Optional[str] = None
+    error: Optional[tuple] = None  # (status_code, detail)
+    _parser: object = None
+    _header_name: bytes = b""
+    _header_value: bytes = b""
+    _disposition: bytes = b""
+    _part_name: str = ""
+    _is_file: bool = False
+    _field_value: bytearray = field(default_factory=bytearray)
+    _file_bytes: int = 0
+    _header: bytearray = field(default_factory=bytearray)
+    _file_ended: bool = False
+    _sniffed: bool = False
+    
+    def start(self, boundary: bytes) -> None:
+        self._parser = multipart.MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+    
+    def feed(self, chunk: bytes) -> None:
+        if self._parser is None or self.error:
+            return
+        try:
+            self._parser.write(chunk)
+        except Exception:
+            # Malformed body: stop inspecting and let the app's parser report it
+            self._parser = None
+    
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+        self._part_name = ""
+        self._is_file = False
+        self._field_value = bytearray()
+    
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+    
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+    
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+    
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        self._part_name = options.get(b"name", b"").decode("latin-1")
+        self._is_file = b"filename" in options
+    
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._is_file:
+            if self._part_name == self.rule.type_field and len(self._field_value) < MAX_FIELD_BYTES:
+                self._field_value.extend(data[start:end])
+            return
+        if self._part_name != self.rule.file_field:
+            return
+        
+        self._file_bytes += end - start
+        if len(self._header) < SNIFF_BYTES:
+            self._header.extend(data[start:min(end, start + SNIFF_BYTES - len(self._header))])
+        self._check()
+    
+    def _on_part_end(self) -> None:
+        if not self._is_file and self._part_name == self.rule.type_field:
+            self.media_type = self._field_value.decode("latin-1").strip()
+            self._check()
+        elif self._is_file and self._part_name == self.rule.file_field:
+            self._file_ended = True
+            self._check()
+    
+    def _on_end(self) -> None:
+        # No type field in the form: the route falls back to its default type
+        if not self._sniffed and not self.error and self._file_bytes:
+            self._sniff()
+    
+    def _type_known(self) -> bool:
+        return self.rule.type_field is None or self.media_type is not None
+    
+    def _media_type(self) -> str:
+        return self.media_type or self.rule.default_media_type
+    
+    def _check(self) -> None:
+        """Size limit and sniff for what has arrived of the file so far."""
+        if self.error:
+            return
+        if self._type_known():
+            media_type = self._media_type()
+            limit = self.rule.limits.get(media_type)
+        else:
+            media_type, limit = None, max(self.rule.limits.values())
+        if limit is not None and self._file_bytes > limit:
+            self.error = (
+                413,
+                f"File too large. Maximum size for {media_type} is {limit / (1024 * 1024):.0f}MB"
+                if media_type else f"File too large. Maximum size is {limit / (1024 * 1024):.0f}MB"
+            )
+            return
+        
+        header_ready = len(self._header) >= SNIFF_BYTES or (self._file_ended and self._header)
+        if not self._sniffed and header_ready and self._type_known():
+            self._sniff()
+    
+    def _sniff(self) -> None:
+        self._sniffed = True
+        media_type = self._media_type()
+        if media_type not in self.rule.limits:
+            return  # Unknown type: the route rejects it with a proper message
+        is_valid, mime, error = file_validator.sniff_media_type(bytes(self._header), media_type)
+        if not is_valid:
+            self.error = (400, error)
+
+
+class UploadGuardMiddleware:
+    """Enforce request size limits and sniff uploads before the body is read."""
+    
+    def __init__(self, app, max_request_size: int, upload_rules: Optional[Dict[str, UploadRule]] = None):
+        self.app = app
+        self.max_request_size = max_request_size
+        self.upload_rules = upload_rules or {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        rule = self.upload_rules.get(scope["path"]) if scope["method"] == "POST" else None
+        limit = self.max_request_size
+        if rule:
+            limit = min(limit, rule.max_request_size)
+        
+        headers = {key.lower(): value for key, value in scope.get("headers", [])}
+        try:
+            content_length = int(headers.get(b"content-length", b""))
+        except ValueError:
+            content_length = None
+        if content_length is not None and content_length > limit:
+            logger.warning(f"Rejected {scope['path']}: Content-Length {content_length} exceeds {limit}")
+            await self._reject(send, 413, f"Request body too large. Maximum size is {limit / (1024 * 1024):.0f}MB")
+            return
+        
+        inspector = None
+        if rule:
+            content_type, params = parse_options_header(headers.get(b"content-type", b""))
+            if content_type == b"multipart/form-data" and b"boundary" in params:
+                inspector = _MultipartInspector(rule)
+                inspector.start(params[b"boundary"])
+        
+        received = 0
+        error = None
+        response_started = False
+        
+        async def guarded_receive():
+            nonlocal received, error
+            message = await receive()
+            if message["type"] == "http.request" and not error:
+                body = message.get("body", b"")
+                received += len(body)
+                if received > limit:
+                    error = (413, f"Request body too large. Maximum size is {limit / (1024 * 1024):.0f}MB")
+                elif inspector:
+                    inspector.feed(body)
+                    error = inspector.error
+                if error:
+                    logger.warning(f"Rejected {scope['path']} after {received} bytes: {error[1]}")
+                    raise _Rejected()
+            return message
+        
+        async def guarded_send(message):
+            nonlocal response_started
+            if error:
+                return  # Drop the app's response to the aborted body; ours is sent below
+            response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, guarded_receive, guarded_send)
+        except Exception:
+            if not error:
+                raise
+        if error and not response_started:
+            await self._reject(send, *error)
+    
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,9 +1,46 @@
-"""Database connection and session management."""
-from sqlmodel import SQLModel, create_engine, Session, text
+"""Database connection and session management.
+
+Two engines share DATABASE_URL: the sync engine behind get_session (most
+routers, workers and scripts) and an async engine behind
+get_async_session, using asyncpg for PostgreSQL and aiosqlite for SQLite.
+Handlers on the async engine await their queries instead of blocking the
+event loop for each round trip. Public read-only handlers can use
+app.db.replicas.get_async_read_session instead, which goes to a read
+replica when DATABASE_REPLICA_URLS is set.
+
+With SQLITE_TUNED on a SQLite DATABASE_URL, the engines come from
+app.db.sqlite_tuning: async_engine is then a single writer connection and
+async_read_engine a pool of read-only connections (otherwise both names
+are the same engine).
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.db.sqlite_tuning import (
+    SQLiteMaintenance, create_tuned_async_engines, create_tuned_engine, routing_session_class
+)
+
+SQLITE_TUNED = "sqlite" in settings.DATABASE_URL and settings.SQLITE_TUNED
+
+def set_sqlite_pragma(dbapi_conn, connection_record):
+    """Enable WAL mode programmatically for better concurrent read access."""
+    try:
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=20000")  # 20 second busy timeout
+        cursor.close()
+    except Exception:
+        # If WAL mode fails, continue without it (fallback to default)
+        pass
+
 
 # Create engine with improved SQLite concurrency handling
-if "sqlite" in settings.DATABASE_URL:
+if SQLITE_TUNED:
+    engine = create_tuned_engine(settings.DATABASE_URL)
+elif "sqlite" in settings.DATABASE_URL:
     connect_args = {
         "check_same_thread": False,
         "timeout": 20.0,  # 20 second timeout for database operations
@@ -16,18 +53,7 @@ if "sqlite" in settings.DATABASE_URL:
         connect_args=connect_args,
         pool_pre_ping=True,  # Verify connections before using
     )
-    # Enable WAL mode programmatically for better concurrent read access
-    from sqlalchemy import event
-    @event.listens_for(engine, "connect")
-    def set_sqlite_pragma(dbapi_conn, connection_record):
-        try:
-            cursor = dbapi_conn.cursor()
-            cursor.execute("PRAGMA journal_mode=WAL")
-            cursor.execute("PRAGMA busy_timeout=20000")  # 20 second busy timeout
-            cursor.close()
-        except Exception:
-            # If WAL mode fails, continue without it (fallback to default)
-            pass
+    event.listen(engine, "connect", set_sqlite_pragma)
 else:
     # PostgreSQL - production settings with proper pool management
     engine = create_engine(
@@ -42,119 +68,59 @@ else:
     )
 
 
+def async_database_url(url: str) -> str:
+    """Rewrite a sync DATABASE_URL for the matching async driver."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    query = dict(url.query)
+    # asyncpg takes "ssl" where libpq takes "sslmode"
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+
+def make_async_engine(url: str) -> AsyncEngine:
+    """Async engine for a sync-style database URL, pooled like the sync engine."""
+    if "sqlite" in url:
+        async_engine = create_async_engine(
+            async_database_url(url),
+            echo=settings.DEBUG,
+            connect_args={"timeout": 20.0},
+            pool_pre_ping=True,
+        )
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
+        return async_engine
+    return create_async_engine(
+        async_database_url(url),
+        echo=settings.DEBUG,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_reset_on_return="rollback",
+    )
+
+
+if SQLITE_TUNED:
+    async_engine, async_read_engine = create_tuned_async_engines(
+        async_database_url(settings.DATABASE_URL), settings.SQLITE_READ_POOL_SIZE
+    )
+    # Sessions read on the reader pool until they write
+    _async_session_args = {"sync_session_class": routing_session_class(async_engine, async_read_engine)}
+    sqlite_maintenance = SQLiteMaintenance(engine, settings.SQLITE_MAINTENANCE_INTERVAL)
+else:
+    async_engine = make_async_engine(settings.DATABASE_URL)
+    async_read_engine = async_engine
+    _async_session_args = {"bind": async_engine}
+    sqlite_maintenance = None
+
+
 def create_db_and_tables():
-    """Create database and tables."""
-    SQLModel.metadata.create_all(engine)
-    
-    # Run migration for location and banner_image columns
-    try:
-        with Session(engine) as session:
-            # Check if we're using PostgreSQL
-            if "postgresql" in settings.DATABASE_URL or "postgres" in settings.DATABASE_URL:
-                # Check if columns exist (PostgreSQL)
-                result = session.exec(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'profiles' AND column_name IN ('location', 'banner_image', 'bio')
-                """))
-                existing_columns = [row[0] for row in result.fetchall()]
-                
-                # Add location column if missing
-                if 'location' not in existing_columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN location VARCHAR"))
-                    session.commit()
-                    print("✅ Added location column to profiles table")
-                
-                # Add banner_image column if missing
-                if 'banner_image' not in existing_columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN banner_image VARCHAR"))
-                    session.commit()
-                    print("✅ Added banner_image column to profiles table")
-                
-                # Add bio column if missing
-                if 'bio' not in existing_columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN bio VARCHAR(200)"))
-                    session.commit()
-                    print("✅ Added bio column to profiles table")
-                
-                # Add portfolio_customization column if missing
-                result2 = session.exec(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'profiles' AND column_name = 'portfolio_customization'
-                """))
-                if not result2.fetchone():
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN portfolio_customization VARCHAR"))
-                    session.commit()
-                    print("✅ Added portfolio_customization column to profiles table")
-                
-                # Add action_buttons column if missing
-                result3 = session.exec(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'profiles' AND column_name = 'action_buttons'
-                """))
-                if not result3.fetchone():
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN action_buttons VARCHAR"))
-                    session.commit()
-                    print("✅ Added action_buttons column to profiles table")
-                
-                # Add file_size column to portfolio_items if missing
-                result_portfolio = session.exec(text("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'portfolio_items' AND column_name = 'file_size'
-                """))
-                if not result_portfolio.fetchone():
-                    session.exec(text("ALTER TABLE portfolio_items ADD COLUMN file_size INTEGER"))
-                    session.commit()
-                    print("✅ Added file_size column to portfolio_items table")
-            else:
-                # SQLite - check if columns exist
-                result = session.exec(text("PRAGMA table_info(profiles)"))
-                columns = [row[1] for row in result.fetchall()]
-                
-                # Add location column if missing
-                if 'location' not in columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN location TEXT"))
-                    session.commit()
-                    print("✅ Added location column to profiles table")
-                
-                # Add banner_image column if missing
-                if 'banner_image' not in columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN banner_image TEXT"))
-                    session.commit()
-                    print("✅ Added banner_image column to profiles table")
-                
-                # Add bio column if missing
-                if 'bio' not in columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN bio TEXT"))
-                    session.commit()
-                    print("✅ Added bio column to profiles table")
-                
-                # Add portfolio_customization column if missing
-                if 'portfolio_customization' not in columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN portfolio_customization TEXT"))
-                    session.commit()
-                    print("✅ Added portfolio_customization column to profiles table")
-                
-                # Add action_buttons column if missing
-                if 'action_buttons' not in columns:
-                    session.exec(text("ALTER TABLE profiles ADD COLUMN action_buttons TEXT"))
-                    session.commit()
-                    print("✅ Added action_buttons column to profiles table")
-                
-                # Add file_size column to portfolio_items if missing
-                result_portfolio = session.exec(text("PRAGMA table_info(portfolio_items)"))
-                portfolio_columns = [row[1] for row in result_portfolio.fetchall()]
-                if 'file_size' not in portfolio_columns:
-                    session.exec(text("ALTER TABLE portfolio_items ADD COLUMN file_size INTEGER"))
-                    session.commit()
-                    print("✅ Added file_size column to portfolio_items table")
-    except Exception as e:
-        print(f"Migration note: {e}")
-        # If it fails, columns might already exist
-        pass
+    """Bring the schema up to date (see app.db.migrations); one query when it already is."""
+    from app.db.migrations import run_migrations
+    run_migrations(engine)
 
 
 def get_session():
@@ -162,3 +128,9 @@ def get_session():
     with Session(engine) as session:
         yield session
 
+
+async def get_async_session():
+    """Get async database session (queries must be awaited)."""
+    async with AsyncSession(**_async_session_args, expire_on_commit=False) as session:
+        yield session
+
@@ -0,0 +1,5 @@
+"""Versioned schema migrations (see runner.py and versions.py)."""
+from app.db.migrations.runner import Migration, applied_migrations, current_version, run_migrations
+from app.db.migrations.versions import MIGRATIONS
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
@@ -0,0 +1,45 @@
+"""
+Apply pending schema migrations.
+
+The API and transcode_worker.py also migrate on startup; run this as a
+release/pre-deploy step to do it once before the new workers boot.
+
+Usage:
+    python -m app.db.migrations            # apply pending migrations
+    python -m app.db.migrations --status   # show applied and pending versions
+"""
+import argparse
+import logging
+import sys
+
+from app.db.base import engine
+from app.db.migrations import MIGRATIONS, SCHEMA_VERSION, applied_migrations, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="Show applied and pending migrations only")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
+    if args.status:
+        applied = {row["version"]: row for row in applied_migrations(engine)}
+        for migration in MIGRATIONS:
+            row = applied.get(migration.version)
+            state = f"applied {row['applied_at']}" if row else "pending"
+            print(f"{'✅' if row else '⏳'} {migration.version:>4}  {migration.name:<36} {state}")
+        return
+    
+    applied = run_migrations(engine)
+    if applied:
+        print(f"✅ Applied {len(applied)} migration(s); schema is at version {SCHEMA_VERSION}")
+    else:
+        print(f"✅ Schema is up to date (version {SCHEMA_VERSION})")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
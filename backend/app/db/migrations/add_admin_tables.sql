@@ -1,48 +0,0 @@
--- Admin Panel Database Migration
--- Run this on production PostgreSQL database
-
--- Add role columns to users table
-ALTER TABLE users ADD COLUMN IF NOT EXISTS role VARCHAR(20) DEFAULT 'user';
-ALTER TABLE users ADD COLUMN IF NOT EXISTS is_banned BOOLEAN DEFAULT FALSE;
-ALTER TABLE users ADD COLUMN IF NOT EXISTS banned_at TIMESTAMP;
-ALTER TABLE users ADD COLUMN IF NOT EXISTS banned_by INTEGER;
-ALTER TABLE users ADD COLUMN IF NOT EXISTS ban_reason TEXT;
-
--- Create reports table
-CREATE TABLE IF NOT EXISTS reports (
-    id SERIAL PRIMARY KEY,
-    reporter_id INTEGER REFERENCES users(id),
-    reporter_ip VARCHAR(45),
-    target_type VARCHAR(50) NOT NULL,
-    target_id INTEGER NOT NULL,
-    target_user_id INTEGER NOT NULL REFERENCES users(id),
-    reason VARCHAR(50) NOT NULL,
-    description TEXT,
-    status VARCHAR(20) DEFAULT 'pending',
-    resolved_by INTEGER REFERENCES users(id),
-    resolved_at TIMESTAMP,
-    resolution_note TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Create admin_actions audit table
-CREATE TABLE IF NOT EXISTS admin_actions (
-    id SERIAL PRIMARY KEY,
-    admin_id INTEGER NOT NULL REFERENCES users(id),
-    action_type VARCHAR(50) NOT NULL,
-    target_type VARCHAR(50) NOT NULL,
-    target_id INTEGER NOT NULL,
-    details TEXT,
-    ip_address VARCHAR(45),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-
--- Create indexes for performance
-CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
-CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status);
-CREATE INDEX IF NOT EXISTS idx_reports_target_type ON reports(target_type);
-CREATE INDEX IF NOT EXISTS idx_admin_actions_admin_id ON admin_actions(admin_id);
-CREATE INDEX IF NOT EXISTS idx_admin_actions_action_type ON admin_actions(action_type);
-
--- Verify migration
-SELECT 'Migration completed successfully!' as status;
@@ -0,0 +1,151 @@
+"""Idempotent schema operations for migrations.
+
+Each helper checks the live schema first, so a migration can run against a
+database that already has some of its changes (databases that predate the
+schema_migrations table, or a migration retried after a failure).
+"""
+from typing import Iterable, List, Optional, Set
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+
+def column_names(conn: Connection, table: str) -> Set[str]:
+    return {column["name"] for column in sa.inspect(conn).get_columns(table)}
+
+
+def _literal(conn: Connection, value) -> str:
+    if isinstance(value, bool):
+        if conn.dialect.name == "postgresql":
+            return "TRUE" if value else "FALSE"
+        return "1" if value else "0"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+def add_column(
+    conn: Connection,
+    table: str,
+    name: str,
+    type_: sa.types.TypeEngine,
+    default=None,
+    nullable: bool = True
+) -> bool:
+    """
+    ALTER TABLE ... ADD COLUMN unless the column exists.
+    
+    Args:
+        conn: Connection inside the migration's transaction
+        table: Table name
+        name: Column name
+        type_: SQLAlchemy type, compiled for the connection's dialect
+        default: Python value for the server default (also fills existing rows)
+        nullable: False adds NOT NULL (needs a default on non-empty tables)
+    
+    Returns:
+        True if the column was added
+    """
+    if name in column_names(conn, table):
+        return False
+    ddl = f"ALTER TABLE {table} ADD COLUMN {name} {type_.compile(dialect=conn.dialect)}"
+    if default is not None:
+        ddl += f" DEFAULT {_literal(conn, default)}"
+    if not nullable:
+        ddl += " NOT NULL"
+    conn.exec_driver_sql(ddl)
+    return True
+
+
+def create_index(
+    conn: Connection,
+    name: str,
+    table: str,
+    columns: List[str],
+    where: Optional[str] = None,
+    unique: bool = False,
+    concurrently: bool = False
+) -> None:
+    """
+    CREATE [UNIQUE] INDEX IF NOT EXISTS (partial when where is given).
+    
+    concurrently builds the index on PostgreSQL without blocking writes to
+    the table (CREATE INDEX CONCURRENTLY); the migration must then be
+    declared with transactional=False. A concurrent build that failed
+    leaves an invalid index behind, which is dropped and rebuilt here.
+    SQLite has no concurrent build and ignores the flag.
+    """
+    quote = conn.dialect.identifier_preparer.quote  # e.g. "order"
+    concurrently = concurrently and conn.dialect.name == "postgresql"
+    if concurrently:
+        invalid = conn.execute(
+            sa.text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+            ),
+            {"name": name}
+        ).first()
+        if invalid:
+            conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    ddl = (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} ({', '.join(quote(column) for column in columns)})"
+    )
+    if where:
+        ddl += f" WHERE {where}"
+    conn.exec_driver_sql(ddl)
+
+
+def drop_not_null(conn: Connection, model: type, column: str) -> bool:
+    """
+    Make a NOT NULL column nullable, matching the model's declaration.
+    
+    SQLite cannot alter a column, so there the table is rebuilt from the
+    model: renamed aside, recreated with its indexes, and its rows copied
+    over.
+    
+    Returns:
+        True if the column was changed
+    """
+    table = model.__tablename__
+    columns = {info["name"]: info for info in sa.inspect(conn).get_columns(table)}
+    if columns[column]["nullable"]:
+        return False
+    quote = conn.dialect.identifier_preparer.quote
+    if conn.dialect.name != "sqlite":
+        conn.exec_driver_sql(f"ALTER TABLE {table} ALTER COLUMN {quote(column)} DROP NOT NULL")
+        return True
+    
+    # Index names are global in SQLite; drop them so the new table can reuse them
+    for index in sa.inspect(conn).get_indexes(table):
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {quote(index['name'])}")
+    conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {table}_old")
+    create_tables(conn, [model])
+    copied = ", ".join(quote(name) for name in columns if name in model.__table__.columns)
+    conn.exec_driver_sql(f"INSERT INTO {table} ({copied}) SELECT {copied} FROM {table}_old")
+    conn.exec_driver_sql(f"DROP TABLE {table}_old")
+    return True
+
+
+def delete_duplicates(conn: Connection, table: str, columns: List[str]) -> int:
+    """
+    Delete rows repeating another row's values in columns, keeping the oldest (lowest id).
+    
+    Run before adding a unique index over the same columns.
+    
+    Returns:
+        Number of rows deleted
+    """
+    group_by = ", ".join(conn.dialect.identifier_preparer.quote(column) for column in columns)
+    result = conn.exec_driver_sql(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {group_by})"
+    )
+    return result.rowcount
+
+
+def create_tables(conn: Connection, models: Optional[Iterable[type]] = None) -> None:
+    """Create tables for the given models (all models if None) that do not exist yet."""
+    import app.db.models  # noqa: F401 - register every table on the metadata
+    tables = [model.__table__ for model in models] if models is not None else None
+    SQLModel.metadata.create_all(conn, tables=tables)
@@ -0,0 +1,159 @@
+"""Versioned schema migration runner.
+
+Applied versions are recorded in the schema_migrations table. A boot on an
+up-to-date database costs a single query (SELECT MAX(version)); only when
+that is behind the newest migration does the runner take the migration
+lock and apply what is missing, each migration in its own transaction
+together with its version row.
+
+Locking, so that several workers booting together apply each migration
+once:
+- PostgreSQL: a session-level advisory lock. Other workers block on it,
+  then find the versions already recorded and skip them.
+- SQLite: each migration runs in a BEGIN IMMEDIATE transaction (the
+  database write lock), and re-checks its version inside it.
+
+A migration declared with transactional=False runs on PostgreSQL on an
+autocommit connection instead, for statements that cannot run inside a
+transaction block (CREATE INDEX CONCURRENTLY, which builds an index
+without locking out writes while the app keeps serving). Each of its
+statements commits on its own, so it must be safe to re-run from the
+start after a failure; its version row is recorded once all of them have
+succeeded. On SQLite it runs in a transaction like any other.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key reserved for schema migrations
+MIGRATION_LOCK_KEY = 0x77656273746172  # "webstar"
+
+VERSION_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )
+"""
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    transactional: bool = True  # False: autocommit on PostgreSQL (see module docstring)
+
+
+def current_version(engine: Engine) -> int:
+    """Highest applied migration version, 0 if none (or no version table yet)."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return 0
+
+
+def applied_migrations(engine: Engine) -> List[dict]:
+    """Recorded migrations, oldest first."""
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT version, name, applied_at FROM schema_migrations ORDER BY version"
+            )).all()
+    except (OperationalError, ProgrammingError):
+        return []
+    return [{"version": row[0], "name": row[1], "applied_at": str(row[2])} for row in rows]
+
+
+@contextmanager
+def _migration_lock(conn: Connection):
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.rollback()
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.commit()
+
+
+def _begin(conn: Connection) -> None:
+    if conn.dialect.name == "sqlite":
+        # Take the write lock now rather than at the first write
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def run_migrations(engine: Engine, migrations: Optional[List[Migration]] = None) -> List[int]:
+    """
+    Apply pending migrations.
+    
+    Args:
+        engine: Sync engine
+        migrations: Defaults to versions.MIGRATIONS
+    
+    Returns:
+        Versions applied by this call (empty when already up to date)
+    
+    Raises:
+        Exception: from a failing migration, after rolling it back. Versions
+            applied before it stay recorded; the next run resumes from it.
+    """
+    if migrations is None:
+        from app.db.migrations.versions import MIGRATIONS
+        migrations = MIGRATIONS
+    
+    if current_version(engine) >= migrations[-1].version:
+        return []
+    
+    applied = []
+    with engine.connect() as conn:
+        with _migration_lock(conn):
+            conn.exec_driver_sql(VERSION_TABLE_DDL)
+            conn.commit()
+            
+            for migration in migrations:
+                _begin(conn)
+                done = conn.execute(
+                    text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                    {"version": migration.version}
+                ).first()
+                if done:
+                    conn.commit()
+                    continue
+                
+                started = time.perf_counter()
+                try:
+                    if migration.transactional or conn.dialect.name != "postgresql":
+                        migration.apply(conn)
+                    else:
+                        conn.commit()
+                        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as autocommit_conn:
+                            migration.apply(autocommit_conn)
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                        {"version": migration.version, "name": migration.name, "applied_at": datetime.utcnow()}
+                    )
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Migration {migration.version} ({migration.name}) failed: {str(e)}")
+                    raise
+                logger.info(
+                    f"Applied migration {migration.version} ({migration.name}) "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+                )
+                applied.append(migration.version)
+    return applied
@@ -0,0 +1,129 @@
+"""Schema migrations, in order.
+
+Append new migrations to MIGRATIONS with the next version number and never
+edit or renumber one that has shipped. Keep them idempotent (use the
+helpers in ops.py) and dialect-neutral, since the same list runs on
+PostgreSQL and SQLite.
+
+Version 1 creates every table from the current models, so on a fresh
+database the column migrations after it find nothing to do. A new table
+added later still needs a migration (create_tables(conn, [Model])) so that
+existing databases get it.
+
+Versions 2-5 replace the column probing create_db_and_tables used to do
+on every boot and the one-off scripts that lived in this directory.
+
+Indexes declared on the models (Field(index=True), __table_args__) are only
+created with their table, so adding one to an existing table also needs a
+migration, using the same index name. Build indexes on existing tables
+with create_index(..., concurrently=True) in a transactional=False
+migration, so PostgreSQL keeps accepting writes while they are built.
+"""
+import sqlalchemy as sa
+
+from app.db.migrations.ops import add_column, create_index, create_tables, delete_duplicates, drop_not_null
+from app.db.migrations.runner import Migration
+
+
+def create_initial_tables(conn):
+    create_tables(conn)
+
+
+def add_profile_columns(conn):
+    add_column(conn, "profiles", "location", sa.String())
+    add_column(conn, "profiles", "banner_image", sa.String())
+    add_column(conn, "profiles", "bio", sa.String(200))
+    add_column(conn, "profiles", "portfolio_customization", sa.String())
+    add_column(conn, "profiles", "action_buttons", sa.String())
+
+
+def add_admin_and_draft_columns(conn):
+    add_column(conn, "users", "role", sa.String(20), default="user")
+    add_column(conn, "users", "is_banned", sa.Boolean(), default=False)
+    add_column(conn, "users", "banned_at", sa.DateTime())
+    add_column(conn, "users", "banned_by", sa.Integer())
+    add_column(conn, "users", "ban_reason", sa.String())
+    create_index(conn, "ix_users_role", "users", ["role"])
+    
+    if add_column(conn, "users", "profile_setup_completed", sa.Boolean(), default=True, nullable=False):
+        # OAuth signups that still have a generated username have not finished setup
+        conn.execute(sa.text(
+            "UPDATE users SET profile_setup_completed = :done "
+            "WHERE oauth_provider = 'google' AND username LIKE 'temp_%'"
+        ), {"done": False})
+    
+    add_column(conn, "portfolio_items", "attachment_url", sa.String())
+    add_column(conn, "portfolio_items", "attachment_type", sa.String())
+    add_column(conn, "portfolio_items", "is_draft", sa.Boolean(), default=False)
+    add_column(conn, "portfolio_items", "text_content", sa.String(500))
+    add_column(conn, "projects", "is_draft", sa.Boolean(), default=False)
+    if conn.dialect.name == "postgresql":
+        # Text posts have no media URL (SQLite tables were created nullable)
+        conn.exec_driver_sql("ALTER TABLE portfolio_items ALTER COLUMN content_url DROP NOT NULL")
+
+
+def add_media_pipeline_columns(conn):
+    add_column(conn, "portfolio_items", "file_size", sa.Integer())
+    add_column(conn, "portfolio_items", "hls_url", sa.String())
+    add_column(conn, "transcode_jobs", "source_key", sa.String())
+    add_column(conn, "transcode_jobs", "result_hls_url", sa.String())
+    add_column(conn, "transcode_jobs", "sha256", sa.String())
+    add_column(conn, "transcode_jobs", "deduplicated", sa.Boolean(), default=False, nullable=False)
+    add_column(conn, "transcode_jobs", "processing_path", sa.String())
+    add_column(conn, "media_assets", "processing_path", sa.String())
+    add_column(conn, "media_assets", "duration", sa.Float())
+    add_column(conn, "media_assets", "processing_seconds", sa.Float())
+
+
+def add_waveform_columns(conn):
+    add_column(conn, "portfolio_items", "waveform", sa.String())
+    add_column(conn, "media_assets", "waveform", sa.String())
+    create_index(conn, "ix_media_assets_url", "media_assets", ["url"])
+
+
+def add_hot_path_indexes(conn):
+    # Runs outside a transaction on PostgreSQL so every index builds concurrently
+    # Owner's published/draft lists and the public profile, sorted by display order
+    create_index(conn, "ix_portfolio_items_user_draft_order", "portfolio_items", ["user_id", "is_draft", "order"], concurrently=True)
+    create_index(conn, "ix_projects_user_draft_order", "projects", ["user_id", "is_draft", "order"], concurrently=True)
+    create_index(conn, "ix_project_media_project_order", "project_media", ["project_id", "order"], concurrently=True)
+    # Analytics windows and the once-a-day view check
+    create_index(conn, "ix_profile_views_profile_created", "profile_views", ["profile_user_id", "created_at"], concurrently=True)
+    create_index(conn, "ix_profile_views_viewer_id", "profile_views", ["viewer_id"], concurrently=True)
+    create_index(conn, "ix_points_transactions_user_created", "points_transactions", ["user_id", "created_at"], concurrently=True)
+    create_index(conn, "ix_profile_likes_liked_profile_user_id", "profile_likes", ["liked_profile_user_id"], concurrently=True)
+    
+    # Concurrent like/block requests could insert the same pair twice. The
+    # recount does not depend on the DELETE's row count: without a transaction
+    # a retry after a failure between the two finds nothing left to delete
+    delete_duplicates(conn, "profile_likes", ["liker_id", "liked_profile_user_id"])
+    likes = "(SELECT COUNT(*) FROM profile_likes WHERE profile_likes.liked_profile_user_id = profiles.user_id)"
+    conn.exec_driver_sql(
+        f"UPDATE profiles SET profile_likes_count = {likes} WHERE profile_likes_count <> {likes}"
+    )
+    create_index(conn, "uq_profile_likes_pair", "profile_likes", ["liker_id", "liked_profile_user_id"], unique=True, concurrently=True)
+    delete_duplicates(conn, "blocked_users", ["blocker_id", "blocked_id"])
+    create_index(conn, "uq_blocked_users_pair", "blocked_users", ["blocker_id", "blocked_id"], unique=True, concurrently=True)
+
+
+def add_account_deletion_not_before(conn):
+    add_column(conn, "account_deletions", "not_before", sa.DateTime())
+
+
+def keep_deleted_admins_actions(conn):
+    # Deleting an admin's account keeps their audit log rows, detached from the user
+    from app.db.models import AdminAction
+    drop_not_null(conn, AdminAction, "admin_id")
+    add_column(conn, "admin_actions", "admin_username", sa.String())
+
+
+MIGRATIONS = [
+    Migration(1, "create_initial_tables", create_initial_tables),
+    Migration(2, "add_profile_columns", add_profile_columns),
+    Migration(3, "add_admin_and_draft_columns", add_admin_and_draft_columns),
+    Migration(4, "add_media_pipeline_columns", add_media_pipeline_columns),
+    Migration(5, "add_waveform_columns", add_waveform_columns),
+    Migration(6, "add_hot_path_indexes", add_hot_path_indexes, transactional=False),
+    Migration(7, "add_account_deletion_not_before", add_account_deletion_not_before),
+    Migration(8, "keep_deleted_admins_actions", keep_deleted_admins_actions),
+]
@@ -1,6 +1,7 @@
 """SQLModel database models for WebStar V1."""
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
@@ -122,6 +123,7 @@ class Profile(SQLModel, table=True):
 class PortfolioItem(SQLModel, table=True):
     """Portfolio item (photo, video, audio, text, or link)."""
     __tablename__ = "portfolio_items"
+    __table_args__ = (Index("ix_portfolio_items_user_draft_order", "user_id", "is_draft", "order"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", nullable=False)
@@ -130,6 +132,8 @@ class PortfolioItem(SQLModel, table=True):
     content_type: str = Field(nullable=False)  # 'photo', 'video', 'audio', 'text', 'link'
     content_url: Optional[str] = None  # Optional for text posts
     thumbnail_url: Optional[str] = None
+    hls_url: Optional[str] = None  # HLS master playlist for videos (content_url is the MP4 fallback)
+    waveform: Optional[str] = None  # Base64 peaks of the item's audio (content or attachment)
     title: Optional[str] = None
     description: Optional[str] = None
     text_content: Optional[str] = Field(default=None, max_length=500)  # For text posts
@@ -156,6 +160,7 @@ class PortfolioItem(SQLModel, table=True):
 class Project(SQLModel, table=True):
     """User project."""
     __tablename__ = "projects"
+    __table_args__ = (Index("ix_projects_user_draft_order", "user_id", "is_draft", "order"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", nullable=False)
@@ -184,6 +189,7 @@ class Project(SQLModel, table=True):
 class ProjectMedia(SQLModel, table=True):
     """Media items within a project."""
     __tablename__ = "project_media"
+    __table_args__ = (Index("ix_project_media_project_order", "project_id", "order"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     project_id: int = Field(foreign_key="projects.id", nullable=False)
@@ -196,13 +202,171 @@ class ProjectMedia(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class TranscodeJob(SQLModel, table=True):
+    """Queued media transcode for asynchronous uploads."""
+    __tablename__ = "transcode_jobs"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="users.id", nullable=False, index=True)
+    
+    # Status: queued, processing, completed, failed
+    status: str = Field(default="queued", index=True)
+    progress: int = Field(default=0)  # 0-100
+    
+    # Input
+    media_type: str = Field(nullable=False)  # 'photo', 'video', 'audio', 'pdf'
+    compress: bool = Field(default=True)
+    quality: str = Field(default="standard")
+    input_path: str = Field(nullable=False)  # Spooled original on local disk
+    source_key: Optional[str] = None  # R2 key of a direct upload; downloaded to input_path by the worker
+    original_filename: Optional[str] = None
+    content_type: Optional[str] = None
+    original_size: int = Field(default=0)
+    sha256: Optional[str] = None  # Digest computed while spooling; hashed by the worker otherwise
+    
+    # Row to fill in when the job finishes
+    target_type: Optional[str] = None  # 'portfolio_item' or 'project_media'
+    target_id: Optional[int] = None
+    
+    # Result
+    result_url: Optional[str] = None
+    result_filename: Optional[str] = None
+    result_hls_url: Optional[str] = None
+    final_size: Optional[int] = None
+    compression_applied: bool = Field(default=False)
+    deduplicated: bool = Field(default=False)  # Result reused from an identical earlier upload
+    processing_path: Optional[str] = None  # transcode, remux, skip, store or dedup
+    error: Optional[str] = None
+    
+    # Worker bookkeeping
+    attempts: int = Field(default=0)
+    worker_id: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class UploadSession(SQLModel, table=True):
+    """Resumable chunked upload: chunks are appended to a spool file until complete."""
+    __tablename__ = "upload_sessions"
+    
+    id: str = Field(primary_key=True)  # Random token used in the session URL
+    user_id: int = Field(foreign_key="users.id", nullable=False, index=True)
+    
+    # Status: active, completed
+    status: str = Field(default="active", index=True)
+    
+    # Declared upload
+    media_type: str = Field(nullable=False)  # 'photo', 'video', 'audio', 'pdf'
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size: int = Field(nullable=False)  # Total bytes the client will send
+    path: str = Field(nullable=False)  # Spool file in TRANSCODE_SPOOL_DIR; its length is the offset
+    validated: bool = Field(default=False)  # Magic bytes checked
+    
+    # Processing options applied on completion
+    compress: bool = Field(default=True)
+    quality: str = Field(default="standard")
+    async_processing: bool = Field(default=False)
+    target_type: Optional[str] = None
+    target_id: Optional[int] = None
+    
+    # Result
+    job_id: Optional[int] = None
+    result_url: Optional[str] = None
+    
+    expires_at: datetime = Field(nullable=False, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AccountDeletion(SQLModel, table=True):
+    """Queued deletion of a user account, its rows and its stored media."""
+    __tablename__ = "account_deletions"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # No foreign keys: the job outlives the user row it deletes
+    user_id: int = Field(nullable=False, index=True)
+    username: str = Field(nullable=False)
+    email: str = Field(nullable=False)
+    requested_by: Optional[int] = None  # Admin user ID
+    
+    # Status: queued, processing, completed, failed
+    status: str = Field(default="queued", index=True)
+    progress: int = Field(default=0)  # 0-100
+    step: Optional[str] = None  # Table (or "media") being processed
+    rows_deleted: int = Field(default=0)
+    media_urls: Optional[str] = None  # JSON list of upload URLs the account held
+    media_deleted: int = Field(default=0)
+    media_failed: int = Field(default=0)
+    error: Optional[str] = None
+    
+    # Worker bookkeeping
+    attempts: int = Field(default=0)
+    worker_id: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    not_before: Optional[datetime] = None  # A requeued job is not claimed again before this
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ImageVariant(SQLModel, table=True):
+    """Resized copy of an uploaded image, looked up by the original's URL."""
+    __tablename__ = "image_variants"
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source_url: str = Field(index=True, nullable=False)  # URL of the full-size image
+    width: int = Field(nullable=False)
+    url: str = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class MediaAsset(SQLModel, table=True):
+    """Processed upload keyed by the SHA-256 of its original bytes, for deduplication."""
+    __tablename__ = "media_assets"
+    __table_args__ = (UniqueConstraint("sha256", "preset", "format"),)
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    sha256: str = Field(index=True, nullable=False)  # Hex digest of the original upload
+    preset: str = Field(nullable=False)  # Compression preset, or 'none'
+    format: str = Field(nullable=False)  # Output format ('webp', 'mp4', 'm4a', ...) or 'original'
+    media_type: str = Field(nullable=False)  # 'photo', 'video', 'audio', 'pdf'
+    
+    # Stored object
+    url: str = Field(index=True, nullable=False)
+    filename: str = Field(nullable=False)
+    content_type: str = Field(nullable=False)
+    size: int = Field(default=0)
+    original_size: int = Field(default=0)
+    compression_applied: bool = Field(default=False)
+    hls_url: Optional[str] = None
+    waveform: Optional[str] = None  # Base64 peaks (audio), see media_assets.encode_waveform
+    
+    # How it was processed: transcode, remux, skip or store
+    processing_path: Optional[str] = None
+    duration: Optional[float] = None  # Media seconds (audio/video)
+    processing_seconds: Optional[float] = None  # Time spent in FFmpeg
+    
+    # Dedup statistics
+    hit_count: int = Field(default=0)
+    last_hit_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class ProfileLike(SQLModel, table=True):
     """Profile likes (next-gen alternative to Follow)."""
     __tablename__ = "profile_likes"
+    __table_args__ = (Index("uq_profile_likes_pair", "liker_id", "liked_profile_user_id", unique=True),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     liker_id: int = Field(foreign_key="users.id", nullable=False)
-    liked_profile_user_id: int = Field(foreign_key="users.id", nullable=False)
+    liked_profile_user_id: int = Field(foreign_key="users.id", nullable=False, index=True)
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -210,10 +374,11 @@ class ProfileLike(SQLModel, table=True):
 class ProfileView(SQLModel, table=True):
     """Track profile views for analytics."""
     __tablename__ = "profile_views"
+    __table_args__ = (Index("ix_profile_views_profile_created", "profile_user_id", "created_at"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     profile_user_id: int = Field(foreign_key="users.id", nullable=False)
-    viewer_id: Optional[int] = Field(foreign_key="users.id", nullable=True)  # None for anonymous
+    viewer_id: Optional[int] = Field(foreign_key="users.id", nullable=True, index=True)  # None for anonymous
     viewer_ip: Optional[str] = None
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -222,6 +387,7 @@ class ProfileView(SQLModel, table=True):
 class PointsTransaction(SQLModel, table=True):
     """Track points earned for gamification."""
     __tablename__ = "points_transactions"
+    __table_args__ = (Index("ix_points_transactions_user_created", "user_id", "created_at"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", nullable=False)
@@ -272,6 +438,7 @@ class PasswordResetToken(SQLModel, table=True):
 class BlockedUser(SQLModel, table=True):
     """Blocked users relationship."""
     __tablename__ = "blocked_users"
+    __table_args__ = (Index("uq_blocked_users_pair", "blocker_id", "blocked_id", unique=True),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     blocker_id: int = Field(foreign_key="users.id", nullable=False, index=True)
@@ -325,7 +492,9 @@ class AdminAction(SQLModel, table=True):
     __tablename__ = "admin_actions"
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    admin_id: int = Field(foreign_key="users.id", nullable=False, index=True)
+    # None once the admin's account is deleted; admin_username keeps who it was
+    admin_id: Optional[int] = Field(default=None, foreign_key="users.id", index=True)
+    admin_username: Optional[str] = None
     
     # Action details
     action_type: str = Field(nullable=False, index=True)  # 'ban', 'unban', 'delete', 'edit', 'role_change', 'resolve_report'
@@ -0,0 +1,186 @@
+"""Query-plan checks for the hot routes.
+
+HOT_ROUTES lists the requests behind every public profile read, owner
+list, analytics call, like and block. check_query_plans() sends each one
+to the app and EXPLAINs every SELECT the route actually runs, on the
+cursor about to run it and with the same parameters, so the check follows
+the routers' queries as they change instead of a copy of them. Any full
+table scan is reported: a dropped index or a query reshaped past its
+index shows up before it hits production traffic. Run it with
+check_query_plans.py, or as part of the tests (tests/test_query_plans.py).
+
+- SQLite: EXPLAIN QUERY PLAN; a "SCAN <table>" step is a full scan
+  ("SEARCH <table> USING INDEX" is what we want).
+- PostgreSQL: EXPLAIN with enable_seqscan off, so the planner picks an
+  index whenever one applies even on near-empty tables; a "Seq Scan on
+  <table>" that remains means no index can serve the query.
+
+The routes are requested as two seeded users (see seed_plan_users). The
+like and block routes are each undone by the next route so the check can
+run repeatedly, but it still writes rows: point it at a scratch database.
+"""
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.db.models import PortfolioItem, Profile, Project, ProjectMedia, User
+
+OWNER_USERNAME = "plan_check_owner"
+VISITOR_USERNAME = "plan_check_visitor"
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+@dataclass
+class HotRoute:
+    method: str
+    path: str  # Formatted with {username} (the owner) and {project_id}
+    as_user: Optional[str] = None  # "owner", "visitor" or None (anonymous)
+
+
+HOT_ROUTES = [
+    HotRoute("GET", "/api/portfolio/user/{username}"),
+    HotRoute("GET", "/api/portfolio/", "owner"),
+    HotRoute("GET", "/api/portfolio/drafts", "owner"),
+    HotRoute("GET", "/api/projects/user/{username}"),
+    HotRoute("GET", "/api/projects/", "owner"),
+    HotRoute("GET", "/api/projects/{project_id}/media"),
+    HotRoute("GET", "/api/profiles/{username}"),
+    HotRoute("GET", "/api/profiles/{username}", "visitor"),
+    HotRoute("GET", "/api/analytics/profile", "owner"),
+    HotRoute("GET", "/api/analytics/daily", "owner"),
+    HotRoute("GET", "/api/economy/history", "owner"),
+    HotRoute("POST", "/api/profiles/{username}/like", "visitor"),
+    HotRoute("DELETE", "/api/profiles/{username}/like", "visitor"),
+    HotRoute("POST", "/api/profiles/{username}/block", "visitor"),
+    HotRoute("DELETE", "/api/profiles/{username}/unblock", "visitor"),
+]
+
+
+@dataclass
+class PlanResult:
+    route: str  # "GET /api/..."
+    statement: str
+    plan: List[str]
+    full_scans: List[str] = field(default_factory=list)  # Tables scanned in full
+    
+    @property
+    def ok(self) -> bool:
+        return not self.full_scans
+
+
+def explain(dialect: str, cursor, statement: str, parameters) -> List[str]:
+    """Plan of a statement as text lines, run on a DBAPI cursor in the dialect's EXPLAIN format."""
+    if dialect == "sqlite":
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    if dialect == "postgresql":
+        cursor.execute("SET enable_seqscan = off")
+        try:
+            cursor.execute(f"EXPLAIN {statement}", parameters)
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.execute("RESET enable_seqscan")
+    raise ValueError(f"No query plan check for dialect {dialect}")
+
+
+def full_scans(dialect: str, plan: List[str]) -> List[str]:
+    """Tables a plan reads in full."""
+    pattern = _SQLITE_SCAN if dialect == "sqlite" else _POSTGRES_SCAN
+    tables = []
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group(1) not in tables:
+            tables.append(match.group(1))
+    return tables
+
+
+@contextmanager
+def record_plans(route: str, results: List[PlanResult]):
+    """EXPLAIN every SELECT any engine runs inside the block, appending to results."""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith("SELECT"):
+            return
+        dialect = conn.dialect.name
+        plan = explain(dialect, cursor, statement, parameters)
+        results.append(PlanResult(route, " ".join(statement.split()), plan, full_scans(dialect, plan)))
+    
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed_plan_users(engine: Engine) -> Dict[str, object]:
+    """
+    Owner (with a profile, portfolio item and project) and visitor accounts.
+    
+    Reuses the accounts if they exist, so the check can run repeatedly.
+    
+    Returns:
+        Dict with username, project_id and the owner/visitor user ids
+    """
+    with Session(engine) as session:
+        users = {}
+        for username in (OWNER_USERNAME, VISITOR_USERNAME):
+            user = session.exec(select(User).where(User.username == username)).first()
+            if not user:
+                user = User(email=f"{username}@example.com", username=username, hashed_password="!")
+                session.add(user)
+                session.flush()
+                session.add(Profile(user_id=user.id, display_name=username))
+            users[username] = user.id
+        owner_id = users[OWNER_USERNAME]
+        
+        project = session.exec(select(Project).where(Project.user_id == owner_id)).first()
+        if not project:
+            session.add(PortfolioItem(user_id=owner_id, content_type="text", title="Plan check"))
+            project = Project(user_id=owner_id, title="Plan check")
+            session.add(project)
+            session.flush()
+            session.add(ProjectMedia(project_id=project.id, media_url="/uploads/photo/plan.webp", media_type="photo"))
+        session.commit()
+        return {
+            "username": OWNER_USERNAME,
+            "project_id": project.id,
+            "owner": owner_id,
+            "visitor": users[VISITOR_USERNAME],
+        }
+
+
+def check_query_plans(client, engine: Engine, routes: Optional[List[HotRoute]] = None) -> List[PlanResult]:
+    """
+    Request every hot route and EXPLAIN the SELECTs it runs.
+    
+    Args:
+        client: TestClient of the app, started (so migrations have run) and without default auth headers
+        engine: Sync engine of the app's database (SQLite or PostgreSQL), to seed the accounts with
+        routes: Defaults to HOT_ROUTES
+    
+    Returns:
+        One result per statement run; result.ok is False where a table is scanned in full
+    
+    Raises:
+        RuntimeError: if a route does not answer with a success status
+    """
+    from app.core.security import create_access_token
+    
+    seeded = seed_plan_users(engine)
+    tokens = {who: create_access_token({"sub": str(seeded[who])}) for who in ("owner", "visitor")}
+    results: List[PlanResult] = []
+    for route in routes or HOT_ROUTES:
+        path = route.path.format(**seeded)
+        headers = {"Authorization": f"Bearer {tokens[route.as_user]}"} if route.as_user else {}
+        label = f"{route.method} {route.path}" + (f" as {route.as_user}" if route.as_user else "")
+        with record_plans(label, results):
+            response = client.request(route.method, path, headers=headers)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{label} answered {response.status_code}: {response.text[:200]}")
+    return results
@@ -0,0 +1,254 @@
+"""Read replica routing for public GET traffic.
+
+Public profile, portfolio and project reads are most of the traffic. With
+DATABASE_REPLICA_URLS set, handlers that depend on get_async_read_session
+run on a replica instead of competing with uploads and dashboard writes
+for the primary's pool:
+
+- Replicas are used round-robin, skipping any that failed their last
+  health check (run every DATABASE_REPLICA_HEALTH_INTERVAL seconds) or,
+  on PostgreSQL, replay more than DATABASE_REPLICA_MAX_LAG_SECONDS
+  behind. A connection error during a request also takes a replica out
+  until its next passing check. With none healthy, reads go to the primary.
+- Read-your-writes: a successful POST/PUT/PATCH/DELETE records the
+  caller's user id (from the bearer token), and that user's reads go to
+  the primary for DATABASE_REPLICA_STICKY_SECONDS so they see their own
+  change. This is per process, like the API itself (one uvicorn worker).
+
+A read session is for reads only. Handlers that also write (e.g. the
+profile view counter) do so on their own session on async_engine.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.security import decode_token
+from app.db.base import async_read_engine, make_async_engine
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Seconds a replica's replay is behind the primary (0 when caught up, or not a standby)
+POSTGRES_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@dataclass
+class Replica:
+    name: str  # URL without the password
+    engine: AsyncEngine
+    healthy: bool = False  # Until the first check passes
+    lag_seconds: Optional[float] = None
+    last_error: Optional[str] = None
+    checked_at: Optional[str] = None
+    reads: int = 0
+
+
+def token_user_id(authorization: str) -> Optional[int]:
+    """User id of a valid "Bearer <access token>" header value, else None."""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_token(token)
+    user_id = payload.get("sub") if payload else None
+    try:
+        return int(user_id) if user_id else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ReplicaRouter:
+    """Picks the engine for read-only sessions and health-checks the replicas."""
+    
+    def __init__(self, urls: List[str], health_interval: float, max_lag: float, sticky_seconds: float):
+        self.replicas = [
+            Replica(name=make_url(url).render_as_string(hide_password=True), engine=make_async_engine(url))
+            for url in urls
+        ]
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.primary_reads = 0
+        self._next = 0
+        self._recent_writers: Dict[int, float] = {}  # user id -> monotonic time the stickiness ends
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+    
+    def choose(self) -> Optional[Replica]:
+        """Next healthy replica in round-robin order, None if there is none."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        replica = healthy[self._next % len(healthy)]
+        self._next += 1
+        return replica
+    
+    def record_write(self, user_id: int) -> None:
+        """Send this user's reads to the primary for the next sticky_seconds."""
+        now = time.monotonic()
+        if len(self._recent_writers) > 10000:
+            self._recent_writers = {uid: until for uid, until in self._recent_writers.items() if until > now}
+        self._recent_writers[user_id] = now + self.sticky_seconds
+    
+    def sticks_to_primary(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        until = self._recent_writers.get(user_id)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._recent_writers.pop(user_id, None)
+            return False
+        return True
+    
+    def route(self, request: Request) -> Optional[Replica]:
+        """Replica to serve a read-only request from, None for the primary."""
+        if not self.enabled:
+            return None
+        replica = None
+        if not self.sticks_to_primary(token_user_id(request.headers.get("authorization", ""))):
+            replica = self.choose()
+        if replica:
+            replica.reads += 1
+        else:
+            self.primary_reads += 1
+        return replica
+    
+    def mark_failed(self, replica: Replica, error: Exception) -> None:
+        if replica.healthy:
+            logger.warning(f"Read replica {replica.name} marked unhealthy: {str(error)}")
+        replica.healthy = False
+        replica.last_error = str(error)
+    
+    async def _probe(self, replica: Replica) -> Optional[float]:
+        async with replica.engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                lag = (await conn.execute(text(POSTGRES_LAG_QUERY))).scalar()
+                return float(lag or 0)
+            await conn.execute(text("SELECT 1"))
+            return None
+    
+    async def check(self) -> None:
+        """Health-check every replica once."""
+        for replica in self.replicas:
+            replica.checked_at = datetime.utcnow().isoformat()
+            try:
+                lag = await asyncio.wait_for(self._probe(replica), timeout=max(1.0, self.health_interval))
+            except Exception as e:
+                self.mark_failed(replica, e if str(e) else TimeoutError("health check timed out"))
+                continue
+            replica.lag_seconds = lag
+            if lag is not None and lag > self.max_lag:
+                self.mark_failed(replica, RuntimeError(f"replication lag {lag:.1f}s"))
+                continue
+            if not replica.healthy:
+                logger.info(f"Read replica {replica.name} is healthy")
+            replica.healthy = True
+            replica.last_error = None
+    
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Read replica health check failed: {str(e)}")
+    
+    async def start(self) -> None:
+        """Check the replicas once, then keep checking them in the background."""
+        if not self.enabled or self._task:
+            return
+        await self.check()
+        self._task = asyncio.get_running_loop().create_task(self._health_loop())
+        healthy = sum(1 for replica in self.replicas if replica.healthy)
+        logger.info(f"Read replica routing started ({healthy}/{len(self.replicas)} replicas healthy)")
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+    
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "primary_reads": self.primary_reads,
+            "sticky_users": sum(1 for until in self._recent_writers.values() if until > time.monotonic()),
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag_seconds": replica.lag_seconds,
+                    "reads": replica.reads,
+                    "last_error": replica.last_error,
+                    "checked_at": replica.checked_at,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+replica_router = ReplicaRouter(
+    urls=settings.database_replica_urls_list,
+    health_interval=settings.DATABASE_REPLICA_HEALTH_INTERVAL,
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    sticky_seconds=settings.DATABASE_REPLICA_STICKY_SECONDS,
+)
+
+
+async def get_async_read_session(request: Request):
+    """Get async session for read-only handlers: a replica, or the primary (see module docstring)."""
+    replica = replica_router.route(request)
+    async with AsyncSession(replica.engine if replica else async_read_engine, expire_on_commit=False) as session:
+        try:
+            yield session
+        except (OperationalError, InterfaceError) as e:
+            if replica:
+                replica_router.mark_failed(replica, e)
+            raise
+
+
+class ReplicaStickinessMiddleware:
+    """Record successful writes so the writer's next reads go to the primary."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in UNSAFE_METHODS or not replica_router.enabled:
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_and_record(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                authorization = dict(scope.get("headers", [])).get(b"authorization", b"").decode("latin-1")
+                user_id = token_user_id(authorization)
+                if user_id is not None:
+                    replica_router.record_write(user_id)
+            await send(message)
+        
+        await self.app(scope, receive, send_and_record)
@@ -0,0 +1,190 @@
+"""Tuned SQLite profile for single-node deployments (SQLITE_TUNED=True).
+
+SQLite allows one writer at a time. With the default setup every pooled
+connection may write, so concurrent writers sleep in SQLite's busy handler
+(or fail outright when a read transaction tries to upgrade to a write).
+The tuned profile gets more out of one box:
+
+- Pragmas on every connection: WAL, synchronous=NORMAL (safe with WAL; a
+  power cut can lose the last commits but cannot corrupt the file), a
+  page cache of SQLITE_CACHE_SIZE_MB per connection, SQLITE_MMAP_SIZE_MB
+  of memory-mapped reads, in-memory temp tables, and a cap on the WAL
+  file size left behind after a checkpoint.
+- Async sessions get a single writer connection, whose transactions start
+  with BEGIN IMMEDIATE, plus a pool of SQLITE_READ_POOL_SIZE query_only
+  readers. get_async_session reads on the readers until its first write,
+  then stays on the writer until the transaction ends, so async writers
+  queue for the writer connection instead of fighting over the file lock.
+  Readers on the same file see every committed write (there is no lag as
+  with replicas).
+- SQLiteMaintenance runs PRAGMA wal_checkpoint(PASSIVE) and PRAGMA
+  optimize every SQLITE_MAINTENANCE_INTERVAL seconds, and a TRUNCATE
+  checkpoint at shutdown, so a steady read load cannot keep the WAL
+  growing.
+
+The sync engine (get_session, background workers, scripts) keeps its pool:
+request handlers hold a sync session while worker threads open their own,
+so a single sync connection could deadlock. It uses the same pragmas,
+without pool_pre_ping (a local file connection cannot go stale).
+
+Compare the profiles with benchmarks/sqlite_profile.py.
+"""
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Size the WAL file is truncated to after a checkpoint
+WAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+# Session.info key set once a routed session has used the writer
+_ON_WRITER = "sqlite_on_writer"
+
+
+def set_tuned_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=20000")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_MB * 1024}")  # Negative = KiB
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA journal_size_limit={WAL_SIZE_LIMIT}")
+    cursor.close()
+
+
+def _set_query_only(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _disable_driver_transactions(dbapi_conn, connection_record):
+    # Let the begin event below emit BEGIN instead of the sqlite3 module
+    dbapi_conn.isolation_level = None
+
+
+def _begin_immediate(conn):
+    # Take the write lock up front; a deferred transaction that reads first
+    # can fail with SQLITE_BUSY when it upgrades, busy_timeout or not
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def create_tuned_engine(url: str) -> Engine:
+    """Sync engine with the tuned pragmas (default pool)."""
+    engine = create_engine(
+        url,
+        echo=settings.DEBUG,
+        connect_args={"check_same_thread": False, "timeout": 20.0},
+    )
+    event.listen(engine, "connect", set_tuned_pragmas)
+    return engine
+
+
+def create_tuned_async_engines(async_url: str, read_pool_size: int) -> Tuple[AsyncEngine, AsyncEngine]:
+    """
+    The single writer connection and the query_only reader pool.
+    
+    Args:
+        async_url: sqlite+aiosqlite URL
+        read_pool_size: Reader connections
+    
+    Returns:
+        (writer, reader) async engines
+    """
+    writer = create_async_engine(
+        async_url,
+        echo=settings.DEBUG,
+        connect_args={"timeout": 20.0},
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=30,
+    )
+    event.listen(writer.sync_engine, "connect", set_tuned_pragmas)
+    event.listen(writer.sync_engine, "connect", _disable_driver_transactions)
+    event.listen(writer.sync_engine, "begin", _begin_immediate)
+    
+    reader = create_async_engine(
+        async_url,
+        echo=settings.DEBUG,
+        connect_args={"timeout": 20.0},
+        pool_size=read_pool_size,
+        max_overflow=0,
+        pool_timeout=30,
+    )
+    event.listen(reader.sync_engine, "connect", set_tuned_pragmas)
+    event.listen(reader.sync_engine, "connect", _set_query_only)
+    return writer, reader
+
+
+def routing_session_class(writer: AsyncEngine, reader: AsyncEngine) -> type:
+    """
+    Session class for AsyncSession(sync_session_class=...) that reads on the
+    reader pool until the first flush or DML statement, then uses the writer
+    for the rest of the transaction.
+    """
+    class RoutingSession(Session):
+        def get_bind(self, mapper=None, clause=None, **kw):
+            if self.info.get(_ON_WRITER) or self._flushing or (clause is not None and clause.is_dml):
+                self.info[_ON_WRITER] = True
+                return writer.sync_engine
+            return reader.sync_engine
+    
+    @event.listens_for(RoutingSession, "after_transaction_end")
+    def back_to_readers(session, transaction):
+        if transaction.parent is None:
+            session.info.pop(_ON_WRITER, None)
+    
+    return RoutingSession
+
+
+class SQLiteMaintenance:
+    """Periodic WAL checkpoint and PRAGMA optimize on the sync engine."""
+    
+    def __init__(self, engine: Engine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+    
+    def run_once(self, checkpoint: str = "PASSIVE") -> dict:
+        """Checkpoint the WAL and let SQLite refresh its statistics where needed."""
+        with self.engine.connect() as conn:
+            # optimize first: the statistics it writes go through the WAL too
+            conn.exec_driver_sql("PRAGMA optimize")
+            busy, wal_pages, checkpointed = conn.exec_driver_sql(f"PRAGMA wal_checkpoint({checkpoint})").one()
+        if busy:
+            logger.info(f"SQLite WAL checkpoint ({checkpoint}) could not finish: {checkpointed}/{wal_pages} pages")
+        return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed_pages": checkpointed}
+    
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"SQLite maintenance failed: {str(e)}")
+    
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.run_once, "TRUNCATE")
+        except Exception as e:
+            logger.warning(f"Final SQLite WAL checkpoint failed: {str(e)}")
@@ -2,18 +2,29 @@
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.base import get_session
+from app.db.base import async_read_engine
 from app.db.models import User
 from app.core.security import decode_token
 
 security = HTTPBearer()
 
 
+async def load_user(user_id: int) -> Optional[User]:
+    """
+    Load a user on a short-lived async session.
+    
+    The session is closed before returning, so the connection goes back to
+    the pool right away and the user comes back detached. Handlers can
+    still pass it to their own session (session.add(current_user)).
+    """
+    async with AsyncSession(async_read_engine) as session:
+        return await session.get(User, user_id)
+
+
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_session)
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> User:
     """Get current authenticated user."""
     token = credentials.credentials
@@ -33,7 +44,7 @@ async def get_current_user(
         )
     
     # Get user from database
-    user = session.get(User, int(user_id))
+    user = await load_user(int(user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -50,7 +61,6 @@ async def get_current_user(
 
 
 async def get_current_user_optional(
-    session: Session = Depends(get_session),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
 ) -> Optional[User]:
     """Get current user if authenticated, None otherwise."""
@@ -66,6 +76,6 @@ async def get_current_user_optional(
     if not user_id:
         return None
     
-    user = session.get(User, int(user_id))
+    user = await load_user(int(user_id))
     return user if user and user.is_active else None
 
@@ -2,7 +2,6 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from pathlib import Path
@@ -12,7 +11,15 @@ import secrets
 import time
 
 from app.core.config import settings
-from app.db.base import create_db_and_tables
+from app.core.upload_guard import UploadGuardMiddleware
+from app.core.media_files import MediaStaticFiles
+from app.core.loop_monitor import loop_monitor
+from app.core.request_id import RequestIdMiddleware
+from app.core.query_stats import query_stats, QueryStatsMiddleware
+from app.db.base import create_db_and_tables, async_engine, async_read_engine, sqlite_maintenance
+from app.db.replicas import replica_router, ReplicaStickinessMiddleware
+from app.services.transcode_queue import transcode_worker_pool
+from app.services.account_deletion import account_deletion_worker
 from app.routers import auth, onboarding, profile, portfolio, projects, economy, analytics, uploads, app_settings, diagnostics, admin, quiz
 from app.core.exception_handlers import (
     sqlalchemy_exception_handler,
@@ -26,9 +33,25 @@ async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup
     create_db_and_tables()
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    await replica_router.start()
+    if sqlite_maintenance:
+        sqlite_maintenance.start()
+    if settings.TRANSCODE_EMBEDDED_WORKER:
+        transcode_worker_pool.start()
+        account_deletion_worker.start()
     yield
     # Shutdown
-    pass
+    transcode_worker_pool.stop(timeout=5)
+    account_deletion_worker.stop(timeout=5)
+    await loop_monitor.stop()
+    await replica_router.stop()
+    if sqlite_maintenance:
+        await sqlite_maintenance.stop()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 
 # Security Headers Middleware
@@ -66,6 +89,16 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Reject oversized/spoofed request bodies before they are read. Added first so
+# it runs innermost: CORS and security headers still apply to its 413/400s.
+app.add_middleware(
+    UploadGuardMiddleware,
+    max_request_size=settings.MAX_REQUEST_SIZE or max(
+        rule.max_request_size for rule in uploads.UPLOAD_RULES.values()
+    ),
+    upload_rules=uploads.UPLOAD_RULES
+)
+
 # Add Security Headers Middleware
 app.add_middleware(SecurityHeadersMiddleware)
 
@@ -145,6 +178,18 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Successful writes pin the writer's next reads to the primary (see app.db.replicas)
+app.add_middleware(ReplicaStickinessMiddleware)
+
+# Count each request's SQL statements (Server-Timing header, per-route stats).
+# Inside RequestIdMiddleware so its logs carry the request id.
+if settings.QUERY_STATS_ENABLED:
+    query_stats.install()
+    app.add_middleware(QueryStatsMiddleware)
+
+# Outermost, so every response (including CORS preflights) carries X-Request-ID
+app.add_middleware(RequestIdMiddleware)
+
 # Log startup info
 logger.info(f"Starting WebStar API in {settings.ENVIRONMENT} mode")
 logger.info(f"CORS enabled for origins: {cors_origins_list}")
@@ -184,7 +229,11 @@ async def root():
 # Mount static files for uploads
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+app.mount(
+    "/uploads",
+    MediaStaticFiles(directory=str(UPLOAD_DIR), max_age=settings.UPLOADS_CACHE_MAX_AGE),
+    name="uploads"
+)
 
 
 # Register exception handlers
@@ -7,9 +7,12 @@ from sqlmodel import Session, select, func
 from pydantic import BaseModel
 
 from app.db.base import get_session
-from app.db.models import User, Profile, PortfolioItem, Project, Report, AdminAction, OnboardingProgress, UserPoints
+from app.db.models import (
+    User, Profile, PortfolioItem, Project, Report, AdminAction, OnboardingProgress, UserPoints, AccountDeletion
+)
 from app.core.security import get_current_user
 from app.core.config import settings
+from app.services.account_deletion import account_deletion_service
 
 router = APIRouter()
 
@@ -250,11 +253,11 @@ async def get_admin_activity(
     
     result = []
     for action in actions:
-        admin = session.get(User, action.admin_id)
+        admin = session.get(User, action.admin_id) if action.admin_id else None
         result.append({
             "id": action.id,
             "admin_id": action.admin_id,
-            "admin_username": admin.username if admin else "Unknown",
+            "admin_username": admin.username if admin else action.admin_username or "Unknown",
             "action_type": action.action_type,
             "target_type": action.target_type,
             "target_id": action.target_id,
@@ -466,13 +469,36 @@ async def unban_user(
     return {"message": f"User {user.username} has been unbanned"}
 
 
-@router.delete("/users/{user_id}")
+def _deletion_response(job: AccountDeletion) -> dict:
+    return {
+        "job_id": job.id,
+        "user_id": job.user_id,
+        "username": job.username,
+        "status": job.status,
+        "progress": job.progress,
+        "step": job.step,
+        "rows_deleted": job.rows_deleted,
+        "media_deleted": job.media_deleted,
+        "media_failed": job.media_failed,
+        "error": job.error,
+        "status_url": f"/api/admin/account-deletions/{job.id}",
+        "created_at": job.created_at.isoformat(),
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
+    }
+
+
+@router.delete("/users/{user_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user(
     user_id: int,
     session: Session = Depends(get_session),
     current_user: User = Depends(require_super_admin)
 ):
-    """Delete a user account (super_admin only)."""
+    """
+    Delete a user account (super_admin only).
+    
+    The account is deactivated immediately; its rows and stored media are
+    deleted in the background. Poll status_url for progress.
+    """
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -484,24 +510,28 @@ async def delete_user(
         )
     
     username = user.username
-    
-    # Delete related records
-    session.exec(select(Profile).where(Profile.user_id == user_id)).delete()
-    session.exec(select(PortfolioItem).where(PortfolioItem.user_id == user_id)).delete()
-    session.exec(select(Project).where(Project.user_id == user_id)).delete()
-    session.exec(select(OnboardingProgress).where(OnboardingProgress.user_id == user_id)).delete()
-    session.exec(select(UserPoints).where(UserPoints.user_id == user_id)).delete()
-    
-    session.delete(user)
-    session.commit()
+    job = account_deletion_service.enqueue(session, user, requested_by=current_user.id)
     
     # Log action
     log_admin_action(
         session, current_user.id, "delete", "user", user_id,
-        {"username": username}
+        {"username": username, "deletion_job_id": job.id}
     )
     
-    return {"message": f"User {username} has been deleted"}
+    return {"message": f"User {username} is being deleted", **_deletion_response(job)}
+
+
+@router.get("/account-deletions/{job_id}")
+async def get_account_deletion(
+    job_id: int,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_super_admin)
+):
+    """Status and progress of an account deletion (super_admin only)."""
+    job = session.get(AccountDeletion, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Account deletion not found")
+    return _deletion_response(job)
 
 
 # ============================================================================
@@ -1,7 +1,9 @@
 """Authentication router."""
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy import func
 from datetime import datetime, timedelta
 from google.oauth2 import id_token
@@ -11,7 +13,7 @@ from starlette.requests import Request
 import secrets
 
 from fastapi import Body
-from app.db.base import get_session
+from app.db.base import get_session, get_async_session
 from app.db.models import User, Profile, OnboardingProgress, UserPoints, EmailVerification, PasswordResetToken
 from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token, decode_token, get_current_user
 from app.core.config import settings
@@ -107,11 +109,11 @@ async def dev_magic_login(
 
 
 @router.get("/check-email/{email}")
-async def check_email_exists(email: str, session: Session = Depends(get_session)):
+async def check_email_exists(email: str, session: AsyncSession = Depends(get_async_session)):
     """Check if email exists in the system (case-insensitive)."""
     from urllib.parse import unquote
     decoded_email = unquote(email).lower()
-    user = session.exec(select(User).where(func.lower(User.email) == decoded_email)).first()
+    user = (await session.exec(select(User).where(func.lower(User.email) == decoded_email))).first()
     return {"exists": user is not None}
 
 
@@ -290,7 +292,7 @@ async def register(request: Request, user_data: UserRegister, session: Session =
 
 
 @router.get("/check-username/{username}")
-async def check_username(username: str, session: Session = Depends(get_session)):
+async def check_username(username: str, session: AsyncSession = Depends(get_async_session)):
     """Check if a username is available."""
     import re
     
@@ -299,7 +301,7 @@ async def check_username(username: str, session: Session = Depends(get_session))
         return {"available": False, "reason": "Username must be 3-20 characters with only letters, numbers, and underscores"}
     
     # Check if username exists
-    existing = session.exec(select(User).where(User.username == username.lower())).first()
+    existing = (await session.exec(select(User).where(User.username == username.lower()))).first()
     
     return {"available": existing is None}
 
@@ -535,25 +537,25 @@ async def google_callback(request: Request, session: Session = Depends(get_sessi
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(request: Request, user_data: UserLogin, session: Session = Depends(get_session)):
+async def login(request: Request, user_data: UserLogin, session: AsyncSession = Depends(get_async_session)):
     """Login with email or username and password. May require 2FA verification."""
     # Rate limit: 5 login attempts per minute per IP
     rate_limiter.require_rate_limit(request, max_requests=5, window_seconds=60)
     
     # Find user by email OR username
-    user = session.exec(
+    user = (await session.exec(
         select(User).where(
             (User.email == user_data.email) | (User.username == user_data.email)
         )
-    ).first()
+    )).first()
     if not user or not user.hashed_password:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password"
         )
     
-    # Verify password
-    if not verify_password(user_data.password, user.hashed_password):
+    # Verify password (bcrypt is CPU-bound, keep it off the event loop)
+    if not await run_in_threadpool(verify_password, user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -581,7 +583,7 @@ async def login(request: Request, user_data: UserLogin, session: Session = Depen
     
     # No 2FA required, proceed with normal login
     # Check onboarding status
-    onboarding = session.exec(select(OnboardingProgress).where(OnboardingProgress.user_id == user.id)).first()
+    onboarding = (await session.exec(select(OnboardingProgress).where(OnboardingProgress.user_id == user.id))).first()
     onboarding_completed = onboarding.completed if onboarding else False
     
     # Create tokens
@@ -792,7 +794,7 @@ async def verify_2fa_login(
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh(token_data: RefreshToken, session: Session = Depends(get_session)):
+async def refresh(token_data: RefreshToken, session: AsyncSession = Depends(get_async_session)):
     """Refresh access token."""
     payload = decode_token(token_data.refresh_token)
     if not payload or payload.get("type") != "refresh":
@@ -809,7 +811,7 @@ async def refresh(token_data: RefreshToken, session: Session = Depends(get_sessi
         )
     
     # Get user
-    user = session.get(User, int(user_id))
+    user = await session.get(User, int(user_id))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -817,7 +819,7 @@ async def refresh(token_data: RefreshToken, session: Session = Depends(get_sessi
         )
     
     # Check onboarding status
-    onboarding = session.exec(select(OnboardingProgress).where(OnboardingProgress.user_id == user.id)).first()
+    onboarding = (await session.exec(select(OnboardingProgress).where(OnboardingProgress.user_id == user.id))).first()
     onboarding_completed = onboarding.completed if onboarding else False
     
     # Create new tokens
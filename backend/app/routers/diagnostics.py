@@ -1,11 +1,19 @@
 """Storage diagnostic endpoint for troubleshooting."""
+import secrets
+from typing import Optional
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session
 from app.services.s3_service import s3_service
 from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.query_stats import query_stats
 from app.deps.auth import get_current_user
 from app.db.models import User
 from app.db.base import get_session
+from app.db.replicas import replica_router
+from app.services.media_assets import get_dedup_stats, get_processing_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +31,17 @@ def require_admin_or_dev(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+async def require_metrics_access(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+):
+    """Accept METRICS_TOKEN (for scrapers) or the same access as the other diagnostics."""
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if settings.METRICS_TOKEN and secrets.compare_digest(credentials.credentials, settings.METRICS_TOKEN):
+        return None
+    return require_admin_or_dev(await get_current_user(credentials))
+
+
 @router.get("/storage/status")
 async def storage_status(current_user: User = Depends(require_admin_or_dev)):
     """Check Cloudflare R2 / S3 storage configuration status. Requires admin in production."""
@@ -138,3 +157,55 @@ async def env_check(current_user: User = Depends(require_admin_or_dev)):
         "storage_bucket": settings.R2_BUCKET_NAME or settings.S3_BUCKET_NAME,
         "storage_public_url": settings.R2_PUBLIC_URL if using_r2 else None,
     }
+
+
+@router.get("/media/dedup")
+async def media_dedup_stats(
+    current_user: User = Depends(require_admin_or_dev),
+    session: Session = Depends(get_session)
+):
+    """Upload deduplication hit rate and bytes saved. Requires admin in production."""
+    return {
+        "enabled": settings.MEDIA_DEDUP_ENABLED,
+        **get_dedup_stats(session)
+    }
+
+
+@router.get("/media/processing")
+async def media_processing_stats(
+    current_user: User = Depends(require_admin_or_dev),
+    session: Session = Depends(get_session)
+):
+    """Uploads per processing path (transcode, remux, skip, store) and estimated CPU time saved. Requires admin in production."""
+    return get_processing_stats(session)
+
+
+@router.get("/loop")
+async def event_loop_stats(current_user: User = Depends(require_admin_or_dev)):
+    """Event loop lag and the routes that blocked it, with stack samples. Requires admin in production."""
+    if not settings.LOOP_MONITOR_ENABLED:
+        return {"enabled": False}
+    return loop_monitor.snapshot()
+
+
+@router.get("/replicas")
+async def read_replica_stats(current_user: User = Depends(require_admin_or_dev)):
+    """Read replica health, lag and how many reads each served. Requires admin in production."""
+    return replica_router.snapshot()
+
+
+@router.get("/queries")
+async def query_stats_by_route(current_user: User = Depends(require_admin_or_dev)):
+    """SQL statements and DB time per route, with the query budget and worst offenders. Requires admin in production."""
+    if not settings.QUERY_STATS_ENABLED:
+        return {"enabled": False}
+    return query_stats.snapshot()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(_: None = Depends(require_metrics_access)):
+    """Prometheus metrics (event loop lag and stalls, SQL statements and time by route). Requires admin in production, or METRICS_TOKEN."""
+    body = loop_monitor.prometheus()
+    if settings.QUERY_STATS_ENABLED:
+        body += query_stats.prometheus()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -2,10 +2,14 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db.base import get_session
+from app.db.replicas import get_async_read_session
 from app.db.models import User, PortfolioItem, Profile, PointsTransaction, UserPoints
 from app.deps.auth import get_current_user
+from app.services.image_variants import get_srcset, get_srcsets, get_srcsets_async, get_thumbnail
+from app.services.media_assets import decode_waveform, get_waveform
 from app.schemas.portfolio import (
     PortfolioItemCreate, PortfolioItemUpdate, PortfolioItemResponse
 )
@@ -13,6 +17,15 @@ from app.schemas.portfolio import (
 router = APIRouter()
 
 
+def _audio_waveform(session: Session, item: PortfolioItem):
+    """Stored peaks of the item's audio: the content itself, else an audio attachment."""
+    if item.content_type == "audio":
+        return get_waveform(session, item.content_url)
+    if item.attachment_type == "audio":
+        return get_waveform(session, item.attachment_url)
+    return None
+
+
 async def award_points_portfolio(user_id: int, action: str, points: int, session: Session):
     """Award points for portfolio actions."""
     transaction = PointsTransaction(
@@ -44,6 +57,7 @@ async def get_portfolio_items(
         .where(PortfolioItem.is_draft == False)
         .order_by(PortfolioItem.order)
     ).all()
+    srcsets = get_srcsets(session, [item.content_url for item in items])
     
     return [
         PortfolioItemResponse(
@@ -62,7 +76,10 @@ async def get_portfolio_items(
             views=item.views,
             clicks=item.clicks,
             order=item.order,
-            created_at=item.created_at.isoformat()
+            created_at=item.created_at.isoformat(),
+            variants=srcsets.get(item.content_url),
+            hls_url=item.hls_url,
+            waveform=decode_waveform(item.waveform)
         )
         for item in items
     ]
@@ -80,6 +97,7 @@ async def get_draft_items(
         .where(PortfolioItem.is_draft == True)
         .order_by(PortfolioItem.created_at.desc())
     ).all()
+    srcsets = get_srcsets(session, [item.content_url for item in items])
     
     return [
         PortfolioItemResponse(
@@ -98,7 +116,10 @@ async def get_draft_items(
             views=item.views,
             clicks=item.clicks,
             order=item.order,
-            created_at=item.created_at.isoformat()
+            created_at=item.created_at.isoformat(),
+            variants=srcsets.get(item.content_url),
+            hls_url=item.hls_url,
+            waveform=decode_waveform(item.waveform)
         )
         for item in items
     ]
@@ -107,19 +128,20 @@ async def get_draft_items(
 @router.get("/user/{username}", response_model=List[PortfolioItemResponse])
 async def get_user_portfolio_items(
     username: str,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get another user's portfolio items (public, excluding drafts)."""
-    user = session.exec(select(User).where(User.username == username)).first()
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    items = session.exec(
+    items = (await session.exec(
         select(PortfolioItem)
         .where(PortfolioItem.user_id == user.id)
         .where(PortfolioItem.is_draft == False)
         .order_by(PortfolioItem.order)
-    ).all()
+    )).all()
+    srcsets = await get_srcsets_async(session, [item.content_url for item in items])
     
     return [
         PortfolioItemResponse(
@@ -138,7 +160,10 @@ async def get_user_portfolio_items(
             views=item.views,
             clicks=item.clicks,
             order=item.order,
-            created_at=item.created_at.isoformat()
+            created_at=item.created_at.isoformat(),
+            variants=srcsets.get(item.content_url),
+            hls_url=item.hls_url,
+            waveform=decode_waveform(item.waveform)
         )
         for item in items
     ]
@@ -179,12 +204,13 @@ async def create_portfolio_item(
     ).all()
     order = len(max_order)
     
-    # Create item
+    # Create item (thumbnail defaults to a resized variant of uploaded photos)
     item = PortfolioItem(
         user_id=current_user.id,
         content_type=item_data.content_type,
         content_url=item_data.content_url,
-        thumbnail_url=item_data.thumbnail_url,
+        thumbnail_url=item_data.thumbnail_url or get_thumbnail(session, item_data.content_url),
+        hls_url=item_data.hls_url,
         title=item_data.title,
         description=item_data.description,
         text_content=item_data.text_content,
@@ -194,6 +220,7 @@ async def create_portfolio_item(
         is_draft=item_data.is_draft,
         order=order
     )
+    item.waveform = _audio_waveform(session, item)
     session.add(item)
     session.commit()
     session.refresh(item)
@@ -228,7 +255,10 @@ async def create_portfolio_item(
         views=item.views,
         clicks=item.clicks,
         order=item.order,
-        created_at=item.created_at.isoformat()
+        created_at=item.created_at.isoformat(),
+        variants=get_srcset(session, item.content_url),
+        hls_url=item.hls_url,
+        waveform=decode_waveform(item.waveform)
     )
 
 
@@ -257,9 +287,16 @@ async def update_portfolio_item(
     if updates.content_type is not None:
         item.content_type = updates.content_type
     if updates.content_url is not None:
+        if updates.content_url != item.content_url:
+            item.hls_url = None  # The old ladder belongs to the previous video
         item.content_url = updates.content_url
+        thumbnail_url = get_thumbnail(session, updates.content_url)
+        if thumbnail_url:
+            item.thumbnail_url = thumbnail_url
     if updates.thumbnail_url is not None:
         item.thumbnail_url = updates.thumbnail_url
+    if updates.hls_url is not None:
+        item.hls_url = updates.hls_url
     if updates.text_content is not None:
         item.text_content = updates.text_content
     if updates.aspect_ratio is not None:
@@ -278,6 +315,11 @@ async def update_portfolio_item(
                 profile.portfolio_items_count += 1
                 session.add(profile)
     
+    if any(value is not None for value in (
+        updates.content_type, updates.content_url, updates.attachment_url, updates.attachment_type
+    )):
+        item.waveform = _audio_waveform(session, item)
+    
     session.add(item)
     session.commit()
     session.refresh(item)
@@ -298,7 +340,10 @@ async def update_portfolio_item(
         views=item.views,
         clicks=item.clicks,
         order=item.order,
-        created_at=item.created_at.isoformat()
+        created_at=item.created_at.isoformat(),
+        variants=get_srcset(session, item.content_url),
+        hls_url=item.hls_url,
+        waveform=decode_waveform(item.waveform)
     )
 
 
@@ -345,7 +390,10 @@ async def publish_draft(
         views=item.views,
         clicks=item.clicks,
         order=item.order,
-        created_at=item.created_at.isoformat()
+        created_at=item.created_at.isoformat(),
+        variants=get_srcset(session, item.content_url),
+        hls_url=item.hls_url,
+        waveform=decode_waveform(item.waveform)
     )
 
 
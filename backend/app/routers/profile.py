@@ -4,13 +4,17 @@ from datetime import datetime
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.exc import OperationalError, IntegrityError
 
-from app.db.base import get_session
+from app.db.base import get_session, async_engine
+from app.db.replicas import get_async_read_session
 from app.db.models import User, Profile, ProfileLike, UserPoints, PortfolioItem, Project, Report, BlockedUser
 from pydantic import BaseModel
 from app.deps.auth import get_current_user, get_current_user_optional
 from app.schemas.profile import ProfileUpdate, ProfileResponse
+from app.services.image_variants import get_srcset, get_srcset_async
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +68,7 @@ async def get_my_profile(
         bio=profile.bio,
         about=profile.about,
         profile_picture=profile.profile_picture,
+        profile_picture_variants=get_srcset(session, profile.profile_picture),
         banner_image=profile.banner_image,
         location=profile.location,
         skills=profile.skills,
@@ -182,6 +187,7 @@ async def update_my_profile(
         bio=profile.bio,
         about=profile.about,
         profile_picture=profile.profile_picture,
+        profile_picture_variants=get_srcset(session, profile.profile_picture),
         banner_image=profile.banner_image,
         location=profile.location,
         skills=profile.skills,
@@ -209,65 +215,63 @@ async def update_my_profile(
 @router.get("/{username}", response_model=ProfileResponse)
 async def get_profile_by_username(
     username: str,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
     """Get public profile by username."""
     # Find user
-    user = session.exec(select(User).where(User.username == username)).first()
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Get profile
-    profile = session.exec(select(Profile).where(Profile.user_id == user.id)).first()
+    profile = (await session.exec(select(Profile).where(Profile.user_id == user.id))).first()
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
     # Get points (before any potential view tracking that might modify session)
-    user_points = session.exec(select(UserPoints).where(UserPoints.user_id == user.id)).first()
+    user_points = (await session.exec(select(UserPoints).where(UserPoints.user_id == user.id))).first()
     total_points = user_points.total_points if user_points else 0
     
     # Track view (if not own profile) - also track anonymous/external visitors
-    # Use separate session to avoid deadlocks
+    # Use separate session on the primary (session may be on a read replica)
     is_own_profile = current_user and current_user.id == user.id
+    profile_views_count = profile.profile_views_count
     
     if not is_own_profile:  # Track for both logged-in and anonymous users
         try:
             from app.db.models import ProfileView
-            from app.db.base import engine
             
-            with Session(engine) as view_session:
-                today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-                
+            async with AsyncSession(async_engine) as view_session:
+                # Anonymous/external visitors count on each visit (no duplicate check)
+                count_view = True
                 if current_user:
                     # Logged-in user - check by user ID to prevent duplicates per day
-                    existing_view = view_session.exec(
+                    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+                    existing_view = (await view_session.exec(
                         select(ProfileView).where(
                             ProfileView.profile_user_id == user.id,
                             ProfileView.viewer_id == current_user.id,
                             ProfileView.created_at >= today_start
                         )
-                    ).first()
-                    
-                    if not existing_view:
-                        view = ProfileView(profile_user_id=user.id, viewer_id=current_user.id)
-                        view_session.add(view)
-                        profile_for_update = view_session.get(Profile, profile.id)
-                        if profile_for_update:
-                            profile_for_update.profile_views_count += 1
-                            view_session.add(profile_for_update)
-                        view_session.commit()
-                        session.refresh(profile)
-                else:
-                    # Anonymous/external visitor - count each visit (no duplicate check)
-                    view = ProfileView(profile_user_id=user.id, viewer_id=None)
-                    view_session.add(view)
-                    profile_for_update = view_session.get(Profile, profile.id)
-                    if profile_for_update:
-                        profile_for_update.profile_views_count += 1
-                        view_session.add(profile_for_update)
-                    view_session.commit()
-                    session.refresh(profile)
+                    )).first()
+                    count_view = existing_view is None
+                
+                if count_view:
+                    view_session.add(ProfileView(
+                        profile_user_id=user.id,
+                        viewer_id=current_user.id if current_user else None
+                    ))
+                    # Increment in the database so concurrent views are all counted
+                    await view_session.execute(
+                        update(Profile)
+                        .where(Profile.id == profile.id)
+                        .values(profile_views_count=Profile.profile_views_count + 1)
+                    )
+                    profile_views_count = (await view_session.exec(
+                        select(Profile.profile_views_count).where(Profile.id == profile.id)
+                    )).one()
+                    await view_session.commit()
         except (OperationalError, IntegrityError) as e:
             logger.warning(f"Failed to track profile view for user {user.id}: {str(e)}")
         except Exception as e:
@@ -283,6 +287,7 @@ async def get_profile_by_username(
         bio=profile.bio,
         about=profile.about,
         profile_picture=profile.profile_picture,
+        profile_picture_variants=await get_srcset_async(session, profile.profile_picture),
         banner_image=profile.banner_image,
         location=profile.location,
         skills=profile.skills,
@@ -296,7 +301,7 @@ async def get_profile_by_username(
         soundcloud_url=profile.soundcloud_url,
         portfolio_customization=profile.portfolio_customization,
         profile_likes_count=profile.profile_likes_count,
-        profile_views_count=profile.profile_views_count,
+        profile_views_count=profile_views_count,
         portfolio_items_count=profile.portfolio_items_count,
         projects_count=profile.projects_count,
         total_points=total_points,
@@ -343,7 +348,12 @@ async def like_profile(
         profile.profile_likes_count += 1
         session.add(profile)
     
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # A concurrent request recorded the same like first (uq_profile_likes_pair)
+        session.rollback()
+        raise HTTPException(status_code=400, detail="Already liked this profile")
     
     return {"message": "Profile liked successfully"}
 
@@ -520,7 +530,15 @@ async def block_user(
         blocked_id=target_user.id
     )
     session.add(block)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # A concurrent request blocked the same user first (uq_blocked_users_pair)
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already blocked"
+        )
     
     return {"message": f"Successfully blocked {username}"}
 
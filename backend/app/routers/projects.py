@@ -1,11 +1,15 @@
 """Projects router."""
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.db.base import get_session
+from app.db.replicas import get_async_read_session
 from app.db.models import User, Project, ProjectMedia, Profile, PointsTransaction, UserPoints
 from app.deps.auth import get_current_user
+from app.services.image_variants import get_srcset, get_srcset_async, get_srcsets, get_srcsets_async, get_thumbnail
 from app.schemas.portfolio import (
     ProjectCreate, ProjectUpdate, ProjectResponse,
     ProjectMediaCreate, ProjectMediaResponse
@@ -45,6 +49,7 @@ async def get_projects(
         .where(Project.is_draft == False)
         .order_by(Project.order)
     ).all()
+    srcsets = get_srcsets(session, [project.cover_image for project in projects])
     
     result = []
     for project in projects:
@@ -66,7 +71,8 @@ async def get_projects(
             clicks=project.clicks,
             order=project.order,
             media_count=media_count,
-            created_at=project.created_at.isoformat()
+            created_at=project.created_at.isoformat(),
+            cover_image_variants=srcsets.get(project.cover_image)
         ))
     
     return result
@@ -84,6 +90,7 @@ async def get_draft_projects(
         .where(Project.is_draft == True)
         .order_by(Project.created_at.desc())
     ).all()
+    srcsets = get_srcsets(session, [project.cover_image for project in projects])
     
     result = []
     for project in projects:
@@ -105,7 +112,8 @@ async def get_draft_projects(
             clicks=project.clicks,
             order=project.order,
             media_count=media_count,
-            created_at=project.created_at.isoformat()
+            created_at=project.created_at.isoformat(),
+            cover_image_variants=srcsets.get(project.cover_image)
         ))
     
     return result
@@ -114,25 +122,31 @@ async def get_draft_projects(
 @router.get("/user/{username}", response_model=List[ProjectResponse])
 async def get_user_projects(
     username: str,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get another user's projects (public, excluding drafts)."""
-    user = session.exec(select(User).where(User.username == username)).first()
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    projects = session.exec(
+    projects = (await session.exec(
         select(Project)
         .where(Project.user_id == user.id)
         .where(Project.is_draft == False)
         .order_by(Project.order)
-    ).all()
+    )).all()
+    srcsets = await get_srcsets_async(session, [project.cover_image for project in projects])
+    
+    # Media counts for all projects in one query
+    media_counts = dict((await session.exec(
+        select(ProjectMedia.project_id, func.count())
+        .where(ProjectMedia.project_id.in_([project.id for project in projects]))
+        .group_by(ProjectMedia.project_id)
+    )).all()) if projects else {}
     
     result = []
     for project in projects:
-        media_count = len(session.exec(
-            select(ProjectMedia).where(ProjectMedia.project_id == project.id)
-        ).all())
+        media_count = media_counts.get(project.id, 0)
         
         result.append(ProjectResponse(
             id=project.id,
@@ -148,7 +162,8 @@ async def get_user_projects(
             clicks=project.clicks,
             order=project.order,
             media_count=media_count,
-            created_at=project.created_at.isoformat()
+            created_at=project.created_at.isoformat(),
+            cover_image_variants=srcsets.get(project.cover_image)
         ))
     
     return result
@@ -209,23 +224,24 @@ async def create_project(
         clicks=project.clicks,
         order=project.order,
         media_count=0,
-        created_at=project.created_at.isoformat()
+        created_at=project.created_at.isoformat(),
+        cover_image_variants=get_srcset(session, project.cover_image)
     )
 
 
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get a project by ID."""
-    project = session.get(Project, project_id)
+    project = await session.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    media_count = len(session.exec(
-        select(ProjectMedia).where(ProjectMedia.project_id == project.id)
-    ).all())
+    media_count = (await session.exec(
+        select(func.count()).select_from(ProjectMedia).where(ProjectMedia.project_id == project.id)
+    )).one()
     
     return ProjectResponse(
         id=project.id,
@@ -241,7 +257,8 @@ async def get_project(
         clicks=project.clicks,
         order=project.order,
         media_count=media_count,
-        created_at=project.created_at.isoformat()
+        created_at=project.created_at.isoformat(),
+        cover_image_variants=await get_srcset_async(session, project.cover_image)
     )
 
 
@@ -290,7 +307,8 @@ async def publish_project(
         clicks=project.clicks,
         order=project.order,
         media_count=media_count,
-        created_at=project.created_at.isoformat()
+        created_at=project.created_at.isoformat(),
+        cover_image_variants=get_srcset(session, project.cover_image)
     )
 
 
@@ -343,7 +361,8 @@ async def update_project(
         clicks=project.clicks,
         order=project.order,
         media_count=media_count,
-        created_at=project.created_at.isoformat()
+        created_at=project.created_at.isoformat(),
+        cover_image_variants=get_srcset(session, project.cover_image)
     )
 
 
@@ -379,18 +398,18 @@ async def delete_project(
 @router.get("/{project_id}/media", response_model=List[ProjectMediaResponse])
 async def get_project_media(
     project_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_read_session)
 ):
     """Get media items for a project."""
-    project = session.get(Project, project_id)
+    project = await session.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    media_items = session.exec(
+    media_items = (await session.exec(
         select(ProjectMedia)
         .where(ProjectMedia.project_id == project_id)
         .order_by(ProjectMedia.order)
-    ).all()
+    )).all()
     
     return [
         ProjectMediaResponse(
@@ -429,7 +448,7 @@ async def add_project_media(
         project_id=project_id,
         media_url=media_data.media_url,
         media_type=media_data.media_type,
-        thumbnail_url=media_data.thumbnail_url,
+        thumbnail_url=media_data.thumbnail_url or get_thumbnail(session, media_data.media_url),
         order=order
     )
     session.add(media)
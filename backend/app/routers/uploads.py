@@ -3,21 +3,58 @@
 Supports photo, video, audio, and PDF uploads to Cloudflare R2.
 Media files are automatically compressed using FFmpeg before storage
 to reduce costs while maintaining display quality.
+
+Large files can skip the API entirely: POST /presign returns a presigned
+PUT URL, the client uploads straight to R2, then POST /finalize verifies
+the object and queues compression.
+
+Multipart uploads are checked while they stream in (UploadGuardMiddleware,
+configured by UPLOAD_RULES): oversized or spoofed files are rejected after
+their first few KB instead of after the whole transfer.
+
+Clients on unreliable connections can upload in resumable chunks instead:
+POST /sessions, PATCH /sessions/{id} with an Upload-Offset header per chunk,
+GET /sessions/{id} to find the offset after a dropped connection, then
+POST /sessions/{id}/complete.
 """
 import os
+import json
 import uuid
 import logging
+from datetime import timedelta
 from pathlib import Path
 from typing import Optional
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
 
 from app.db.base import get_session
-from app.db.models import User, Profile, PointsTransaction, UserPoints
+from app.db.models import (
+    User, Profile, PointsTransaction, UserPoints,
+    PortfolioItem, Project, ProjectMedia, TranscodeJob
+)
 from app.deps.auth import get_current_user
 from app.core.config import settings
+from app.core.security import create_access_token, decode_token
+from app.core.upload_guard import UploadRule
 from app.services.s3_service import s3_service
+from app.services.file_validation import file_validator, SNIFF_BYTES
 from app.services.media_compression_service import compression_service
+from app.services.upload_spool import (
+    spool_upload, SpooledUpload, UploadTooLargeError, UploadRejectedError
+)
+from app.services.media_pipeline import (
+    process_media_file, MediaRejectedError, MediaStorageError, StoredMedia
+)
+from app.services.image_variants import save_variants, build_srcset, get_srcset, get_thumbnail
+from app.services.media_assets import decode_waveform, get_waveform
+from app.services.upload_sessions import (
+    upload_session_service, UploadSessionError, SESSION_ACTIVE
+)
+from app.services.transcode_queue import (
+    transcode_queue, TARGET_PORTFOLIO_ITEM, TARGET_PROJECT_MEDIA
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -27,6 +64,243 @@ UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 
+# Accepted client-declared MIME types per media type - permissive approach
+VALID_CONTENT_TYPES = {
+    "photo": ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"],
+    "video": [
+        "video/mp4", 
+        "video/quicktime", 
+        "video/x-msvideo", 
+        "video/webm", 
+        "video/mpeg",
+        "video/x-matroska",
+        "video/ogg",
+        "application/octet-stream"
+    ],
+    "audio": [
+        "audio/mpeg", "audio/mp3", "audio/wav", "audio/ogg", "audio/mp4", 
+        "audio/x-m4a", "audio/m4a", "audio/aac", "audio/x-aac",
+        "audio/x-caf", "audio/aiff", "audio/x-aiff",  # iOS formats
+        "audio/webm", "audio/flac", "audio/x-flac",
+        "application/octet-stream"  # Fallback for iOS file picker
+    ],
+    "pdf": ["application/pdf"]
+}
+
+# SECURITY: Maximum sizes per media type
+MAX_MEDIA_SIZES = {
+    "photo": 20 * 1024 * 1024,      # 20MB (will compress to ~2-5MB)
+    "video": 1024 * 1024 * 1024,    # 1GB (will compress significantly)
+    "audio": 100 * 1024 * 1024,     # 100MB (will compress to ~20-30MB)
+    "pdf": 50 * 1024 * 1024         # 50MB (no compression)
+}
+
+# Multipart routes whose bodies UploadGuardMiddleware inspects while they
+# stream in (size per media type, magic bytes) - keyed by full path
+UPLOAD_RULES = {
+    "/api/uploads/media": UploadRule(limits=MAX_MEDIA_SIZES),
+    "/api/uploads/profile-picture": UploadRule(limits={"photo": MAX_MEDIA_SIZES["photo"]}, type_field=None),
+    "/api/uploads/project-cover": UploadRule(limits={"photo": MAX_MEDIA_SIZES["photo"]}, type_field=None),
+}
+
+# Upload token type for presigned direct-to-R2 uploads
+DIRECT_UPLOAD_TOKEN_TYPE = "direct_upload"
+
+
+def _validate_media_content_type(media_type: str, content_type: Optional[str], filename: Optional[str]):
+    """Raise 400 unless the media type and declared content type are acceptable."""
+    valid_media_types = ["photo", "video", "audio", "pdf"]
+    if media_type not in valid_media_types:
+        raise HTTPException(status_code=400, detail=f"Invalid media type: {media_type}")
+    
+    # Check if content type is valid for the media type
+    if content_type and content_type not in VALID_CONTENT_TYPES[media_type]:
+        file_ext = os.path.splitext(filename)[1].lower() if filename else ""
+        
+        # If it's a video and has application/octet-stream, check file extension
+        if media_type == "video" and content_type == "application/octet-stream":
+            valid_video_exts = [".mp4", ".mov", ".avi", ".webm", ".mpeg", ".mpg", ".mkv"]
+            if file_ext not in valid_video_exts:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid video file extension: {file_ext}. Expected: {', '.join(valid_video_exts)}"
+                )
+        # If it's audio and has application/octet-stream or unknown type, check file extension (iOS fix)
+        elif media_type == "audio":
+            valid_audio_exts = [".mp3", ".m4a", ".aac", ".wav", ".ogg", ".flac", ".caf", ".aiff", ".webm"]
+            if file_ext in valid_audio_exts:
+                logger.info(f"Accepting audio file by extension: {file_ext} (MIME: {content_type})")
+            else:
+                logger.warning(f"Invalid audio file: ext={file_ext}, mime={content_type}")
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid audio file type. Supported formats: MP3, M4A, AAC, WAV, OGG, FLAC"
+                )
+        else:
+            logger.warning(f"Invalid content type for {media_type}: {content_type}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid file type '{content_type}' for {media_type}. Expected: {', '.join(VALID_CONTENT_TYPES[media_type])}"
+            )
+
+
+def _resolve_job_target(
+    session: Session,
+    current_user: User,
+    portfolio_item_id: Optional[int],
+    project_media_id: Optional[int]
+):
+    """Return (target_type, target_id) for an async job, checking ownership."""
+    if portfolio_item_id is not None:
+        item = session.get(PortfolioItem, portfolio_item_id)
+        if not item or item.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Portfolio item not found")
+        return TARGET_PORTFOLIO_ITEM, item.id
+    if project_media_id is not None:
+        media = session.get(ProjectMedia, project_media_id)
+        project = session.get(Project, media.project_id) if media else None
+        if not project or project.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Project media not found")
+        return TARGET_PROJECT_MEDIA, media.id
+    return None, None
+
+
+async def _process_image_upload(file: UploadFile, folder: str, default_filename: str) -> StoredMedia:
+    """Spool, compress and store an image upload along with its variants.
+    
+    Raises HTTPException on oversize or rejected uploads and storage failures.
+    """
+    try:
+        spooled = await spool_upload(file, MAX_MEDIA_SIZES["photo"], media_type="photo")
+    except UploadTooLargeError:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size for images is {MAX_MEDIA_SIZES['photo'] / (1024 * 1024):.0f}MB"
+        )
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        return await compression_service.run_async(
+            process_media_file,
+            spooled.path,
+            file.filename or default_filename,
+            file.content_type or "image/jpeg",
+            "photo",
+            quality=settings.COMPRESSION_IMAGE_PRESET,
+            folder=folder,
+            sha256=spooled.sha256
+        )
+    except MediaRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MediaStorageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        spooled.cleanup()
+
+
+async def _process_spooled_media(
+    session: Session,
+    current_user: User,
+    spooled: SpooledUpload,
+    filename: Optional[str],
+    content_type: Optional[str],
+    media_type: str,
+    compress: bool,
+    quality: str,
+    async_processing: bool,
+    target_type: Optional[str],
+    target_id: Optional[int]
+):
+    """
+    Queue or process an upload that is already on disk.
+    
+    Takes ownership of the spooled file. Async uploads must be spooled in
+    TRANSCODE_SPOOL_DIR; the response is a 202 with the job id. Otherwise
+    the file is compressed and stored now and the upload response returned.
+    """
+    original_size = spooled.size
+    
+    # === ASYNC MODE: queue and return immediately ===
+    if async_processing:
+        try:
+            job = transcode_queue.enqueue(
+                session,
+                user_id=current_user.id,
+                spooled=spooled,
+                media_type=media_type,
+                content_type=content_type,
+                compress=compress,
+                quality=quality,
+                target_type=target_type,
+                target_id=target_id
+            )
+        except Exception:
+            spooled.cleanup()
+            raise
+        
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Media queued for processing",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/api/uploads/jobs/{job.id}",
+                "media_type": media_type,
+                "original_size": original_size
+            }
+        )
+    
+    # === COMPRESS AND UPLOAD TO R2 ===
+    try:
+        # Compression and the R2 upload both block; run them off the event loop
+        stored = await compression_service.run_async(
+            process_media_file,
+            spooled.path,
+            filename,
+            content_type,
+            media_type,
+            compress=compress,
+            quality=quality,
+            sha256=spooled.sha256
+        )
+    except MediaRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except MediaStorageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        spooled.cleanup()
+    
+    save_variants(session, stored.url, stored.variants)
+    session.commit()
+    
+    file_url = stored.url
+    final_filename = stored.filename
+    final_size = stored.final_size
+    compression_applied = stored.compression_applied
+    compression_error = stored.compression_error
+    
+    # Calculate savings
+    savings_bytes = original_size - final_size
+    savings_percent = (savings_bytes / original_size * 100) if original_size > 0 else 0
+    
+    return {
+        "message": "Media uploaded successfully",
+        "url": file_url,
+        "variants": build_srcset(stored.variants),
+        "thumbnail_url": stored.thumbnail_url,
+        "hls_url": stored.hls_url,
+        "waveform": stored.waveform,
+        "media_type": media_type,
+        "filename": final_filename,
+        "original_size": original_size,
+        "final_size": final_size,
+        "compression_applied": compression_applied,
+        "compression_savings": f"{savings_percent:.1f}%",
+        "compression_error": compression_error
+    }
+
+
 async def award_points_upload(user_id: int, action: str, points: int, session: Session):
     """Award points for upload actions."""
     transaction = PointsTransaction(
@@ -52,62 +326,17 @@ async def upload_profile_picture(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    """Upload profile picture to R2 with optional compression."""
+    """Upload profile picture to R2 with optional compression and responsive variants."""
     try:
         # Validate file type
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read file content
-        content = await file.read()
-        original_size = len(content)
-        
-        # Compress image if FFmpeg is available
-        final_content = content
-        final_filename = f"{uuid.uuid4()}{os.path.splitext(file.filename)[1] if file.filename else '.jpg'}"
-        final_content_type = file.content_type or "image/jpeg"
-        
-        if settings.COMPRESSION_ENABLED and compression_service.is_available():
-            result = compression_service.compress_image(
-                content, 
-                file.filename or "image.jpg",
-                settings.COMPRESSION_IMAGE_PRESET,
-                settings.COMPRESSION_IMAGE_FORMAT
-            )
-            if result.success and result.compressed_content:
-                final_content = result.compressed_content
-                final_filename = result.output_filename
-                final_content_type = result.content_type
-                logger.info(f"Profile picture compressed: {result.savings_percent} reduction")
-        
-        # Try R2 first (production), fallback to local (development)
-        if s3_service.is_available():
-            # Upload to R2
-            s3_key = f"profile_pictures/{final_filename}"
-            file_url = s3_service.upload_file(
-                file_content=final_content,
-                file_key=s3_key,
-                content_type=final_content_type
-            )
-            
-            if not file_url:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to upload to R2. Please check server logs."
-                )
-            
-            logger.info(f"Profile picture uploaded to R2: {file_url}")
-        else:
-            # Fallback to local storage (development only)
-            logger.warning("R2 not available, using local storage (NOT recommended for production)")
-            file_path = UPLOAD_DIR / "profile_pictures" / final_filename
-            file_path.parent.mkdir(exist_ok=True, parents=True)
-            
-            with open(file_path, "wb") as f:
-                f.write(final_content)
-            
-            file_url = f"/uploads/profile_pictures/{final_filename}"
-            logger.info(f"Profile picture uploaded locally: {file_url}")
+        stored = await _process_image_upload(
+            file, "profile_pictures", file.filename or "image.jpg"
+        )
+        file_url = stored.url
+        logger.info(f"Profile picture uploaded: {file_url}")
         
         # Update profile
         profile = session.exec(select(Profile).where(Profile.user_id == current_user.id)).first()
@@ -118,14 +347,16 @@ async def upload_profile_picture(
             
             profile.profile_picture = file_url
             session.add(profile)
-            session.commit()
+        save_variants(session, stored.url, stored.variants)
+        session.commit()
         
         return {
             "message": "Profile picture uploaded successfully",
             "url": file_url,
-            "original_size": original_size,
-            "final_size": len(final_content),
-            "compressed": len(final_content) < original_size
+            "variants": build_srcset(stored.variants),
+            "original_size": stored.original_size,
+            "final_size": stored.final_size,
+            "compressed": stored.final_size < stored.original_size
         }
     except HTTPException:
         raise
@@ -144,6 +375,9 @@ async def upload_media(
     media_type: str = Form("photo"),
     compress: bool = Form(True),
     quality: str = Form("standard"),
+    async_processing: bool = Form(False),
+    portfolio_item_id: Optional[int] = Form(None),
+    project_media_id: Optional[int] = Form(None),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
@@ -160,6 +394,10 @@ async def upload_media(
         media_type: Type of media (photo, video, audio, pdf)
         compress: Whether to compress the file (default: True)
         quality: Compression quality preset (high, standard, low)
+        async_processing: Queue compression and return 202 with a job id
+            instead of waiting for it (poll GET /jobs/{job_id})
+        portfolio_item_id: Portfolio item whose content_url the async job fills in
+        project_media_id: Project media row whose media_url the async job fills in
     """
     try:
         logger.info(
@@ -167,208 +405,40 @@ async def upload_media(
             f"quality: {quality}, content_type: {file.content_type}, filename: {file.filename}"
         )
         
-        # Validate media type
-        valid_media_types = ["photo", "video", "audio", "pdf"]
-        if media_type not in valid_media_types:
-            raise HTTPException(status_code=400, detail=f"Invalid media type: {media_type}")
-        
-        # Validate file type - permissive approach
-        valid_types = {
-            "photo": ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"],
-            "video": [
-                "video/mp4", 
-                "video/quicktime", 
-                "video/x-msvideo", 
-                "video/webm", 
-                "video/mpeg",
-                "video/x-matroska",
-                "video/ogg",
-                "application/octet-stream"
-            ],
-            "audio": [
-                "audio/mpeg", "audio/mp3", "audio/wav", "audio/ogg", "audio/mp4", 
-                "audio/x-m4a", "audio/m4a", "audio/aac", "audio/x-aac",
-                "audio/x-caf", "audio/aiff", "audio/x-aiff",  # iOS formats
-                "audio/webm", "audio/flac", "audio/x-flac",
-                "application/octet-stream"  # Fallback for iOS file picker
-            ],
-            "pdf": ["application/pdf"]
-        }
-        
-        # Check if content type is valid for the media type
-        if file.content_type and file.content_type not in valid_types[media_type]:
-            file_ext = os.path.splitext(file.filename)[1].lower() if file.filename else ""
-            
-            # If it's a video and has application/octet-stream, check file extension
-            if media_type == "video" and file.content_type == "application/octet-stream":
-                valid_video_exts = [".mp4", ".mov", ".avi", ".webm", ".mpeg", ".mpg", ".mkv"]
-                if file_ext not in valid_video_exts:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid video file extension: {file_ext}. Expected: {', '.join(valid_video_exts)}"
-                    )
-            # If it's audio and has application/octet-stream or unknown type, check file extension (iOS fix)
-            elif media_type == "audio":
-                valid_audio_exts = [".mp3", ".m4a", ".aac", ".wav", ".ogg", ".flac", ".caf", ".aiff", ".webm"]
-                if file_ext in valid_audio_exts:
-                    logger.info(f"Accepting audio file by extension: {file_ext} (MIME: {file.content_type})")
-                else:
-                    logger.warning(f"Invalid audio file: ext={file_ext}, mime={file.content_type}")
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid audio file type. Supported formats: MP3, M4A, AAC, WAV, OGG, FLAC"
-                    )
-            else:
-                logger.warning(f"Invalid content type for {media_type}: {file.content_type}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid file type '{file.content_type}' for {media_type}. Expected: {', '.join(valid_types[media_type])}"
-                )
-        
-        # Read file content
-        content = await file.read()
-        original_size = len(content)
+        # Validate media type and declared content type
+        _validate_media_content_type(media_type, file.content_type, file.filename)
         
-        # SECURITY: Validate file size first (before validation)
-        max_sizes = {
-            "photo": 20 * 1024 * 1024,      # 20MB (will compress to ~2-5MB)
-            "video": 1024 * 1024 * 1024,    # 1GB (will compress significantly)
-            "audio": 100 * 1024 * 1024,     # 100MB (will compress to ~20-30MB)
-            "pdf": 50 * 1024 * 1024         # 50MB (no compression)
-        }
+        # Resolve the row an async job should update once it finishes
+        target_type, target_id = None, None
+        if async_processing:
+            target_type, target_id = _resolve_job_target(
+                session, current_user, portfolio_item_id, project_media_id
+            )
         
-        if original_size > max_sizes[media_type]:
-            max_size_mb = max_sizes[media_type] / (1024 * 1024)
+        # Stream the body to disk in chunks, enforcing the size limit as we go,
+        # so large videos never sit in worker memory. Async jobs spool to the
+        # shared queue directory so the file outlives this request.
+        try:
+            spooled = await spool_upload(
+                file,
+                MAX_MEDIA_SIZES[media_type],
+                directory=settings.TRANSCODE_SPOOL_DIR if async_processing else None,
+                media_type=media_type
+            )
+        except UploadTooLargeError:
+            max_size_mb = MAX_MEDIA_SIZES[media_type] / (1024 * 1024)
             raise HTTPException(
                 status_code=413,
                 detail=f"File too large. Maximum size for {media_type} is {max_size_mb:.0f}MB"
             )
+        except UploadRejectedError as e:
+            logger.warning(f"Rejected {media_type} upload from user {current_user.id}: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # === COMPRESSION LOGIC ===
-        final_content = content
-        file_ext = os.path.splitext(file.filename)[1] if file.filename else ""
-        final_filename = f"{uuid.uuid4()}{file_ext}"
-        final_content_type = file.content_type or "application/octet-stream"
-        compression_applied = False
-        compression_error = None
-        
-        # Use compression settings from config if not explicitly disabled
-        should_compress = compress and settings.COMPRESSION_ENABLED and compression_service.is_available()
-        
-        if should_compress and media_type != "pdf":
-            # Use quality from request or fall back to config
-            preset = quality if quality in ["high", "standard", "low"] else settings.COMPRESSION_VIDEO_PRESET
-            
-            if media_type == "video":
-                logger.info(f"Compressing video with preset: {preset}")
-                result = compression_service.compress_video(
-                    content, 
-                    file.filename or "video.mp4", 
-                    preset
-                )
-                if result.success and result.compressed_content:
-                    final_content = result.compressed_content
-                    final_filename = result.output_filename
-                    final_content_type = result.content_type
-                    compression_applied = True
-                    logger.info(f"Video compressed: {result.savings_percent} reduction")
-                else:
-                    compression_error = result.error
-                    logger.warning(f"Video compression failed, using original: {result.error}")
-            
-            elif media_type == "photo":
-                logger.info(f"Compressing image with preset: {preset}")
-                result = compression_service.compress_image(
-                    content, 
-                    file.filename or "image.jpg",
-                    preset,
-                    settings.COMPRESSION_IMAGE_FORMAT
-                )
-                if result.success and result.compressed_content:
-                    final_content = result.compressed_content
-                    final_filename = result.output_filename
-                    final_content_type = result.content_type
-                    compression_applied = True
-                    logger.info(f"Image compressed: {result.savings_percent} reduction")
-                else:
-                    compression_error = result.error
-                    logger.warning(f"Image compression failed, using original: {result.error}")
-            
-            elif media_type == "audio":
-                logger.info(f"Compressing audio with preset: {preset}")
-                result = compression_service.compress_audio(
-                    content, 
-                    file.filename or "audio.mp3",
-                    preset
-                )
-                if result.success and result.compressed_content:
-                    final_content = result.compressed_content
-                    final_filename = result.output_filename
-                    final_content_type = result.content_type
-                    compression_applied = True
-                    logger.info(f"Audio compressed: {result.savings_percent} reduction")
-                else:
-                    compression_error = result.error
-                    logger.warning(f"Audio compression failed, using original: {result.error}")
-        
-        elif media_type == "pdf":
-            # PDFs are not compressed, keep original
-            final_filename = f"{uuid.uuid4()}.pdf"
-            final_content_type = "application/pdf"
-        
-        # === UPLOAD TO R2 ===
-        final_size = len(final_content)
-        
-        if s3_service.is_available():
-            s3_key = f"{media_type}/{final_filename}"
-            file_url = s3_service.upload_file(
-                file_content=final_content,
-                file_key=s3_key,
-                content_type=final_content_type
-            )
-            
-            if not file_url:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to upload to R2. Please check credentials and bucket configuration."
-                )
-            
-            logger.info(f"Media uploaded to R2: {file_url} ({final_size/1024/1024:.2f}MB)")
-        else:
-            # Fallback to local storage (development only)
-            logger.warning("R2 not available, using local storage (NOT recommended for production)")
-            
-            try:
-                file_path = UPLOAD_DIR / media_type / final_filename
-                file_path.parent.mkdir(exist_ok=True, parents=True)
-                
-                with open(file_path, "wb") as f:
-                    f.write(final_content)
-                
-                file_url = f"/uploads/{media_type}/{final_filename}"
-                logger.info(f"Media uploaded locally: {file_url}")
-            except Exception as e:
-                logger.error(f"Failed to save file locally: {str(e)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail="File upload failed. R2 is not configured and local storage is unavailable."
-                )
-        
-        # Calculate savings
-        savings_bytes = original_size - final_size
-        savings_percent = (savings_bytes / original_size * 100) if original_size > 0 else 0
-        
-        return {
-            "message": "Media uploaded successfully",
-            "url": file_url,
-            "media_type": media_type,
-            "filename": final_filename,
-            "original_size": original_size,
-            "final_size": final_size,
-            "compression_applied": compression_applied,
-            "compression_savings": f"{savings_percent:.1f}%",
-            "compression_error": compression_error
-        }
+        return await _process_spooled_media(
+            session, current_user, spooled, file.filename, file.content_type, media_type,
+            compress, quality, async_processing, target_type, target_id
+        )
         
     except HTTPException:
         raise
@@ -380,73 +450,476 @@ async def upload_media(
         )
 
 
+@router.post("/presign")
+async def presign_media_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    media_type: str = Form("photo"),
+    content_type: str = Form("application/octet-stream"),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a presigned URL to upload media straight to R2.
+    
+    The client PUTs the file to `upload_url` with the returned headers, then
+    calls POST /finalize with `upload_token`. The bytes never pass through
+    the API server. Content-Type and Content-Length are signed, so R2
+    rejects a body that differs from the declared type or size.
+    
+    Args:
+        filename: Original filename (used for the extension)
+        size: Exact file size in bytes
+        media_type: Type of media (photo, video, audio, pdf)
+        content_type: MIME type the client will send
+    """
+    _validate_media_content_type(media_type, content_type, filename)
+    
+    max_size = MAX_MEDIA_SIZES[media_type]
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="File size must be greater than zero")
+    if size > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size for {media_type} is {max_size / (1024 * 1024):.0f}MB"
+        )
+    
+    if not s3_service.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail="Direct uploads require R2 storage. Use POST /api/uploads/media instead."
+        )
+    
+    file_key = f"{media_type}/{uuid.uuid4()}{os.path.splitext(filename)[1].lower()}"
+    expiration = settings.R2_PRESIGNED_UPLOAD_EXPIRATION
+    upload_url = s3_service.get_presigned_upload_url(file_key, content_type, size, expiration)
+    if not upload_url:
+        raise HTTPException(status_code=500, detail="Failed to create upload URL")
+    
+    upload_token = create_access_token(
+        {
+            "sub": current_user.id,
+            "type": DIRECT_UPLOAD_TOKEN_TYPE,
+            "key": file_key,
+            "media_type": media_type,
+            "content_type": content_type,
+            "size": size,
+            "filename": filename
+        },
+        expires_delta=timedelta(seconds=expiration)
+    )
+    
+    return {
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": content_type},
+        "key": file_key,
+        "upload_token": upload_token,
+        "expires_in": expiration,
+        "max_size": max_size
+    }
+
+
+@router.post("/finalize")
+async def finalize_media_upload(
+    upload_token: str = Form(...),
+    compress: bool = Form(True),
+    quality: str = Form("standard"),
+    portfolio_item_id: Optional[int] = Form(None),
+    project_media_id: Optional[int] = Form(None),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Verify a direct-to-R2 upload and optionally queue compression.
+    
+    Checks the stored object with a HEAD request (it must exist and match
+    the declared size) and sniffs its magic bytes with a ranged GET. Objects
+    that fail verification are deleted. With compression enabled the object
+    is queued for the transcode worker and a 202 with a job id is returned;
+    otherwise the object is used as-is.
+    
+    Args:
+        upload_token: Token returned by POST /presign
+        compress: Whether to compress the file (default: True)
+        quality: Compression quality preset (high, standard, low)
+        portfolio_item_id: Portfolio item whose content_url the job fills in
+        project_media_id: Project media row whose media_url the job fills in
+    """
+    payload = decode_token(upload_token)
+    if (
+        not payload
+        or payload.get("type") != DIRECT_UPLOAD_TOKEN_TYPE
+        or payload.get("sub") != str(current_user.id)
+    ):
+        raise HTTPException(status_code=400, detail="Invalid or expired upload token")
+    
+    file_key = payload["key"]
+    media_type = payload["media_type"]
+    content_type = payload["content_type"]
+    filename = payload.get("filename")
+    
+    # Finalizing twice returns the job already queued for this object
+    existing_job = session.exec(
+        select(TranscodeJob).where(
+            TranscodeJob.source_key == file_key,
+            TranscodeJob.user_id == current_user.id
+        )
+    ).first()
+    if existing_job:
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Media queued for processing",
+                "job_id": existing_job.id,
+                "status": existing_job.status,
+                "status_url": f"/api/uploads/jobs/{existing_job.id}",
+                "media_type": media_type,
+                "original_size": existing_job.original_size
+            }
+        )
+    
+    target_type, target_id = _resolve_job_target(
+        session, current_user, portfolio_item_id, project_media_id
+    )
+    
+    head = await run_in_threadpool(s3_service.head_file, file_key)
+    if not head:
+        raise HTTPException(
+            status_code=400,
+            detail="Uploaded file not found. PUT the file to upload_url before finalizing."
+        )
+    
+    if head["size"] != payload["size"] or head["size"] > MAX_MEDIA_SIZES[media_type]:
+        await run_in_threadpool(s3_service.delete_file, file_key)
+        raise HTTPException(status_code=400, detail="Uploaded file size does not match the declared size")
+    
+    header = await run_in_threadpool(s3_service.read_file_header, file_key, SNIFF_BYTES)
+    is_valid, detected_type, error = file_validator.sniff_media_type(header or b"", media_type)
+    if not is_valid:
+        logger.warning(f"Rejected direct upload {file_key} from user {current_user.id}: {error}")
+        await run_in_threadpool(s3_service.delete_file, file_key)
+        raise HTTPException(status_code=400, detail=error)
+    
+    should_compress = (
+        compress
+        and media_type != "pdf"
+        and settings.COMPRESSION_ENABLED
+        and compression_service.is_available()
+    )
+    
+    if should_compress:
+        job = transcode_queue.enqueue_stored(
+            session,
+            user_id=current_user.id,
+            source_key=file_key,
+            size=head["size"],
+            filename=filename,
+            media_type=media_type,
+            content_type=content_type,
+            compress=compress,
+            quality=quality,
+            target_type=target_type,
+            target_id=target_id
+        )
+        return JSONResponse(
+            status_code=202,
+            content={
+                "message": "Media queued for processing",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/api/uploads/jobs/{job.id}",
+                "media_type": media_type,
+                "original_size": head["size"]
+            }
+        )
+    
+    logger.info(f"Direct upload finalized: {file_key} ({head['size']/1024/1024:.2f}MB, {detected_type})")
+    return {
+        "message": "Media uploaded successfully",
+        "url": s3_service.get_public_url(file_key),
+        "media_type": media_type,
+        "filename": os.path.basename(file_key),
+        "original_size": head["size"],
+        "final_size": head["size"],
+        "compression_applied": False,
+        "compression_savings": "0.0%",
+        "compression_error": None
+    }
+
+
+def _session_response(upload) -> dict:
+    """Public view of an upload session."""
+    return {
+        "session_id": upload.id,
+        "status": upload.status,
+        "offset": upload_session_service.current_offset(upload),
+        "size": upload.size,
+        "media_type": upload.media_type,
+        "chunk_size": settings.UPLOAD_SESSION_CHUNK_SIZE,
+        "upload_url": f"/api/uploads/sessions/{upload.id}",
+        "expires_at": upload.expires_at.isoformat()
+    }
+
+
+def _session_error(e: UploadSessionError) -> HTTPException:
+    """HTTPException for a failed chunk, carrying the offset to resume from."""
+    headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+
+@router.post("/sessions")
+async def create_upload_session(
+    filename: str = Form(...),
+    size: int = Form(...),
+    media_type: str = Form("photo"),
+    content_type: str = Form("application/octet-stream"),
+    compress: bool = Form(True),
+    quality: str = Form("standard"),
+    async_processing: bool = Form(False),
+    portfolio_item_id: Optional[int] = Form(None),
+    project_media_id: Optional[int] = Form(None),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Start a resumable chunked upload.
+    
+    Send the file with PATCH /sessions/{session_id}: each request body is the
+    next chunk and the Upload-Offset header says where it starts. After a
+    dropped connection, GET the session to learn the offset to resume from.
+    When offset equals size, POST /sessions/{session_id}/complete processes
+    the file exactly like POST /media. Idle sessions expire after
+    UPLOAD_SESSION_TTL_SECONDS.
+    
+    Args:
+        filename: Original filename (used for the extension)
+        size: Exact file size in bytes
+        media_type: Type of media (photo, video, audio, pdf)
+        content_type: MIME type of the file
+        compress: Whether to compress the file (default: True)
+        quality: Compression quality preset (high, standard, low)
+        async_processing: Queue compression on completion and return 202 with a job id
+        portfolio_item_id: Portfolio item whose content_url the async job fills in
+        project_media_id: Project media row whose media_url the async job fills in
+    """
+    _validate_media_content_type(media_type, content_type, filename)
+    
+    max_size = MAX_MEDIA_SIZES[media_type]
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="File size must be greater than zero")
+    if size > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size for {media_type} is {max_size / (1024 * 1024):.0f}MB"
+        )
+    
+    target_type, target_id = None, None
+    if async_processing:
+        target_type, target_id = _resolve_job_target(
+            session, current_user, portfolio_item_id, project_media_id
+        )
+    
+    upload = upload_session_service.create(
+        session,
+        user_id=current_user.id,
+        media_type=media_type,
+        size=size,
+        filename=filename,
+        content_type=content_type,
+        compress=compress,
+        quality=quality,
+        async_processing=async_processing,
+        target_type=target_type,
+        target_id=target_id
+    )
+    return JSONResponse(status_code=201, content=_session_response(upload))
+
+
+@router.get("/sessions/{session_id}")
+async def get_upload_session(
+    session_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Get an upload session's offset (resume point) and status."""
+    upload = upload_session_service.get(session, session_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    
+    data = _session_response(upload)
+    response.headers["Upload-Offset"] = str(data["offset"])
+    response.headers["Cache-Control"] = "no-store"
+    if upload.status != SESSION_ACTIVE:
+        data["job_id"] = upload.job_id
+        data["url"] = upload.result_url
+    return data
+
+
+@router.patch("/sessions/{session_id}")
+async def upload_session_chunk(
+    session_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Append a chunk (the raw request body) at Upload-Offset.
+    
+    Returns 409 with the current Upload-Offset when the offset is stale, so
+    the client can resume from there.
+    """
+    upload = upload_session_service.get(session, session_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    
+    try:
+        offset = await upload_session_service.append_chunk(
+            session, upload, upload_offset, request.stream()
+        )
+    except UploadSessionError as e:
+        raise _session_error(e)
+    
+    response.headers["Upload-Offset"] = str(offset)
+    return {
+        "session_id": upload.id,
+        "offset": offset,
+        "size": upload.size,
+        "complete": offset == upload.size,
+        "expires_at": upload.expires_at.isoformat()
+    }
+
+
+@router.post("/sessions/{session_id}/complete")
+async def complete_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Process a fully received upload session.
+    
+    Responds like POST /media (202 with a job id for async sessions).
+    Completing again returns the earlier job or URL.
+    """
+    upload = upload_session_service.get(session, session_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    
+    try:
+        spooled = upload_session_service.claim_for_completion(session, upload)
+    except UploadSessionError as e:
+        raise _session_error(e)
+    
+    if spooled is None:
+        session.refresh(upload)
+        return JSONResponse(
+            status_code=202 if upload.job_id else 200,
+            content={
+                "message": "Upload session already completed",
+                "session_id": upload.id,
+                "job_id": upload.job_id,
+                "status_url": f"/api/uploads/jobs/{upload.job_id}" if upload.job_id else None,
+                "url": upload.result_url,
+                "media_type": upload.media_type,
+                "original_size": upload.size
+            }
+        )
+    
+    try:
+        result = await _process_spooled_media(
+            session, current_user, spooled, upload.filename, upload.content_type, upload.media_type,
+            upload.compress, upload.quality, upload.async_processing, upload.target_type, upload.target_id
+        )
+    except HTTPException:
+        # The file is gone; the client has to start a new session
+        upload_session_service.delete(session, upload)
+        raise
+    except Exception as e:
+        upload_session_service.delete(session, upload)
+        logger.error(f"Error completing upload session {session_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload media: {str(e)}")
+    
+    if isinstance(result, JSONResponse):
+        job_id = json.loads(result.body)["job_id"]
+        upload_session_service.record_result(session, upload, job_id=job_id)
+    else:
+        upload_session_service.record_result(session, upload, result_url=result["url"])
+        result["session_id"] = upload.id
+    return result
+
+
+@router.delete("/sessions/{session_id}")
+async def cancel_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Abort an upload session and delete its partial file."""
+    upload = upload_session_service.get(session, session_id, current_user.id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    upload_session_service.delete(session, upload)
+    return {"message": "Upload session cancelled"}
+
+
 @router.post("/project-cover")
 async def upload_project_cover(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    """Upload project cover image to R2 with compression."""
+    """Upload project cover image to R2 with compression and responsive variants."""
     # Validate file type
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Read file content
-    content = await file.read()
-    original_size = len(content)
-    
-    # Compress image if FFmpeg is available
-    final_content = content
-    final_filename = f"{uuid.uuid4()}{os.path.splitext(file.filename)[1] if file.filename else '.jpg'}"
-    final_content_type = file.content_type or "image/jpeg"
-    
-    if settings.COMPRESSION_ENABLED and compression_service.is_available():
-        result = compression_service.compress_image(
-            content,
-            file.filename or "cover.jpg",
-            settings.COMPRESSION_IMAGE_PRESET,
-            settings.COMPRESSION_IMAGE_FORMAT
-        )
-        if result.success and result.compressed_content:
-            final_content = result.compressed_content
-            final_filename = result.output_filename
-            final_content_type = result.content_type
-            logger.info(f"Project cover compressed: {result.savings_percent} reduction")
-    
-    # Try R2 first (production), fallback to local (development)
-    if s3_service.is_available():
-        s3_key = f"project_covers/{final_filename}"
-        file_url = s3_service.upload_file(
-            file_content=final_content,
-            file_key=s3_key,
-            content_type=final_content_type
-        )
-        
-        if not file_url:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to upload to R2. Please check server logs."
-            )
-        
-        logger.info(f"Project cover uploaded to R2: {file_url}")
-    else:
-        # Fallback to local storage (development only)
-        logger.warning("R2 not available, using local storage (NOT recommended for production)")
-        file_path = UPLOAD_DIR / "project_covers" / final_filename
-        file_path.parent.mkdir(exist_ok=True, parents=True)
-        
-        with open(file_path, "wb") as f:
-            f.write(final_content)
-        
-        file_url = f"/uploads/project_covers/{final_filename}"
-        logger.info(f"Project cover uploaded locally: {file_url}")
+    stored = await _process_image_upload(file, "project_covers", file.filename or "cover.jpg")
+    logger.info(f"Project cover uploaded: {stored.url}")
+    
+    save_variants(session, stored.url, stored.variants)
+    session.commit()
     
     return {
         "message": "Project cover uploaded successfully",
-        "url": file_url,
-        "original_size": original_size,
-        "final_size": len(final_content),
-        "compressed": len(final_content) < original_size
+        "url": stored.url,
+        "variants": build_srcset(stored.variants),
+        "thumbnail_url": stored.thumbnail_url,
+        "original_size": stored.original_size,
+        "final_size": stored.final_size,
+        "compressed": stored.final_size < stored.original_size
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_transcode_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Get status, progress and result URL of an async media upload."""
+    job = session.get(TranscodeJob, job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "media_type": job.media_type,
+        "url": job.result_url,
+        "variants": get_srcset(session, job.result_url),
+        "thumbnail_url": get_thumbnail(session, job.result_url),
+        "hls_url": job.result_hls_url,
+        "waveform": decode_waveform(get_waveform(session, job.result_url)),
+        "filename": job.result_filename,
+        "original_size": job.original_size,
+        "final_size": job.final_size,
+        "compression_applied": job.compression_applied,
+        "error": job.error,
+        "attempts": job.attempts,
+        "target_type": job.target_type,
+        "target_id": job.target_id,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
     }
 
 
@@ -462,5 +935,10 @@ async def get_compression_status():
             "audio": settings.COMPRESSION_AUDIO_PRESET
         },
         "image_format": settings.COMPRESSION_IMAGE_FORMAT,
+        "image_backend": compression_service.image_backend,
+        "concurrency": {
+            "max": compression_service.max_concurrency,
+            "per_type": compression_service.type_limits
+        },
         "status": "operational" if compression_service.is_available() else "ffmpeg_not_installed"
     }
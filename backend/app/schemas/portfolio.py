@@ -1,6 +1,6 @@
 """Portfolio schemas."""
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class PortfolioItemCreate(BaseModel):
@@ -8,6 +8,7 @@ class PortfolioItemCreate(BaseModel):
     content_type: str = Field(..., description="photo, video, audio, pdf, text, or link")
     content_url: Optional[str] = None  # Optional for text posts
     thumbnail_url: Optional[str] = None
+    hls_url: Optional[str] = None  # HLS master playlist from the upload response (videos)
     title: Optional[str] = None
     description: Optional[str] = None
     text_content: Optional[str] = Field(None, max_length=500)  # For text posts
@@ -25,6 +26,7 @@ class PortfolioItemUpdate(BaseModel):
     content_type: Optional[str] = None
     content_url: Optional[str] = None
     thumbnail_url: Optional[str] = None
+    hls_url: Optional[str] = None
     text_content: Optional[str] = None
     aspect_ratio: Optional[str] = None
     attachment_url: Optional[str] = None
@@ -50,6 +52,9 @@ class PortfolioItemResponse(BaseModel):
     clicks: int
     order: int
     created_at: str
+    variants: Optional[str] = None  # srcset of resized copies of content_url (photos)
+    hls_url: Optional[str] = None  # HLS master playlist (videos); content_url is the MP4 fallback
+    waveform: Optional[List[int]] = None  # Audio peaks (0-127) for drawing the player without decoding
 
 
 class ProjectCreate(BaseModel):
@@ -90,6 +95,7 @@ class ProjectResponse(BaseModel):
     order: int
     media_count: int = 0
     created_at: str
+    cover_image_variants: Optional[str] = None  # srcset of resized copies of cover_image
 
 
 class ProjectMediaCreate(BaseModel):
@@ -35,6 +35,7 @@ class ProfileResponse(BaseModel):
     bio: Optional[str]  # Short bio below profile picture
     about: Optional[str]  # Detailed about section
     profile_picture: Optional[str]
+    profile_picture_variants: Optional[str] = None  # srcset of resized copies of profile_picture
     banner_image: Optional[str]  # Banner/header image URL
     location: Optional[str]  # User location
     skills: Optional[str]
@@ -0,0 +1,411 @@
+"""Background deletion of user accounts.
+
+Deleting a large account inline would hold locks on every table it touches
+for the whole request. Instead the admin endpoint records an
+AccountDeletion row and returns; a worker thread (started next to the
+transcode worker pool) works through the account's rows table by table in
+dependency order. Each table is emptied in batches of
+ACCOUNT_DELETION_BATCH_SIZE rows, one short transaction per batch, and the
+job row is updated as it goes so the admin UI can show progress.
+
+Every upload URL the account held is recorded on the job before its rows
+are deleted. Once the rows are gone, media_gc.delete_unreferenced_media()
+removes the objects nobody else refers to (deduplicated uploads can be
+shared) in batched storage deletes.
+
+All steps are idempotent: a job interrupted by a restart is claimed again
+after TRANSCODE_JOB_TIMEOUT_SECONDS and continues where the data left off.
+A job that has to wait (running transcodes) or failed is requeued with
+not_before set, so the worker moves on instead of re-claiming it at once.
+"""
+import os
+import json
+import socket
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Set
+from sqlalchemy import case, delete, func, or_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.base import engine
+from app.db.models import (
+    AccountDeletion, User, EmailVerification, OnboardingProgress, Profile, PortfolioItem, Project,
+    ProjectMedia, TranscodeJob, UploadSession, ProfileLike, ProfileView, PointsTransaction, UserPoints,
+    PasswordResetToken, BlockedUser, EmailChangeRequest, Report, AdminAction, QuizResult
+)
+from app.services.media_gc import delete_unreferenced_media
+from app.services.s3_service import s3_service
+from app.services.transcode_queue import JOB_QUEUED, JOB_PROCESSING, JOB_COMPLETED, JOB_FAILED
+from app.services.upload_sessions import SESSION_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Share of the progress bar taken by row deletion; media deletion fills the rest
+ROWS_PROGRESS = 80
+
+# Seconds before a requeued job is claimed again: waiting for a transcode, or after a failure
+WAIT_FOR_TRANSCODE_SECONDS = 30
+RETRY_DELAY_SECONDS = 60
+
+
+class _Step:
+    """Rows of one table to delete (or detach, when values is given)."""
+    
+    def __init__(self, name: str, model, condition, values: Optional[dict] = None, before: Optional[Callable] = None):
+        self.name = name
+        self.model = model
+        self.condition = condition
+        self.values = values
+        self.before = before  # Called with (session, ids) inside each batch's transaction
+
+
+def _remove_spool_files(session: Session, ids: List[int]) -> None:
+    """Delete the spooled originals of queued transcode jobs about to be deleted."""
+    for path in session.exec(
+        select(TranscodeJob.input_path).where(TranscodeJob.id.in_(ids), TranscodeJob.status == JOB_QUEUED)
+    ).all():
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not delete spooled upload {path}: {str(e)}")
+
+
+def _remove_session_files(session: Session, ids: List[str]) -> None:
+    """Delete the partial files of active upload sessions about to be deleted."""
+    for path in session.exec(
+        select(UploadSession.path).where(UploadSession.id.in_(ids), UploadSession.status == SESSION_ACTIVE)
+    ).all():
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not delete upload session file {path}: {str(e)}")
+
+
+def _uncount_likes(session: Session, ids: List[int]) -> None:
+    """Take likes the user gave off the liked profiles' counters, in one UPDATE."""
+    likes = (
+        select(func.count(ProfileLike.id))
+        .where(ProfileLike.id.in_(ids), ProfileLike.liked_profile_user_id == Profile.user_id)
+        .scalar_subquery()
+    )
+    session.execute(
+        update(Profile)
+        .where(Profile.user_id.in_(select(ProfileLike.liked_profile_user_id).where(ProfileLike.id.in_(ids))))
+        .values(profile_likes_count=case(
+            (Profile.profile_likes_count > likes, Profile.profile_likes_count - likes),
+            else_=0
+        ))
+    )
+
+
+def _steps(job: AccountDeletion) -> List[_Step]:
+    """Tables holding the account's rows, children before parents."""
+    user_id = job.user_id
+    return [
+        _Step("transcode_jobs", TranscodeJob,
+              (TranscodeJob.user_id == user_id) & (TranscodeJob.status != JOB_PROCESSING),
+              before=_remove_spool_files),
+        _Step("upload_sessions", UploadSession, UploadSession.user_id == user_id, before=_remove_session_files),
+        _Step("project_media", ProjectMedia,
+              ProjectMedia.project_id.in_(select(Project.id).where(Project.user_id == user_id))),
+        _Step("projects", Project, Project.user_id == user_id),
+        _Step("portfolio_items", PortfolioItem, PortfolioItem.user_id == user_id),
+        _Step("profile_likes", ProfileLike, ProfileLike.liker_id == user_id, before=_uncount_likes),
+        _Step("profile_likes", ProfileLike, ProfileLike.liked_profile_user_id == user_id),
+        _Step("profile_views", ProfileView, ProfileView.profile_user_id == user_id),
+        # Views of other profiles stay counted, as anonymous
+        _Step("profile_views", ProfileView, ProfileView.viewer_id == user_id, values={"viewer_id": None}),
+        _Step("points_transactions", PointsTransaction, PointsTransaction.user_id == user_id),
+        _Step("user_points", UserPoints, UserPoints.user_id == user_id),
+        _Step("blocked_users", BlockedUser, or_(BlockedUser.blocker_id == user_id, BlockedUser.blocked_id == user_id)),
+        _Step("quiz_results", QuizResult, QuizResult.user_id == user_id),
+        _Step("reports", Report, Report.target_user_id == user_id),
+        _Step("reports", Report, Report.reporter_id == user_id, values={"reporter_id": None}),
+        _Step("reports", Report, Report.resolved_by == user_id, values={"resolved_by": None}),
+        # The audit log outlives the admin: detach it, keeping who it was
+        _Step("admin_actions", AdminAction, AdminAction.admin_id == user_id,
+              values={"admin_id": None, "admin_username": job.username}),
+        _Step("password_reset_tokens", PasswordResetToken, PasswordResetToken.user_id == user_id),
+        _Step("email_change_requests", EmailChangeRequest, EmailChangeRequest.user_id == user_id),
+        _Step("email_verifications", EmailVerification, EmailVerification.email == job.email),
+        _Step("onboarding_progress", OnboardingProgress, OnboardingProgress.user_id == user_id),
+        _Step("profiles", Profile, Profile.user_id == user_id),
+        _Step("users", User, User.id == user_id),
+    ]
+
+
+def _media_urls(session: Session, user_id: int) -> Set[str]:
+    """Every upload URL the account's rows refer to."""
+    columns = [
+        (Profile.profile_picture, Profile.user_id),
+        (Profile.banner_image, Profile.user_id),
+        (PortfolioItem.content_url, PortfolioItem.user_id),
+        (PortfolioItem.thumbnail_url, PortfolioItem.user_id),
+        (PortfolioItem.hls_url, PortfolioItem.user_id),
+        (PortfolioItem.attachment_url, PortfolioItem.user_id),
+        (Project.cover_image, Project.user_id),
+        (TranscodeJob.result_url, TranscodeJob.user_id),
+        (TranscodeJob.result_hls_url, TranscodeJob.user_id),
+        (UploadSession.result_url, UploadSession.user_id),
+    ]
+    urls: Set[str] = set()
+    for column, owner in columns:
+        urls.update(session.exec(select(column).where(owner == user_id, column.is_not(None))).all())
+    
+    projects = select(Project.id).where(Project.user_id == user_id)
+    for media_url, thumbnail_url in session.exec(
+        select(ProjectMedia.media_url, ProjectMedia.thumbnail_url).where(ProjectMedia.project_id.in_(projects))
+    ).all():
+        urls.update(url for url in (media_url, thumbnail_url) if url)
+    
+    # Raw direct uploads of jobs that never finished
+    if s3_service.is_available():
+        for source_key in session.exec(
+            select(TranscodeJob.source_key).where(
+                TranscodeJob.user_id == user_id,
+                TranscodeJob.source_key.is_not(None),
+                TranscodeJob.status != JOB_COMPLETED
+            )
+        ).all():
+            urls.add(s3_service.get_public_url(source_key))
+    return urls
+
+
+class AccountDeletionService:
+    """Enqueue account deletions and carry them out in the background."""
+    
+    @staticmethod
+    def enqueue(session: Session, user: User, requested_by: Optional[int] = None) -> AccountDeletion:
+        """
+        Queue deletion of a user account and deactivate it right away.
+        
+        Returns the pending job if the account is already queued.
+        """
+        existing = session.exec(
+            select(AccountDeletion).where(
+                AccountDeletion.user_id == user.id,
+                AccountDeletion.status.in_([JOB_QUEUED, JOB_PROCESSING])
+            )
+        ).first()
+        if existing:
+            return existing
+        
+        # Locks the user out while the job waits; login and token checks require is_active
+        user.is_active = False
+        user.updated_at = datetime.utcnow()
+        session.add(user)
+        job = AccountDeletion(
+            user_id=user.id,
+            username=user.username,
+            email=user.email,
+            requested_by=requested_by
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        
+        logger.info(f"Queued account deletion {job.id} for user {user.id} ({user.username})")
+        account_deletion_worker.wake()
+        return job
+    
+    @staticmethod
+    def claim_next(session: Session, worker_id: str) -> Optional[AccountDeletion]:
+        """Claim the oldest queued job, or one abandoned by a dead worker."""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.TRANSCODE_JOB_TIMEOUT_SECONDS)
+        claimable = or_(
+            (AccountDeletion.status == JOB_QUEUED)
+            & (AccountDeletion.not_before.is_(None) | (AccountDeletion.not_before <= now)),
+            (AccountDeletion.status == JOB_PROCESSING) & (AccountDeletion.locked_at < stale_before)
+        )
+        candidates = session.exec(
+            select(AccountDeletion.id)
+            .where(claimable)
+            .order_by(AccountDeletion.created_at)
+            .limit(5)
+        ).all()
+        
+        for job_id in candidates:
+            result = session.execute(
+                update(AccountDeletion)
+                .where(AccountDeletion.id == job_id)
+                .where(claimable)
+                .values(
+                    status=JOB_PROCESSING,
+                    worker_id=worker_id,
+                    locked_at=now,
+                    not_before=None,
+                    started_at=func.coalesce(AccountDeletion.started_at, now),
+                    attempts=AccountDeletion.attempts + 1,
+                    updated_at=now
+                )
+            )
+            session.commit()
+            if result.rowcount == 1:
+                return session.get(AccountDeletion, job_id)
+        return None
+    
+    def process(self, job_id: int) -> None:
+        """Run a claimed job to completion, or leave it queued to retry later."""
+        with Session(engine) as session:
+            job = session.get(AccountDeletion, job_id)
+            try:
+                self._run(session, job)
+            except Exception as e:
+                session.rollback()
+                job = session.get(AccountDeletion, job_id)
+                retry = job.attempts < settings.TRANSCODE_MAX_ATTEMPTS
+                logger.error(f"Account deletion {job_id} failed ({'retrying' if retry else 'giving up'}): {str(e)}")
+                job.status = JOB_QUEUED if retry else JOB_FAILED
+                job.error = str(e)[:500]
+                job.worker_id = None
+                job.locked_at = None
+                if retry:
+                    job.not_before = datetime.utcnow() + timedelta(seconds=RETRY_DELAY_SECONDS)
+                else:
+                    job.completed_at = datetime.utcnow()
+                job.updated_at = datetime.utcnow()
+                session.add(job)
+                session.commit()
+    
+    def _run(self, session: Session, job: AccountDeletion) -> None:
+        # Record media first: once the rows are gone nothing says which objects were theirs
+        urls = set(json.loads(job.media_urls or "[]")) | _media_urls(session, job.user_id)
+        job.media_urls = json.dumps(sorted(urls))
+        self._touch(session, job)
+        
+        steps = _steps(job)
+        # Rows deleted under a running transcode would be recreated by its result; wait for it
+        self._run_step(session, job, steps[0])
+        running = session.exec(
+            select(func.count(TranscodeJob.id)).where(
+                TranscodeJob.user_id == job.user_id, TranscodeJob.status == JOB_PROCESSING
+            )
+        ).one()
+        if running:
+            logger.info(f"Account deletion {job.id} waiting for {running} running transcode job(s)")
+            job.status = JOB_QUEUED
+            job.attempts -= 1  # Waiting is not a failure; not_before spaces out the checks
+            job.error = f"Waiting for {running} running transcode job(s)"
+            job.worker_id = None
+            job.locked_at = None
+            job.not_before = datetime.utcnow() + timedelta(seconds=WAIT_FOR_TRANSCODE_SECONDS)
+            self._touch(session, job)
+            return
+        
+        for index, step in enumerate(steps[1:], start=1):
+            self._run_step(session, job, step)
+            job.progress = ROWS_PROGRESS * (index + 1) // len(steps)
+            self._touch(session, job)
+        
+        job.step = "media"
+        self._touch(session, job)
+        
+        def report(done: int, total: int):
+            job.progress = ROWS_PROGRESS + (100 - ROWS_PROGRESS) * done // max(1, total)
+            self._touch(session, job)
+        
+        deleted, failed = delete_unreferenced_media(session, urls, report)
+        
+        now = datetime.utcnow()
+        job.status = JOB_COMPLETED
+        job.progress = 100
+        job.step = None
+        job.media_deleted = deleted
+        job.media_failed = failed
+        job.error = None
+        job.completed_at = now
+        job.worker_id = None
+        job.locked_at = None
+        self._touch(session, job)
+        logger.info(
+            f"Account deletion {job.id} completed: user {job.user_id} ({job.username}), "
+            f"{job.rows_deleted} rows, {deleted} media objects ({failed} failed)"
+        )
+    
+    @staticmethod
+    def _run_step(session: Session, job: AccountDeletion, step: _Step) -> None:
+        """Delete (or detach) a step's rows in ACCOUNT_DELETION_BATCH_SIZE batches."""
+        job.step = step.name
+        AccountDeletionService._touch(session, job)
+        batch_size = max(1, settings.ACCOUNT_DELETION_BATCH_SIZE)
+        
+        while True:
+            ids = session.exec(select(step.model.id).where(step.condition).limit(batch_size)).all()
+            if not ids:
+                return
+            if step.before:
+                step.before(session, ids)
+            if step.values is None:
+                session.execute(delete(step.model).where(step.model.id.in_(ids)))
+            else:
+                session.execute(update(step.model).where(step.model.id.in_(ids)).values(**step.values))
+            job.rows_deleted += len(ids)
+            AccountDeletionService._touch(session, job)
+    
+    @staticmethod
+    def _touch(session: Session, job: AccountDeletion) -> None:
+        """Save job progress (commits, ending the current batch's transaction)."""
+        now = datetime.utcnow()
+        job.updated_at = now
+        if job.status == JOB_PROCESSING:
+            job.locked_at = now
+        session.add(job)
+        session.commit()
+
+
+class AccountDeletionWorker:
+    """Single background thread that drains the account deletion queue."""
+    
+    def __init__(self, service: AccountDeletionService):
+        self.service = service
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _run(self) -> None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:account-deletion"
+        while not self._stop.is_set():
+            try:
+                with Session(engine) as session:
+                    job = self.service.claim_next(session, worker_id)
+                    job_id = job.id if job else None
+                if job_id is not None:
+                    logger.info(f"Worker {worker_id} processing account deletion {job_id}")
+                    self.service.process(job_id)
+                    continue
+            except Exception as e:
+                logger.error(f"Account deletion worker error: {str(e)}")
+            self._wake.wait(settings.TRANSCODE_POLL_INTERVAL_SECONDS)
+            self._wake.clear()
+    
+    def wake(self) -> None:
+        """Pick up new work now instead of at the next poll."""
+        self._wake.set()
+    
+    def start(self) -> None:
+        """Start the worker thread (no-op if already running)."""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="account-deletion-worker", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Signal the worker to stop and wait for the job in flight."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+
+# Singleton instances
+account_deletion_service = AccountDeletionService()
+account_deletion_worker = AccountDeletionWorker(account_deletion_service)
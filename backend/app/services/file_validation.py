@@ -31,17 +31,44 @@ ALLOWED_AUDIO_TYPES = {
     'audio/mp4': ['.m4a'],
     'audio/x-m4a': ['.m4a'],
     'audio/wav': ['.wav'],
-    'audio/ogg': ['.ogg']
+    'audio/ogg': ['.ogg'],
+    'audio/x-caf': ['.caf']
 }
 
 ALLOWED_DOCUMENT_TYPES = {
     'application/pdf': ['.pdf']
 }
 
+# Detected MIME types (exact or prefix ending in '/') accepted per upload media type.
+# Audio containers such as M4A are often detected as their video counterparts.
+MEDIA_TYPE_SIGNATURES = {
+    'photo': list(ALLOWED_IMAGE_TYPES.keys()),
+    'video': ['video/'],
+    'audio': ['audio/', 'video/mp4', 'video/webm', 'video/3gpp', 'application/ogg'],
+    'pdf': ['application/pdf']
+}
+
+# Bytes needed from the start of a file for reliable magic-byte detection
+SNIFF_BYTES = 8192
+
+# Formats libmagic reports as application/octet-stream, recognised by their
+# leading bytes instead: iOS voice recordings are CoreAudio (.caf) files
+KNOWN_SIGNATURES = [
+    (b'caff', 'audio/x-caf'),
+]
+
 
 class FileValidator:
     """Validates file types using magic bytes (actual file content)."""
     
+    @staticmethod
+    def detect_mime(content: bytes) -> str:
+        """MIME type of a file from its leading bytes (KNOWN_SIGNATURES, then libmagic)."""
+        for signature, mime in KNOWN_SIGNATURES:
+            if content.startswith(signature):
+                return mime
+        return magic.from_buffer(content, mime=True)
+    
     @staticmethod
     def validate_file_type(
         content: bytes,
@@ -63,7 +90,7 @@ class FileValidator:
         """
         try:
             # Detect actual MIME type from file content (magic bytes)
-            mime = magic.from_buffer(content, mime=True)
+            mime = FileValidator.detect_mime(content)
             
             logger.info(f"Validating file '{filename}': detected MIME type = {mime}")
             
@@ -116,6 +143,30 @@ class FileValidator:
             content, filename, ALLOWED_DOCUMENT_TYPES, check_extension=True
         )
     
+    @staticmethod
+    def sniff_media_type(header: bytes, media_type: str) -> Tuple[bool, str, str]:
+        """
+        Check that the leading bytes of a file match the declared media type.
+        
+        Args:
+            header: First SNIFF_BYTES of the file
+            media_type: Declared upload type (photo, video, audio, pdf)
+        
+        Returns:
+            Tuple of (is_valid, detected_mime_type, error_message)
+        """
+        try:
+            mime = FileValidator.detect_mime(header)
+        except Exception as e:
+            logger.error(f"Magic-byte detection failed: {str(e)}")
+            return False, "unknown", f"File validation failed: {str(e)}"
+        
+        for allowed in MEDIA_TYPE_SIGNATURES.get(media_type, []):
+            if mime == allowed or (allowed.endswith('/') and mime.startswith(allowed)):
+                return True, mime, ""
+        
+        return False, mime, f"File content ('{mime}') does not match media type '{media_type}'"
+    
     @staticmethod
     def is_svg(content: bytes) -> bool:
         """
@@ -0,0 +1,197 @@
+"""In-process image decoding, resizing and encoding with Pillow.
+
+Used by MediaCompressionService when COMPRESSION_IMAGE_BACKEND is "pillow".
+For the small files typical of photo uploads, starting an FFmpeg process
+and round-tripping through temp files costs more than the encode itself;
+Pillow does the same work inside the calling thread.
+
+Each function returns None (or an empty result) when Pillow cannot handle
+the input, e.g. animated images or formats it has no decoder for, so the
+caller can fall back to FFmpeg.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name -> FFmpeg codec name used by plan_processing()
+PILLOW_CODECS = {
+    "JPEG": "mjpeg",
+    "PNG": "png",
+    "WEBP": "webp",
+    "GIF": "gif",
+    "BMP": "bmp",
+    "TIFF": "tiff",
+}
+
+# Resize in two steps (fast reduce, then Lanczos) once the scale factor passes this
+REDUCING_GAP = 3.0
+
+EXIF_ORIENTATION = 0x0112
+
+# Image.info keys for embedded metadata besides EXIF (read with getexif()):
+# XMP (JPEG/WebP and PNG spellings) and comments
+METADATA_KEYS = ("xmp", "XML:com.adobe.xmp", "comment")
+
+
+def is_available(output_format: str = "webp") -> bool:
+    """Whether Pillow can encode the given output format."""
+    return output_format != "webp" or bool(features.check("webp"))
+
+
+def probe_image(path: str) -> Optional[Tuple[str, int, int]]:
+    """
+    Read an image header without decoding the pixels.
+    
+    Returns:
+        (codec, width, height) using FFmpeg codec names, or None if unreadable
+    """
+    try:
+        with Image.open(path) as img:
+            codec = PILLOW_CODECS.get(img.format, (img.format or "").lower())
+            return codec, img.width, img.height
+    except Exception:
+        return None
+
+
+def has_metadata(path: str) -> bool:
+    """
+    Whether an image carries EXIF (including GPS), XMP or comment metadata.
+    
+    Encoding with this module drops all of it, so an image with metadata
+    must not be stored as uploaded. Unreadable files count as having
+    metadata.
+    """
+    try:
+        with Image.open(path) as img:
+            if len(img.getexif()):
+                return True
+            return any(img.info.get(key) for key in METADATA_KEYS)
+    except Exception:
+        return True
+
+
+def _open(path: str, max_dimension: Optional[int] = None) -> Tuple[Optional[Image.Image], int]:
+    """
+    Decode a still image, upright and in an encodable mode.
+    
+    Returns:
+        (image, full-resolution width after orientation); image is None for
+        animated inputs
+    """
+    img = Image.open(path)
+    if getattr(img, "n_frames", 1) > 1:
+        # Animated GIF/WebP: FFmpeg keeps the animation
+        img.close()
+        return None, 0
+    # EXIF orientations 5-8 rotate by 90 degrees
+    rotated = img.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+    full_width = img.height if rotated else img.width
+    if max_dimension and img.format == "JPEG":
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when the target is that much smaller
+        img.draft("RGB", (max_dimension, max_dimension))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+        has_alpha = img.mode in ("LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+    return img, full_width
+
+
+def _fit(img: Image.Image, max_width: int, max_height: int) -> Image.Image:
+    """Downscale to fit within the box, keeping the aspect ratio (never upscales)."""
+    if img.width <= max_width and img.height <= max_height:
+        return img
+    ratio = min(max_width / img.width, max_height / img.height)
+    size = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+    return img.resize(size, Image.LANCZOS, reducing_gap=REDUCING_GAP)
+
+
+def _save(img: Image.Image, output_file: str, quality: int, output_format: str) -> None:
+    if output_format == "webp":
+        # method 4 matches FFmpeg's -compression_level 4
+        img.save(output_file, "WEBP", quality=quality, method=4)
+    else:
+        if img.mode == "RGBA":
+            img = img.convert("RGB")
+        img.save(output_file, "JPEG", quality=quality, optimize=True, progressive=True)
+
+
+def encode_image(
+    input_file: str,
+    output_file: str,
+    max_dimension: int,
+    quality: int,
+    output_format: str = "webp"
+) -> bool:
+    """
+    Resize an image to fit max_dimension and encode it to output_file.
+    
+    Args:
+        input_file: Path to the source image
+        output_file: Destination path
+        max_dimension: Longest allowed side in pixels
+        quality: Encoder quality (1-100)
+        output_format: "webp" or "jpeg"
+    
+    Returns:
+        True on success, False if Pillow cannot handle the input
+    """
+    try:
+        img, _ = _open(input_file, max_dimension)
+        if img is None:
+            return False
+        with img:
+            _save(_fit(img, max_dimension, max_dimension), output_file, quality, output_format)
+        return True
+    except Image.DecompressionBombError:
+        raise
+    except Exception as e:
+        logger.info(f"Pillow could not encode {input_file}, falling back to FFmpeg: {str(e)}")
+        return False
+
+
+def render_variants(
+    input_file: str,
+    outputs: Dict[int, str],
+    quality: int,
+    output_format: str = "webp"
+) -> Tuple[List[int], Optional[int]]:
+    """
+    Decode an image once and write a resized copy per width.
+    
+    Widths at or above the source width are not written. Each copy is
+    scaled from the largest copy made so far, which is much cheaper than
+    going back to the full-size source and visually identical at these
+    ratios.
+    
+    Args:
+        input_file: Path to the source image
+        outputs: Width -> destination path
+        quality: Encoder quality (1-100)
+        output_format: "webp" or "jpeg"
+    
+    Returns:
+        (widths written, source width); ([], None) if Pillow cannot handle the input
+    """
+    try:
+        img, source_width = _open(input_file, max(outputs) if outputs else None)
+        if img is None:
+            return [], None
+        with img:
+            written = []
+            current = img
+            for width in sorted(outputs, reverse=True):
+                if width >= source_width:
+                    continue
+                height = max(1, round(img.height * width / img.width))
+                current = current.resize((width, height), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+                _save(current, outputs[width], quality, output_format)
+                written.append(width)
+            return sorted(written), source_width
+    except Image.DecompressionBombError:
+        raise
+    except Exception as e:
+        logger.info(f"Pillow could not render variants of {input_file}, falling back to FFmpeg: {str(e)}")
+        return [], None
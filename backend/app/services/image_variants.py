@@ -0,0 +1,122 @@
+"""Lookup and persistence for responsive image variants.
+
+Photo uploads produce resized copies (see
+MediaCompressionService.generate_image_variants). Each copy is recorded
+against the URL of the full-size image. Any response that carries that URL
+(portfolio items, project covers, profile pictures) can then expose a srcset
+string without storing variant lists on every table.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.models import ImageVariant
+
+
+def save_variants(session: Session, source_url: str, variants: List[Tuple[int, str]]) -> None:
+    """
+    Record variants for an image URL (does not commit).
+    
+    Widths already recorded for the URL are skipped, so a deduplicated
+    upload can pass along the variants it reused.
+    
+    Args:
+        session: Database session
+        source_url: URL of the full-size image
+        variants: (width, url) pairs
+    """
+    if not variants:
+        return
+    existing = set(session.exec(
+        select(ImageVariant.width).where(ImageVariant.source_url == source_url)
+    ).all())
+    for width, url in variants:
+        if width not in existing:
+            session.add(ImageVariant(source_url=source_url, width=width, url=url))
+
+
+def _variants_query(urls: set):
+    return (
+        select(ImageVariant)
+        .where(ImageVariant.source_url.in_(urls))
+        .order_by(ImageVariant.width)
+    )
+
+
+def _group_by_source(rows: Iterable[ImageVariant]) -> Dict[str, List[ImageVariant]]:
+    variants: Dict[str, List[ImageVariant]] = {}
+    for row in rows:
+        variants.setdefault(row.source_url, []).append(row)
+    return variants
+
+
+def get_variants(session: Session, urls: Iterable[Optional[str]]) -> Dict[str, List[ImageVariant]]:
+    """Fetch variants for many image URLs in one query, sorted by width."""
+    urls = {url for url in urls if url}
+    if not urls:
+        return {}
+    return _group_by_source(session.exec(_variants_query(urls)).all())
+
+
+async def get_variants_async(session: AsyncSession, urls: Iterable[Optional[str]]) -> Dict[str, List[ImageVariant]]:
+    """get_variants() on an async session."""
+    urls = {url for url in urls if url}
+    if not urls:
+        return {}
+    return _group_by_source((await session.exec(_variants_query(urls))).all())
+
+
+def build_srcset(widths_and_urls: List[Tuple[int, str]]) -> Optional[str]:
+    """Format (width, url) pairs as an HTML srcset value ("url 320w, url 640w")."""
+    if not widths_and_urls:
+        return None
+    return ", ".join(f"{url} {width}w" for width, url in sorted(widths_and_urls))
+
+
+def get_srcsets(session: Session, urls: Iterable[Optional[str]]) -> Dict[str, str]:
+    """Map each image URL that has variants to its srcset string."""
+    return {
+        url: build_srcset([(v.width, v.url) for v in rows])
+        for url, rows in get_variants(session, urls).items()
+    }
+
+
+def get_srcset(session: Session, url: Optional[str]) -> Optional[str]:
+    """srcset string for a single image URL, or None."""
+    return get_srcsets(session, [url]).get(url) if url else None
+
+
+async def get_srcsets_async(session: AsyncSession, urls: Iterable[Optional[str]]) -> Dict[str, str]:
+    """get_srcsets() on an async session."""
+    return {
+        url: build_srcset([(v.width, v.url) for v in rows])
+        for url, rows in (await get_variants_async(session, urls)).items()
+    }
+
+
+async def get_srcset_async(session: AsyncSession, url: Optional[str]) -> Optional[str]:
+    """get_srcset() on an async session."""
+    return (await get_srcsets_async(session, [url])).get(url) if url else None
+
+
+def pick_thumbnail(widths_and_urls: List[Tuple[int, str]]) -> Optional[str]:
+    """
+    Choose the thumbnail URL from (width, url) pairs.
+    
+    Uses the smallest variant at least IMAGE_THUMBNAIL_WIDTH wide, or the
+    largest one when every variant is smaller.
+    """
+    if not widths_and_urls:
+        return None
+    ordered = sorted(widths_and_urls)
+    for width, url in ordered:
+        if width >= settings.IMAGE_THUMBNAIL_WIDTH:
+            return url
+    return ordered[-1][1]
+
+
+def get_thumbnail(session: Session, url: Optional[str]) -> Optional[str]:
+    """Thumbnail URL derived from an image's stored variants, or None."""
+    rows = get_variants(session, [url]).get(url) if url else None
+    return pick_thumbnail([(v.width, v.url) for v in rows]) if rows else None
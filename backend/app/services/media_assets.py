@@ -0,0 +1,197 @@
+"""Content-addressed deduplication of processed uploads.
+
+Every stored upload is recorded under the SHA-256 of its original bytes
+together with the preset and output format it was processed with. A later
+upload of the same bytes with the same settings reuses the stored object
+instead of running FFmpeg and uploading to R2 again.
+
+Keys are shared across users and folders, so whether an upload was a hit
+would tell the uploader that someone else already stored those bytes.
+Upload responses therefore never say; hits are only counted here, for
+get_dedup_stats() behind the admin diagnostics.
+
+Rows also record the processing path (transcode, remux, skip, store) and
+FFmpeg time, which get_processing_stats() turns into an estimate of the
+encode time the shortcuts saved, and the waveform peaks of audio uploads,
+which portfolio items copy by URL.
+"""
+import base64
+import hashlib
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+# Read size when hashing a file that was not hashed while spooling
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Output format per media type when compression runs
+COMPRESSED_FORMATS = {
+    "video": "mp4",
+    "audio": "m4a",
+}
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def asset_key(media_type: str, compressed: bool, preset: str) -> Tuple[str, str]:
+    """
+    (preset, format) under which an upload's result is recorded.
+    
+    Uploads stored as-is share one key regardless of the requested preset.
+    """
+    if not compressed or media_type == "pdf":
+        return "none", "original"
+    if media_type == "photo":
+        return preset, settings.COMPRESSION_IMAGE_FORMAT
+    return preset, COMPRESSED_FORMATS.get(media_type, "original")
+
+
+def encode_waveform(peaks: Optional[List[int]]) -> Optional[str]:
+    """Pack waveform peaks (0-127, one byte each) as base64 for storage."""
+    if not peaks:
+        return None
+    return base64.b64encode(bytes(peaks)).decode("ascii")
+
+
+def decode_waveform(value: Optional[str]) -> Optional[List[int]]:
+    """Unpack a stored waveform into its list of peaks."""
+    if not value:
+        return None
+    try:
+        return list(base64.b64decode(value))
+    except ValueError:
+        return None
+
+
+def get_waveform(session: Session, url: Optional[str]) -> Optional[str]:
+    """Stored waveform of the audio asset at url, if any."""
+    if not url:
+        return None
+    return session.exec(
+        select(MediaAsset.waveform)
+        .where(MediaAsset.url == url)
+        .where(MediaAsset.waveform.is_not(None))
+    ).first()
+
+
+def find_asset(session: Session, sha256: str, preset: str, format: str) -> Optional[MediaAsset]:
+    """Look up a stored asset and count the hit (does not commit)."""
+    asset = session.exec(
+        select(MediaAsset)
+        .where(MediaAsset.sha256 == sha256)
+        .where(MediaAsset.preset == preset)
+        .where(MediaAsset.format == format)
+    ).first()
+    if asset:
+        asset.hit_count += 1
+        asset.last_hit_at = datetime.utcnow()
+        session.add(asset)
+    return asset
+
+
+def save_asset(session: Session, asset: MediaAsset) -> None:
+    """
+    Record a newly stored asset (commits).
+    
+    A concurrent upload of the same bytes may have recorded it first; the
+    earlier row wins and this copy simply stays unreferenced by the table.
+    """
+    session.add(asset)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        logger.info(f"Media asset {asset.sha256[:12]} ({asset.preset}/{asset.format}) already recorded")
+
+
+def get_dedup_stats(session: Session) -> dict:
+    """
+    Aggregate deduplication statistics across all recorded assets.
+    
+    Every miss records one asset, so lookups = assets + hits.
+    
+    Returns:
+        Dict with assets, hits, hit_rate and bytes_saved (stored bytes not re-uploaded)
+    """
+    assets, hits, saved = session.exec(
+        select(
+            func.count(MediaAsset.id),
+            func.coalesce(func.sum(MediaAsset.hit_count), 0),
+            func.coalesce(func.sum(MediaAsset.hit_count * MediaAsset.size), 0)
+        )
+    ).one()
+    lookups = assets + hits
+    return {
+        "assets": assets,
+        "hits": hits,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "bytes_saved": saved
+    }
+
+
+def get_processing_stats(session: Session) -> dict:
+    """
+    Upload counts and FFmpeg time per media type and processing path.
+    
+    Savings are estimated from the transcodes of the same media type: the
+    average FFmpeg seconds per media second (audio/video) or per upload
+    (images), applied to remuxed/skipped uploads and to dedup hits. Times
+    are wall-clock seconds spent in FFmpeg, a proxy for CPU time.
+    
+    Returns:
+        Dict with per-path rows and estimated_cpu_minutes_saved
+    """
+    rows = session.exec(
+        select(
+            MediaAsset.media_type,
+            MediaAsset.processing_path,
+            func.count(MediaAsset.id),
+            func.coalesce(func.sum(MediaAsset.duration), 0),
+            func.coalesce(func.sum(MediaAsset.processing_seconds), 0),
+            func.coalesce(func.sum(MediaAsset.hit_count * MediaAsset.processing_seconds), 0)
+        )
+        .group_by(MediaAsset.media_type, MediaAsset.processing_path)
+    ).all()
+    
+    def units(media_type: str, uploads: int, media_seconds: float) -> float:
+        return media_seconds if media_type in ("video", "audio") and media_seconds else uploads
+    
+    transcode_rate = {
+        media_type: seconds / units(media_type, uploads, media_seconds)
+        for media_type, path, uploads, media_seconds, seconds, _ in rows
+        if path == "transcode" and units(media_type, uploads, media_seconds)
+    }
+    
+    saved = 0.0
+    paths = []
+    for media_type, path, uploads, media_seconds, seconds, dedup_seconds in rows:
+        saved += dedup_seconds
+        if path in ("remux", "skip") and media_type in transcode_rate:
+            saved += max(0.0, transcode_rate[media_type] * units(media_type, uploads, media_seconds) - seconds)
+        paths.append({
+            "media_type": media_type,
+            "path": path or "unknown",
+            "uploads": uploads,
+            "media_seconds": round(media_seconds, 1),
+            "processing_seconds": round(seconds, 1)
+        })
+    
+    return {
+        "paths": paths,
+        "estimated_cpu_minutes_saved": round(saved / 60, 1)
+    }
@@ -7,29 +7,52 @@ Compression Standards:
 - Video: H.264 (MPEG-4 AVC) + AAC audio in MP4 container
 - Images: WebP (preferred) or optimized JPEG
 - Audio: AAC in M4A container
+
+Uploads are probed first (see plan_processing): web-ready videos are only
+remuxed, small images are stored as-is and over-long media is rejected.
 """
 import os
+import re
 import uuid
+import shutil
+import asyncio
+import functools
 import subprocess
 import tempfile
+import threading
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 from dataclasses import dataclass
 
+from app.core.config import settings as app_settings
+from app.services import image_codec
+
 logger = logging.getLogger(__name__)
 
+# How often a cancellable FFmpeg run checks its cancel event
+CANCEL_POLL_SECONDS = 1.0
+
+
+class ProcessingCancelledError(Exception):
+    """Raised when the caller's cancel event stops an FFmpeg run."""
+    pass
+
 
 @dataclass
 class CompressionResult:
     """Result of media compression."""
     success: bool
-    compressed_content: Optional[bytes] = None
+    output_path: Optional[str] = None  # Compressed file (or the input, when kept as-is)
     output_filename: str = ""
     original_size: int = 0
     compressed_size: int = 0
     content_type: str = ""
     error: Optional[str] = None
+    waveform: Optional[List[int]] = None  # Audio peaks (0-127) computed during the encode
     
     @property
     def compression_ratio(self) -> float:
@@ -44,6 +67,49 @@ class CompressionResult:
         return f"{self.compression_ratio * 100:.1f}%"
 
 
+# Processing plans returned by MediaCompressionService.plan_processing()
+PLAN_TRANSCODE = "transcode"  # Full re-encode
+PLAN_REMUX = "remux"          # Stream copy into MP4 with faststart
+PLAN_SKIP = "skip"            # Store the original as-is
+PLAN_REJECT = "reject"        # Refuse before spending CPU
+
+
+@dataclass
+class ProcessingPlan:
+    """Decision taken after probing an upload."""
+    action: str
+    reason: str = ""
+    duration: Optional[float] = None  # Seconds, for audio/video
+
+
+# Waveform peaks are computed from mono 8-bit PCM at this rate: enough to
+# place peaks at 1-2k buckets per track, and ~14MB per hour of audio
+WAVEFORM_SAMPLE_RATE = 4000
+
+# Signed 8-bit sample byte -> magnitude (0-127)
+_S8_MAGNITUDE = bytes(min(127, abs(b - 256 if b > 127 else b)) for b in range(256))
+
+
+def _read_waveform(raw_file: str, buckets: int) -> Optional[List[int]]:
+    """Reduce raw s8 PCM to at most `buckets` peaks, normalized to 0-127."""
+    with open(raw_file, "rb") as f:
+        magnitudes = f.read().translate(_S8_MAGNITUDE)
+    if not magnitudes:
+        return None
+    size = -(-len(magnitudes) // buckets)
+    peaks = [max(magnitudes[i:i + size]) for i in range(0, len(magnitudes), size)]
+    top = max(peaks) or 1
+    return [round(peak * 127 / top) for peak in peaks]
+
+
+def _parse_bitrate(value: str) -> int:
+    """Convert an FFmpeg bitrate string ("2M", "128k") to bits per second."""
+    multipliers = {"k": 1_000, "M": 1_000_000}
+    if value and value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
 class MediaCompressionService:
     """Service for compressing media files using FFmpeg.
     
@@ -80,6 +146,15 @@ class MediaCompressionService:
         },
     }
     
+    # HLS ladder rungs, keyed by the short side of the picture (height for
+    # landscape, width for portrait). Bitrates are capped with maxrate/bufsize.
+    HLS_RUNGS = {
+        1080: {"video_bitrate": "4500k", "audio_bitrate": "128k"},
+        720: {"video_bitrate": "2500k", "audio_bitrate": "128k"},
+        480: {"video_bitrate": "1200k", "audio_bitrate": "96k"},
+        360: {"video_bitrate": "700k", "audio_bitrate": "96k"},
+    }
+    
     # Image quality presets (1-100 scale)
     IMAGE_PRESETS = {
         "high": {"quality": 90, "max_dimension": 2560},
@@ -87,6 +162,9 @@ class MediaCompressionService:
         "low": {"quality": 75, "max_dimension": 1280},
     }
     
+    # Image codecs browsers display natively (stored as-is when small enough)
+    WEB_IMAGE_CODECS = {"mjpeg", "png", "webp"}
+    
     # Audio compression presets (AAC)
     AUDIO_PRESETS = {
         "high": {"bitrate": "192k", "sample_rate": 48000},
@@ -99,6 +177,42 @@ class MediaCompressionService:
         self.ffmpeg_available = self._check_ffmpeg()
         self.ffprobe_available = self._check_ffprobe()
         
+        # Photos are decoded/encoded in-process with Pillow unless the FFmpeg
+        # backend is selected; FFmpeg remains the fallback for inputs Pillow
+        # cannot handle (animated images, exotic formats)
+        self.image_backend = (
+            "pillow"
+            if app_settings.COMPRESSION_IMAGE_BACKEND == "pillow"
+            and image_codec.is_available(app_settings.COMPRESSION_IMAGE_FORMAT)
+            else "ffmpeg"
+        )
+        
+        # Concurrency limits shared by every caller (request handlers, transcode
+        # worker threads). Per-type slots are taken before the global slot so a
+        # burst of video encodes cannot starve image/audio jobs.
+        cpu_count = os.cpu_count() or 1
+        self.max_concurrency = app_settings.COMPRESSION_MAX_CONCURRENCY or cpu_count
+        self.type_limits = {
+            "video": app_settings.COMPRESSION_MAX_VIDEO_JOBS or max(1, cpu_count // 2),
+            "image": app_settings.COMPRESSION_MAX_IMAGE_JOBS or cpu_count,
+            "audio": app_settings.COMPRESSION_MAX_AUDIO_JOBS or cpu_count,
+        }
+        self._global_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._type_slots = {
+            kind: threading.BoundedSemaphore(limit) for kind, limit in self.type_limits.items()
+        }
+        
+        # Dedicated threads for async callers, so FFmpeg work never runs on the
+        # event loop and waiting for a slot doesn't use up Starlette's threadpool.
+        # Threads parked on a semaphore are cheap; the slots above do the limiting.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(32, self.max_concurrency + sum(self.type_limits.values())),
+            thread_name_prefix="ffmpeg"
+        )
+        
+        # Cancel event of the calling thread, see cancellable()
+        self._local = threading.local()
+        
         if self.ffmpeg_available:
             logger.info("FFmpeg compression service initialized successfully")
         else:
@@ -135,6 +249,69 @@ class MediaCompressionService:
         """Check if compression service is available."""
         return self.ffmpeg_available
     
+    def is_image_available(self) -> bool:
+        """Check if image compression is available (Pillow or FFmpeg)."""
+        return self.image_backend == "pillow" or self.ffmpeg_available
+    
+    @contextmanager
+    def cancellable(self, cancel: Optional[threading.Event]):
+        """
+        Make FFmpeg runs on this thread stop once cancel is set.
+        
+        The running FFmpeg process is killed and ProcessingCancelledError
+        raised out of whichever method started it, instead of being
+        reported as a failed CompressionResult.
+        """
+        previous = getattr(self._local, "cancel", None)
+        self._local.cancel = cancel
+        try:
+            yield
+        finally:
+            self._local.cancel = previous
+    
+    def _run_ffmpeg(self, cmd: list, kind: str, timeout: int) -> subprocess.CompletedProcess:
+        """Run an FFmpeg command once a per-type and a global slot are free."""
+        cancel = getattr(self._local, "cancel", None)
+        with self._type_slots[kind], self._global_slots:
+            if cancel is None:
+                return subprocess.run(cmd, capture_output=True, timeout=timeout)
+            return self._run_cancellable(cmd, timeout, cancel)
+    
+    @staticmethod
+    def _run_cancellable(cmd: list, timeout: int, cancel: threading.Event) -> subprocess.CompletedProcess:
+        """subprocess.run() that also kills the process once cancel is set."""
+        if cancel.is_set():
+            raise ProcessingCancelledError("Processing cancelled")
+        deadline = time.monotonic() + timeout
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+            while True:
+                try:
+                    stdout, stderr = process.communicate(timeout=CANCEL_POLL_SECONDS)
+                    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+                except subprocess.TimeoutExpired:
+                    if cancel.is_set():
+                        process.kill()
+                        process.communicate()
+                        raise ProcessingCancelledError("Processing cancelled")
+                    if time.monotonic() > deadline:
+                        process.kill()
+                        process.communicate()
+                        raise subprocess.TimeoutExpired(cmd, timeout)
+    
+    def _run_in_process(self, kind: str, func, *args):
+        """Run in-process codec work under the same slots as FFmpeg commands."""
+        with self._type_slots[kind], self._global_slots:
+            return func(*args)
+    
+    async def run_async(self, func, *args, **kwargs):
+        """
+        Run a blocking compression call in the FFmpeg thread pool.
+        
+        Use from async handlers so encodes never block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
     def get_media_info(self, file_path: str) -> Optional[dict]:
         """Get media file information using FFprobe."""
         if not self.ffprobe_available:
@@ -157,50 +334,49 @@ class MediaCompressionService:
             logger.debug(f"Could not get media info: {e}")
         return None
     
-    def compress_video(
+    def compress_video_file(
         self,
-        content: bytes,
+        input_file: str,
         original_filename: str,
         preset: str = "standard"
     ) -> CompressionResult:
         """
-        Compress video using H.264/AAC in MP4 container.
+        Compress a video file on disk using H.264/AAC in MP4 container.
         
         This is the industry standard for web video with universal browser support.
         Maintains original resolution up to preset max, optimizes bitrate.
         
+        The result's ``output_path`` points at the file to store: a new temp
+        file when compression helped, or ``input_file`` itself when it did not.
+        The caller owns both files and must delete them.
+        
         Args:
-            content: Raw video bytes
+            input_file: Path to the raw video
             original_filename: Original filename for extension detection
             preset: Quality preset (high, standard, low)
-            
+        
         Returns:
-            CompressionResult with compressed video
+            CompressionResult with output_path set on success
         """
+        original_size = os.path.getsize(input_file)
+        
         if not self.ffmpeg_available:
             return CompressionResult(
                 success=False,
                 error="FFmpeg not available on this system",
-                original_size=len(content)
+                original_size=original_size
             )
         
         settings = self.VIDEO_PRESETS.get(preset, self.VIDEO_PRESETS["standard"])
-        original_size = len(content)
         
         # Get input extension
         input_ext = Path(original_filename).suffix.lower() if original_filename else ".mp4"
         if not input_ext:
             input_ext = ".mp4"
         
-        input_file = None
         output_file = None
         
         try:
-            # Write input to temp file
-            with tempfile.NamedTemporaryFile(suffix=input_ext, delete=False) as f:
-                f.write(content)
-                input_file = f.name
-            
             # Output file (always MP4 for compatibility)
             output_file = tempfile.mktemp(suffix=".mp4")
             
@@ -232,9 +408,9 @@ class MediaCompressionService:
             logger.info(f"Compressing video: {original_filename} ({original_size/1024/1024:.2f}MB)")
             logger.debug(f"FFmpeg command: {' '.join(cmd)}")
             
-            result = subprocess.run(
+            result = self._run_ffmpeg(
                 cmd,
-                capture_output=True,
+                "video",
                 timeout=600  # 10 minute timeout for large videos
             )
             
@@ -247,19 +423,15 @@ class MediaCompressionService:
                     original_size=original_size
                 )
             
-            # Read compressed output
-            with open(output_file, "rb") as f:
-                compressed_content = f.read()
-            
-            compressed_size = len(compressed_content)
+            compressed_size = os.path.getsize(output_file)
             output_filename = f"{uuid.uuid4()}.mp4"
             
             # Only use compressed version if it's actually smaller
             if compressed_size >= original_size:
-                logger.info(f"Compression did not reduce size, using original")
+                logger.info("Compression did not reduce size, using original")
                 return CompressionResult(
                     success=True,
-                    compressed_content=content,
+                    output_path=input_file,
                     output_filename=f"{uuid.uuid4()}{input_ext}",
                     original_size=original_size,
                     compressed_size=original_size,
@@ -272,15 +444,19 @@ class MediaCompressionService:
                 f"({(1-compressed_size/original_size)*100:.1f}% reduction)"
             )
             
-            return CompressionResult(
+            result = CompressionResult(
                 success=True,
-                compressed_content=compressed_content,
+                output_path=output_file,
                 output_filename=output_filename,
                 original_size=original_size,
                 compressed_size=compressed_size,
                 content_type="video/mp4"
             )
+            output_file = None  # Ownership passes to the caller
+            return result
             
+        except ProcessingCancelledError:
+            raise
         except subprocess.TimeoutExpired:
             logger.error("Video compression timed out (exceeded 10 minutes)")
             return CompressionResult(
@@ -296,63 +472,357 @@ class MediaCompressionService:
                 original_size=original_size
             )
         finally:
-            # Cleanup temp files
-            if input_file and os.path.exists(input_file):
+            # Cleanup temp output unless it was handed to the caller
+            if output_file and os.path.exists(output_file):
                 try:
-                    os.unlink(input_file)
+                    os.unlink(output_file)
                 except Exception:
                     pass
+    
+    def plan_processing(self, input_file: str, media_type: str, preset: str = "standard") -> ProcessingPlan:
+        """
+        Probe an upload and decide how much work it needs.
+        
+        - Audio/video longer than the configured maximum is rejected.
+        - H.264 video in yuv420p with AAC (or no) audio, within the preset's
+          frame size and bitrate cap, is remuxed instead of re-encoded.
+        - JPEG/PNG/WebP images under COMPRESSION_IMAGE_SKIP_MAX_BYTES and the
+          preset's max dimension are stored as-is, unless they carry EXIF,
+          GPS or XMP metadata (re-encoding strips it).
+        
+        Anything else, or any file FFprobe cannot read, is transcoded.
+        
+        Args:
+            input_file: Path to the upload
+            media_type: photo, video or audio
+            preset: Quality preset (high, standard, low)
+        
+        Returns:
+            ProcessingPlan with the chosen action
+        """
+        if media_type == "photo" and self.image_backend == "pillow":
+            return self._plan_image(input_file, preset)
+        
+        info = self.get_media_info(input_file)
+        if not info:
+            return ProcessingPlan(PLAN_TRANSCODE, "probe unavailable")
+        
+        streams = info.get("streams", [])
+        video = next((
+            st for st in streams
+            if st.get("codec_type") == "video" and not st.get("disposition", {}).get("attached_pic")
+        ), None)
+        audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+        try:
+            duration = float(info.get("format", {}).get("duration"))
+        except (TypeError, ValueError):
+            duration = None
+        
+        max_duration = {
+            "video": app_settings.MEDIA_MAX_VIDEO_DURATION_SECONDS,
+            "audio": app_settings.MEDIA_MAX_AUDIO_DURATION_SECONDS,
+        }.get(media_type)
+        if max_duration and duration and duration > max_duration:
+            return ProcessingPlan(
+                PLAN_REJECT,
+                f"{media_type.capitalize()} is {int(duration) // 60}:{int(duration) % 60:02d} long; "
+                f"maximum is {max_duration // 60}:{max_duration % 60:02d}",
+                duration
+            )
+        
+        if media_type == "video" and video:
+            settings = self.VIDEO_PRESETS.get(preset, self.VIDEO_PRESETS["standard"])
+            width, height = video.get("width", 0), video.get("height", 0)
+            bitrate = video.get("bit_rate") or info.get("format", {}).get("bit_rate")
+            checks = {
+                "codec": video.get("codec_name") == "h264",
+                "pixel format": video.get("pix_fmt") in ("yuv420p", "yuvj420p"),
+                "audio codec": audio is None or audio.get("codec_name") == "aac",
+                "frame size": (
+                    max(width, height) <= settings["max_width"]
+                    and min(width, height) <= settings["max_height"]
+                ),
+                "bitrate": bool(bitrate) and int(bitrate) <= _parse_bitrate(settings["video_bitrate"]),
+            }
+            failed = [name for name, ok in checks.items() if not ok]
+            if not failed:
+                return ProcessingPlan(PLAN_REMUX, f"h264 {width}x{height} at {int(bitrate) // 1000}kbps", duration)
+            return ProcessingPlan(PLAN_TRANSCODE, f"needs encode: {', '.join(failed)}", duration)
+        
+        if media_type == "photo" and video:
+            return self._plan_image_stream(
+                input_file, preset, video.get("codec_name"), video.get("width", 0), video.get("height", 0)
+            )
+        
+        return ProcessingPlan(PLAN_TRANSCODE, duration=duration)
+    
+    def _plan_image(self, input_file: str, preset: str) -> ProcessingPlan:
+        """plan_processing() for photos, reading the header with Pillow instead of FFprobe."""
+        probe = image_codec.probe_image(input_file)
+        if not probe:
+            return ProcessingPlan(PLAN_TRANSCODE, "probe unavailable")
+        return self._plan_image_stream(input_file, preset, *probe)
+    
+    def _plan_image_stream(self, input_file: str, preset: str, codec: str, width: int, height: int) -> ProcessingPlan:
+        """Skip small web-ready images without metadata, transcode everything else."""
+        settings = self.IMAGE_PRESETS.get(preset, self.IMAGE_PRESETS["standard"])
+        size = os.path.getsize(input_file)
+        if (
+            codec in self.WEB_IMAGE_CODECS
+            and size <= app_settings.COMPRESSION_IMAGE_SKIP_MAX_BYTES
+            and max(width, height) <= settings["max_dimension"]
+        ):
+            if image_codec.has_metadata(input_file):
+                # Stored as-is, the EXIF (camera, GPS position) would be public
+                return ProcessingPlan(PLAN_TRANSCODE, "needs encode: strip metadata")
+            return ProcessingPlan(PLAN_SKIP, f"{codec} {width}x{height}, {size // 1024}KB")
+        return ProcessingPlan(PLAN_TRANSCODE)
+    
+    def remux_video_file(self, input_file: str) -> CompressionResult:
+        """
+        Copy the video (and first audio) stream into MP4 with faststart.
+        
+        Used when plan_processing() finds the streams already web-ready, so
+        no decode or encode happens. See compress_video_file() for
+        output_path ownership.
+        
+        Args:
+            input_file: Path to the raw video
+        
+        Returns:
+            CompressionResult with output_path set on success
+        """
+        original_size = os.path.getsize(input_file)
+        output_file = tempfile.mktemp(suffix=".mp4")
+        cmd = [
+            "ffmpeg",
+            "-i", input_file,
+            "-map", "0:v:0",
+            "-map", "0:a:0?",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y",
+            output_file
+        ]
+        
+        try:
+            result = self._run_ffmpeg(cmd, "video", timeout=300)
+            if result.returncode != 0:
+                error_msg = result.stderr.decode(errors="ignore") if result.stderr else "Unknown FFmpeg error"
+                logger.error(f"FFmpeg remux failed: {error_msg[-300:]}")
+                return CompressionResult(
+                    success=False,
+                    error=f"Video remux failed: {error_msg[-200:]}",
+                    original_size=original_size
+                )
+            
+            remuxed = CompressionResult(
+                success=True,
+                output_path=output_file,
+                output_filename=f"{uuid.uuid4()}.mp4",
+                original_size=original_size,
+                compressed_size=os.path.getsize(output_file),
+                content_type="video/mp4"
+            )
+            output_file = None  # Ownership passes to the caller
+            return remuxed
+        except ProcessingCancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Video remux error: {str(e)}")
+            return CompressionResult(success=False, error=str(e), original_size=original_size)
+        finally:
             if output_file and os.path.exists(output_file):
                 try:
                     os.unlink(output_file)
                 except Exception:
                     pass
     
-    def compress_image(
+    def _probe_video_streams(self, input_file: str) -> Optional[dict]:
+        """
+        Read frame size and audio presence from FFmpeg's input banner.
+        
+        Works without FFprobe and without decoding any frames.
+        
+        Returns:
+            Dict with width, height and has_audio, or None if no video stream was found
+        """
+        try:
+            result = subprocess.run(
+                ["ffmpeg", "-hide_banner", "-i", input_file],
+                capture_output=True,
+                timeout=30
+            )
+        except Exception as e:
+            logger.debug(f"Could not probe video streams: {e}")
+            return None
+        
+        stderr = result.stderr.decode(errors="ignore") if result.stderr else ""
+        match = re.search(r"Stream #0:\d+.*?: Video:.*?, (\d+)x(\d+)", stderr)
+        if not match:
+            return None
+        return {
+            "width": int(match.group(1)),
+            "height": int(match.group(2)),
+            "has_audio": re.search(r"Stream #0:\d+.*?: Audio:", stderr) is not None
+        }
+    
+    def generate_hls_ladder(
         self,
-        content: bytes,
+        input_file: str,
+        rungs: List[int],
+        preset: str = "standard",
+        segment_seconds: int = 4
+    ) -> Optional[str]:
+        """
+        Package a video as an HLS adaptive-bitrate ladder in one FFmpeg run.
+        
+        The source is decoded once and fanned out with the split filter, one
+        scale and H.264 encode per rung. Keyframes are forced on segment
+        boundaries so players can switch rungs at any segment. Rungs larger
+        than the source are dropped; a source smaller than every rung gets a
+        single rung at its own size.
+        
+        Output layout (relative paths, so the playlists work from any prefix):
+            master.m3u8
+            v<N>/index.m3u8
+            v<N>/seg_<NNN>.ts
+        
+        Args:
+            input_file: Path to the source video
+            rungs: Short-side sizes in pixels (see HLS_RUNGS)
+            preset: Quality preset (high, standard, low); selects the x264 speed
+            segment_seconds: Target segment duration
+        
+        Returns:
+            Path of a temp directory holding the ladder (caller must delete it), or None on failure
+        """
+        if not self.ffmpeg_available:
+            return None
+        
+        streams = self._probe_video_streams(input_file)
+        if not streams:
+            logger.warning(f"HLS packaging skipped, no video stream found in {input_file}")
+            return None
+        
+        settings = self.VIDEO_PRESETS.get(preset, self.VIDEO_PRESETS["standard"])
+        portrait = streams["height"] > streams["width"]
+        source_short = min(streams["width"], streams["height"])
+        
+        known = sorted((r for r in set(rungs) if r in self.HLS_RUNGS), reverse=True)
+        ladder = [(r, r) for r in known if r <= source_short]
+        if not ladder and known:
+            # Small source: one rung at its own (even) size, smallest rung's bitrates
+            ladder = [(source_short - source_short % 2, known[-1])]
+        if not ladder:
+            return None
+        
+        labels = "".join(f"[v{i}]" for i in range(len(ladder)))
+        filters = [f"[0:v]split={len(ladder)}{labels}"]
+        for i, (size, _) in enumerate(ladder):
+            scale = f"{size}:-2" if portrait else f"-2:{size}"
+            filters.append(f"[v{i}]scale={scale}[o{i}]")
+        
+        output_dir = tempfile.mkdtemp(prefix="hls_")
+        cmd = ["ffmpeg", "-y", "-i", input_file, "-filter_complex", ";".join(filters)]
+        stream_map = []
+        for i, (_, rung) in enumerate(ladder):
+            bitrate = self.HLS_RUNGS[rung]["video_bitrate"]
+            kbps = int(bitrate.rstrip("k"))
+            cmd += [
+                "-map", f"[o{i}]",
+                f"-b:v:{i}", bitrate,
+                f"-maxrate:v:{i}", f"{int(kbps * 1.1)}k",
+                f"-bufsize:v:{i}", f"{kbps * 2}k",
+            ]
+            if streams["has_audio"]:
+                cmd += ["-map", "0:a:0", f"-b:a:{i}", self.HLS_RUNGS[rung]["audio_bitrate"]]
+                stream_map.append(f"v:{i},a:{i}")
+            else:
+                stream_map.append(f"v:{i}")
+        
+        cmd += [
+            "-c:v", "libx264",
+            "-preset", settings["preset"],
+            "-pix_fmt", "yuv420p",
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+            "-sc_threshold", "0",
+        ]
+        if streams["has_audio"]:
+            cmd += ["-c:a", "aac", "-ac", "2"]
+        cmd += [
+            "-f", "hls",
+            "-hls_time", str(segment_seconds),
+            "-hls_playlist_type", "vod",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", os.path.join(output_dir, "v%v", "seg_%03d.ts"),
+            "-master_pl_name", "master.m3u8",
+            "-var_stream_map", " ".join(stream_map),
+            os.path.join(output_dir, "v%v", "index.m3u8")
+        ]
+        
+        logger.info(f"Packaging HLS ladder {[size for size, _ in ladder]} for {input_file}")
+        logger.debug(f"FFmpeg command: {' '.join(cmd)}")
+        
+        try:
+            result = self._run_ffmpeg(cmd, "video", timeout=900)
+            if result.returncode == 0 and os.path.exists(os.path.join(output_dir, "master.m3u8")):
+                return output_dir
+            error_msg = result.stderr.decode(errors="ignore") if result.stderr else "Unknown FFmpeg error"
+            logger.error(f"FFmpeg HLS packaging failed: {error_msg[-500:]}")
+        except ProcessingCancelledError:
+            raise
+        except subprocess.TimeoutExpired:
+            logger.error("HLS packaging timed out (exceeded 15 minutes)")
+        except Exception as e:
+            logger.error(f"HLS packaging error: {str(e)}")
+        
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return None
+    
+    def compress_image_file(
+        self,
+        input_file: str,
         original_filename: str,
         preset: str = "standard",
         output_format: str = "webp"
     ) -> CompressionResult:
         """
-        Compress image using FFmpeg.
+        Compress image with the configured backend (Pillow or FFmpeg).
         
         WebP provides best compression with transparency support.
-        Falls back to JPEG for maximum compatibility.
+        Falls back to JPEG for maximum compatibility. Inputs Pillow cannot
+        handle go through FFmpeg.
+        
+        See compress_video_file() for output_path ownership.
         
         Args:
-            content: Raw image bytes
+            input_file: Path to the raw image
             original_filename: Original filename
             preset: Quality preset (high, standard, low)
             output_format: Output format (webp recommended, jpeg fallback)
             
         Returns:
-            CompressionResult with compressed image
+            CompressionResult with output_path set on success
         """
-        if not self.ffmpeg_available:
+        original_size = os.path.getsize(input_file)
+        
+        if not self.is_image_available():
             return CompressionResult(
                 success=False,
                 error="FFmpeg not available on this system",
-                original_size=len(content)
+                original_size=original_size
             )
         
         settings = self.IMAGE_PRESETS.get(preset, self.IMAGE_PRESETS["standard"])
-        original_size = len(content)
         
         input_ext = Path(original_filename).suffix.lower() if original_filename else ".jpg"
         if not input_ext:
             input_ext = ".jpg"
         
-        input_file = None
         output_file = None
         
         try:
-            # Write input to temp file
-            with tempfile.NamedTemporaryFile(suffix=input_ext, delete=False) as f:
-                f.write(content)
-                input_file = f.name
-            
             # Determine output format and extension
             if output_format == "webp":
                 output_ext = ".webp"
@@ -363,59 +833,67 @@ class MediaCompressionService:
             
             output_file = tempfile.mktemp(suffix=output_ext)
             
-            # Scale filter: maintain aspect ratio, limit to max dimension
-            max_dim = settings["max_dimension"]
-            scale_filter = f"scale='min({max_dim},iw)':'min({max_dim},ih)':force_original_aspect_ratio=decrease"
-            
-            # Build FFmpeg command
-            if output_format == "webp":
-                cmd = [
-                    "ffmpeg",
-                    "-i", input_file,
-                    "-vf", scale_filter,
-                    "-quality", str(settings["quality"]),
-                    "-compression_level", "4",  # Balance speed/size
-                    "-y",
-                    output_file
-                ]
-            else:
-                # JPEG: q:v scale is 2-31 (lower = better)
-                jpeg_quality = max(2, int(31 - (settings["quality"] / 100 * 29)))
-                cmd = [
-                    "ffmpeg",
-                    "-i", input_file,
-                    "-vf", scale_filter,
-                    "-q:v", str(jpeg_quality),
-                    "-y",
-                    output_file
-                ]
-            
-            logger.info(f"Compressing image: {original_filename} ({original_size/1024:.1f}KB)")
+            logger.info(f"Compressing image: {original_filename} ({original_size/1024:.1f}KB, {self.image_backend})")
             
-            result = subprocess.run(cmd, capture_output=True, timeout=60)
-            
-            if result.returncode != 0:
-                error_msg = result.stderr.decode() if result.stderr else "Unknown error"
-                logger.error(f"FFmpeg image compression failed: {error_msg[:300]}")
+            max_dim = settings["max_dimension"]
+            encoded = self.image_backend == "pillow" and self._run_in_process(
+                "image", image_codec.encode_image,
+                input_file, output_file, max_dim, settings["quality"], output_format
+            )
+            if not encoded and not self.ffmpeg_available:
                 return CompressionResult(
                     success=False,
-                    error=f"Image compression failed: {error_msg[:200]}",
+                    error="Unsupported image and FFmpeg not available on this system",
                     original_size=original_size
                 )
             
-            # Read compressed output
-            with open(output_file, "rb") as f:
-                compressed_content = f.read()
+            if not encoded:
+                # Scale filter: maintain aspect ratio, limit to max dimension
+                scale_filter = f"scale='min({max_dim},iw)':'min({max_dim},ih)':force_original_aspect_ratio=decrease"
+                
+                # Build FFmpeg command
+                if output_format == "webp":
+                    cmd = [
+                        "ffmpeg",
+                        "-i", input_file,
+                        "-vf", scale_filter,
+                        "-quality", str(settings["quality"]),
+                        "-compression_level", "4",  # Balance speed/size
+                        "-y",
+                        output_file
+                    ]
+                else:
+                    # JPEG: q:v scale is 2-31 (lower = better)
+                    jpeg_quality = max(2, int(31 - (settings["quality"] / 100 * 29)))
+                    cmd = [
+                        "ffmpeg",
+                        "-i", input_file,
+                        "-vf", scale_filter,
+                        "-q:v", str(jpeg_quality),
+                        "-y",
+                        output_file
+                    ]
+                
+                result = self._run_ffmpeg(cmd, "image", timeout=60)
+                
+                if result.returncode != 0:
+                    error_msg = result.stderr.decode() if result.stderr else "Unknown error"
+                    logger.error(f"FFmpeg image compression failed: {error_msg[:300]}")
+                    return CompressionResult(
+                        success=False,
+                        error=f"Image compression failed: {error_msg[:200]}",
+                        original_size=original_size
+                    )
             
-            compressed_size = len(compressed_content)
+            compressed_size = os.path.getsize(output_file)
             output_filename = f"{uuid.uuid4()}{output_ext}"
             
-            # Only use compressed if smaller
-            if compressed_size >= original_size:
-                logger.info(f"Compression did not reduce size, using original")
+            # Only use compressed if smaller, and never publish the original's metadata
+            if compressed_size >= original_size and not image_codec.has_metadata(input_file):
+                logger.info("Compression did not reduce size, using original")
                 return CompressionResult(
                     success=True,
-                    compressed_content=content,
+                    output_path=input_file,
                     output_filename=f"{uuid.uuid4()}{input_ext}",
                     original_size=original_size,
                     compressed_size=original_size,
@@ -427,15 +905,19 @@ class MediaCompressionService:
                 f"({(1-compressed_size/original_size)*100:.1f}% reduction)"
             )
             
-            return CompressionResult(
+            result = CompressionResult(
                 success=True,
-                compressed_content=compressed_content,
+                output_path=output_file,
                 output_filename=output_filename,
                 original_size=original_size,
                 compressed_size=compressed_size,
                 content_type=content_type
             )
+            output_file = None  # Ownership passes to the caller
+            return result
             
+        except ProcessingCancelledError:
+            raise
         except subprocess.TimeoutExpired:
             logger.error("Image compression timed out")
             return CompressionResult(
@@ -451,20 +933,132 @@ class MediaCompressionService:
                 original_size=original_size
             )
         finally:
-            if input_file and os.path.exists(input_file):
-                try:
-                    os.unlink(input_file)
-                except Exception:
-                    pass
             if output_file and os.path.exists(output_file):
                 try:
                     os.unlink(output_file)
                 except Exception:
                     pass
     
-    def compress_audio(
+    def generate_image_variants(
         self,
-        content: bytes,
+        input_file: str,
+        widths: List[int],
+        preset: str = "standard",
+        output_format: str = "webp"
+    ) -> Dict[int, str]:
+        """
+        Render resized copies of an image at several widths in one pass.
+        
+        The source is decoded once: in-process with the Pillow backend, or in
+        one FFmpeg run fanned out with the split filter, one scale per width.
+        Widths at or above the source width are discarded, since the
+        compressed original already covers them.
+        
+        Args:
+            input_file: Path to the source image
+            widths: Target widths in pixels
+            preset: Quality preset (high, standard, low)
+            output_format: Output format (webp recommended, jpeg fallback)
+        
+        Returns:
+            Dict of width -> temp file path (caller must delete); empty on failure
+        """
+        widths = sorted(set(w for w in widths if w > 0))
+        if not self.is_image_available() or not widths:
+            return {}
+        
+        settings = self.IMAGE_PRESETS.get(preset, self.IMAGE_PRESETS["standard"])
+        output_ext = ".webp" if output_format == "webp" else ".jpg"
+        
+        if self.image_backend == "pillow":
+            variants = self._generate_image_variants_pillow(input_file, widths, settings, output_format, output_ext)
+            if variants is not None or not self.ffmpeg_available:
+                return variants or {}
+        
+        labels = "".join(f"[v{i}]" for i in range(len(widths)))
+        filters = [f"[0:v]split={len(widths)}{labels}"]
+        filters += [
+            f"[v{i}]scale='min({width},iw)':-1[o{i}]"
+            for i, width in enumerate(widths)
+        ]
+        
+        cmd = ["ffmpeg", "-y", "-i", input_file, "-filter_complex", ";".join(filters)]
+        outputs = {}
+        for i, width in enumerate(widths):
+            outputs[width] = tempfile.mktemp(suffix=f"_w{width}{output_ext}")
+            if output_format == "webp":
+                codec_args = ["-quality", str(settings["quality"]), "-compression_level", "4"]
+            else:
+                codec_args = ["-q:v", str(max(2, int(31 - (settings["quality"] / 100 * 29))))]
+            cmd += ["-map", f"[o{i}]", "-frames:v", "1", *codec_args, outputs[width]]
+        
+        variants = {}
+        try:
+            result = self._run_ffmpeg(cmd, "image", timeout=120)
+            stderr = result.stderr.decode(errors="ignore") if result.stderr else ""
+            if result.returncode != 0:
+                logger.error(f"FFmpeg image variants failed: {stderr[:300]}")
+                return {}
+            
+            # Source width from FFmpeg's input stream banner
+            match = re.search(r"Stream #0:0.*?Video:.*?, (\d+)x(\d+)", stderr)
+            source_width = int(match.group(1)) if match else None
+            
+            variants = {
+                width: path for width, path in outputs.items()
+                if source_width is None or width < source_width
+            }
+            logger.info(f"Generated image variants {sorted(variants)} (source width {source_width})")
+            return variants
+        
+        except ProcessingCancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Image variant error: {str(e)}")
+            return {}
+        finally:
+            for width, path in outputs.items():
+                if width not in variants and os.path.exists(path):
+                    try:
+                        os.unlink(path)
+                    except Exception:
+                        pass
+    
+    def _generate_image_variants_pillow(
+        self,
+        input_file: str,
+        widths: List[int],
+        settings: dict,
+        output_format: str,
+        output_ext: str
+    ) -> Optional[Dict[int, str]]:
+        """Pillow half of generate_image_variants(); None if Pillow cannot read the input."""
+        outputs = {width: tempfile.mktemp(suffix=f"_w{width}{output_ext}") for width in widths}
+        variants = {}
+        try:
+            written, source_width = self._run_in_process(
+                "image", image_codec.render_variants,
+                input_file, outputs, settings["quality"], output_format
+            )
+            if source_width is None:
+                return None
+            variants = {width: outputs[width] for width in written}
+            logger.info(f"Generated image variants {sorted(variants)} (source width {source_width}, pillow)")
+            return variants
+        except Exception as e:
+            logger.error(f"Image variant error: {str(e)}")
+            return {}
+        finally:
+            for width, path in outputs.items():
+                if width not in variants and os.path.exists(path):
+                    try:
+                        os.unlink(path)
+                    except Exception:
+                        pass
+    
+    def compress_audio_file(
+        self,
+        input_file: str,
         original_filename: str,
         preset: str = "standard"
     ) -> CompressionResult:
@@ -474,37 +1068,35 @@ class MediaCompressionService:
         AAC provides excellent quality at lower bitrates than MP3.
         M4A container is universally supported.
         
+        See compress_video_file() for output_path ownership.
+        
         Args:
-            content: Raw audio bytes
+            input_file: Path to the raw audio
             original_filename: Original filename
             preset: Quality preset (high, standard, low)
             
         Returns:
-            CompressionResult with compressed audio
+            CompressionResult with output_path set on success
         """
+        original_size = os.path.getsize(input_file)
+        
         if not self.ffmpeg_available:
             return CompressionResult(
                 success=False,
                 error="FFmpeg not available on this system",
-                original_size=len(content)
+                original_size=original_size
             )
         
         settings = self.AUDIO_PRESETS.get(preset, self.AUDIO_PRESETS["standard"])
-        original_size = len(content)
         
         input_ext = Path(original_filename).suffix.lower() if original_filename else ".mp3"
         if not input_ext:
             input_ext = ".mp3"
         
-        input_file = None
         output_file = None
+        waveform_file = None
         
         try:
-            # Write input to temp file
-            with tempfile.NamedTemporaryFile(suffix=input_ext, delete=False) as f:
-                f.write(content)
-                input_file = f.name
-            
             # Output file (AAC in M4A container for compatibility)
             output_file = tempfile.mktemp(suffix=".m4a")
             
@@ -520,9 +1112,14 @@ class MediaCompressionService:
                 output_file
             ]
             
+            # Second output from the same decode: low-rate mono PCM for waveform peaks
+            if app_settings.AUDIO_WAVEFORM_PEAKS > 0:
+                waveform_file = tempfile.mktemp(suffix=".s8")
+                cmd += self._waveform_output(waveform_file)
+            
             logger.info(f"Compressing audio: {original_filename} ({original_size/1024/1024:.2f}MB)")
             
-            result = subprocess.run(cmd, capture_output=True, timeout=180)  # 3 min timeout
+            result = self._run_ffmpeg(cmd, "audio", timeout=180)  # 3 min timeout
             
             if result.returncode != 0:
                 error_msg = result.stderr.decode() if result.stderr else "Unknown error"
@@ -533,23 +1130,21 @@ class MediaCompressionService:
                     original_size=original_size
                 )
             
-            # Read compressed output
-            with open(output_file, "rb") as f:
-                compressed_content = f.read()
-            
-            compressed_size = len(compressed_content)
+            compressed_size = os.path.getsize(output_file)
             output_filename = f"{uuid.uuid4()}.m4a"
+            waveform = _read_waveform(waveform_file, app_settings.AUDIO_WAVEFORM_PEAKS) if waveform_file else None
             
             # Only use compressed if smaller
             if compressed_size >= original_size:
-                logger.info(f"Compression did not reduce size, using original")
+                logger.info("Compression did not reduce size, using original")
                 return CompressionResult(
                     success=True,
-                    compressed_content=content,
+                    output_path=input_file,
                     output_filename=f"{uuid.uuid4()}{input_ext}",
                     original_size=original_size,
                     compressed_size=original_size,
-                    content_type="audio/mpeg"
+                    content_type="audio/mpeg",
+                    waveform=waveform
                 )
             
             logger.info(
@@ -557,15 +1152,20 @@ class MediaCompressionService:
                 f"({(1-compressed_size/original_size)*100:.1f}% reduction)"
             )
             
-            return CompressionResult(
+            result = CompressionResult(
                 success=True,
-                compressed_content=compressed_content,
+                output_path=output_file,
                 output_filename=output_filename,
                 original_size=original_size,
                 compressed_size=compressed_size,
-                content_type="audio/mp4"  # M4A MIME type
+                content_type="audio/mp4",  # M4A MIME type
+                waveform=waveform
             )
+            output_file = None  # Ownership passes to the caller
+            return result
             
+        except ProcessingCancelledError:
+            raise
         except subprocess.TimeoutExpired:
             logger.error("Audio compression timed out")
             return CompressionResult(
@@ -581,14 +1181,56 @@ class MediaCompressionService:
                 original_size=original_size
             )
         finally:
-            if input_file and os.path.exists(input_file):
-                try:
-                    os.unlink(input_file)
-                except Exception:
-                    pass
-            if output_file and os.path.exists(output_file):
+            for path in (output_file, waveform_file):
+                if path and os.path.exists(path):
+                    try:
+                        os.unlink(path)
+                    except Exception:
+                        pass
+    
+    @staticmethod
+    def _waveform_output(raw_file: str) -> list:
+        """FFmpeg output arguments writing the first audio stream as mono s8 PCM."""
+        return [
+            "-map", "0:a:0",
+            "-ac", "1",
+            "-ar", str(WAVEFORM_SAMPLE_RATE),
+            "-f", "s8",
+            "-y",
+            raw_file
+        ]
+    
+    def generate_waveform(self, input_file: str) -> Optional[List[int]]:
+        """
+        Compute waveform peaks for audio that is stored without re-encoding.
+        
+        compress_audio_file() already returns peaks from its own FFmpeg run;
+        this is the separate pass for uploads that skip compression.
+        
+        Returns:
+            Up to AUDIO_WAVEFORM_PEAKS values in 0-127, or None if unavailable
+        """
+        if not self.ffmpeg_available or app_settings.AUDIO_WAVEFORM_PEAKS <= 0:
+            return None
+        
+        raw_file = tempfile.mktemp(suffix=".s8")
+        try:
+            result = self._run_ffmpeg(
+                ["ffmpeg", "-i", input_file, *self._waveform_output(raw_file)], "audio", timeout=180
+            )
+            if result.returncode != 0:
+                logger.warning(f"Waveform extraction failed: {result.stderr.decode(errors='ignore')[-300:]}")
+                return None
+            return _read_waveform(raw_file, app_settings.AUDIO_WAVEFORM_PEAKS)
+        except ProcessingCancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Waveform extraction error: {str(e)}")
+            return None
+        finally:
+            if os.path.exists(raw_file):
                 try:
-                    os.unlink(output_file)
+                    os.unlink(raw_file)
                 except Exception:
                     pass
 
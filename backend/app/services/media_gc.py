@@ -0,0 +1,516 @@
+"""Garbage collection of stored media that nothing refers to any more.
+
+Replacing a profile picture, banner, project cover or portfolio file, and
+deleting portfolio items or projects, leaves the old objects in storage.
+The collector builds the set of keys the database still refers to, pages
+through the R2 bucket and/or the local uploads directory, and deletes
+objects outside that set that are older than MEDIA_GC_GRACE_HOURS.
+
+References follow the way the upload pipeline stores files:
+
+- URL columns on profiles, portfolio items, projects and project media
+- Image variants of a referenced image, and the HLS ladder stored next to
+  a referenced video (everything under "<stem>_hls/")
+- The raw direct upload of queued and running transcode jobs, and results
+  of jobs and upload sessions finished within the grace period that may
+  not be attached to a row yet
+- Media assets created or reused within the grace period, so a dedup hit
+  never hands out a deleted object
+
+Failed jobs keep nothing alive, so their raw direct uploads are removed
+once past the grace period. Media asset and image variant rows of deleted
+objects are removed along with them.
+
+delete_unreferenced_media() is the targeted variant for bulk row deletes
+(account deletion): it takes the URLs the deleted rows held and removes
+whichever objects nothing else refers to.
+"""
+import os
+import time
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from sqlalchemy import delete, or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.base import engine
+from app.db.models import (
+    Profile, PortfolioItem, Project, ProjectMedia, TranscodeJob, UploadSession, ImageVariant, MediaAsset
+)
+from app.services.s3_service import s3_service
+from app.services.media_pipeline import UPLOAD_DIR
+from app.services.transcode_queue import JOB_QUEUED, JOB_PROCESSING
+
+logger = logging.getLogger(__name__)
+
+# Storage backends
+STORAGE_R2 = "r2"
+STORAGE_LOCAL = "local"
+
+# URL prefix of files in the local uploads directory (see app.main)
+LOCAL_URL_PREFIX = "/uploads/"
+
+# Folder suffix of an HLS ladder stored next to its MP4
+HLS_FOLDER_SUFFIX = "_hls/"
+
+# Stored files that may have an HLS ladder next to them
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".webm", ".avi", ".m4v", ".m3u8")
+
+# Rows fetched per round trip while reading references
+REFERENCE_BATCH_SIZE = 1000
+
+# Objects between progress reports
+PROGRESS_INTERVAL = 1000
+
+# URL columns that keep an object alive
+REFERENCE_COLUMNS = [
+    Profile.profile_picture,
+    Profile.banner_image,
+    PortfolioItem.content_url,
+    PortfolioItem.thumbnail_url,
+    PortfolioItem.hls_url,
+    PortfolioItem.attachment_url,
+    Project.cover_image,
+    ProjectMedia.media_url,
+    ProjectMedia.thumbnail_url,
+]
+
+
+@dataclass
+class MediaGCStats:
+    """Progress and outcome of one collection pass over a storage backend."""
+    storage: str
+    dry_run: bool
+    referenced_keys: int = 0
+    scanned_objects: int = 0
+    scanned_bytes: int = 0
+    kept_recent: int = 0  # Unreferenced but inside the grace period
+    orphaned_objects: int = 0
+    orphaned_bytes: int = 0
+    deleted_objects: int = 0
+    deleted_bytes: int = 0
+    failed_deletes: int = 0
+    stale_asset_rows: int = 0
+    removed_variant_rows: int = 0
+    seconds: float = 0.0
+    
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def url_to_key(url: Optional[str]) -> Optional[str]:
+    """Storage key of an R2 or local upload URL; None for external links."""
+    if not url:
+        return None
+    if s3_service.public_url and url.startswith(s3_service.public_url + "/"):
+        return url[len(s3_service.public_url) + 1:]
+    path = urlparse(url).path
+    if path.startswith(LOCAL_URL_PREFIX):
+        return path[len(LOCAL_URL_PREFIX):]
+    return None
+
+
+def _hls_folder(key: str) -> Optional[str]:
+    """HLS ladder folder a key belongs to, e.g. "video/abc_hls/"."""
+    index = key.find(HLS_FOLDER_SUFFIX)
+    return key[:index + len(HLS_FOLDER_SUFFIX)] if index >= 0 else None
+
+
+class _References:
+    """Keys and HLS folders the database still refers to."""
+    
+    def __init__(self):
+        self.keys: Set[str] = set()
+        self.hls_folders: Set[str] = set()
+    
+    def add_key(self, key: Optional[str]) -> None:
+        if not key:
+            return
+        self.keys.add(key)
+        # A video keeps the ladder packaged next to it, a playlist keeps its segments
+        self.hls_folders.add(_hls_folder(key) or os.path.splitext(key)[0] + HLS_FOLDER_SUFFIX)
+    
+    def add_url(self, url: Optional[str]) -> None:
+        self.add_key(url_to_key(url))
+    
+    def __contains__(self, key: str) -> bool:
+        if key in self.keys:
+            return True
+        folder = _hls_folder(key)
+        return folder is not None and folder in self.hls_folders
+
+
+class _R2Storage:
+    name = STORAGE_R2
+    
+    @staticmethod
+    def list(prefix: str = "") -> Iterator[Tuple[str, int, float]]:
+        for obj in s3_service.list_files(prefix):
+            yield obj["key"], obj["size"], obj["last_modified"].timestamp()
+    
+    @staticmethod
+    def delete(keys: List[str]) -> List[str]:
+        return s3_service.delete_files(keys)
+    
+    @staticmethod
+    def url(key: str) -> str:
+        return s3_service.get_public_url(key)
+    
+    def finish(self) -> None:
+        pass
+
+
+class _LocalStorage:
+    name = STORAGE_LOCAL
+    
+    def __init__(self):
+        self.root = str(UPLOAD_DIR)
+        self._touched_dirs: Set[str] = set()
+    
+    def list(self, prefix: str = "") -> Iterator[Tuple[str, int, float]]:
+        # Prefixes used here are folders ("video/abc_hls/"), so walking that folder is enough
+        for directory, _, names in os.walk(os.path.join(self.root, os.path.dirname(prefix))):
+            for name in names:
+                if name.startswith("."):
+                    continue  # .gitkeep and friends
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    yield key, stat.st_size, stat.st_mtime
+    
+    def delete(self, keys: List[str]) -> List[str]:
+        deleted = []
+        for key in keys:
+            path = os.path.join(self.root, key)
+            try:
+                os.unlink(path)
+                deleted.append(key)
+                self._touched_dirs.add(os.path.dirname(path))
+            except FileNotFoundError:
+                deleted.append(key)
+            except Exception as e:
+                logger.error(f"Local delete failed for {path}: {str(e)}")
+        return deleted
+    
+    @staticmethod
+    def url(key: str) -> str:
+        return f"{LOCAL_URL_PREFIX}{key}"
+    
+    def finish(self) -> None:
+        # Drop directories emptied by the run (HLS ladders), deepest first
+        root = os.path.abspath(self.root)
+        for directory in sorted(self._touched_dirs, key=len, reverse=True):
+            directory = os.path.abspath(directory)
+            while directory != root and directory.startswith(root + os.sep):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+
+def available_storages() -> List[str]:
+    """Storage backends that currently hold files."""
+    storages = []
+    if s3_service.is_available():
+        storages.append(STORAGE_R2)
+    if os.path.isdir(UPLOAD_DIR):
+        storages.append(STORAGE_LOCAL)
+    return storages
+
+
+def _stream(session: Session, statement):
+    """Execute a select and fetch its rows in REFERENCE_BATCH_SIZE batches."""
+    return session.exec(statement.execution_options(yield_per=REFERENCE_BATCH_SIZE))
+
+
+def _collect_references(session: Session, cutoff: datetime, dry_run: bool) -> Tuple[_References, int]:
+    """
+    Read every reference from the database.
+    
+    Media assets that are neither referenced nor recent are forgotten
+    (unless dry_run) before any object is deleted, so no new upload can be
+    deduplicated onto an object that is about to disappear. The delete is
+    conditional on the asset still being idle; assets reused in the
+    meantime stay and count as references.
+    
+    Returns:
+        (references, media asset rows forgotten, or that would be in a dry run)
+    """
+    refs = _References()
+    
+    for column in REFERENCE_COLUMNS:
+        for url in _stream(session, select(column).where(column.is_not(None))):
+            refs.add_url(url)
+    
+    jobs = select(TranscodeJob.source_key, TranscodeJob.result_url, TranscodeJob.result_hls_url).where(
+        or_(TranscodeJob.status.in_([JOB_QUEUED, JOB_PROCESSING]), TranscodeJob.updated_at >= cutoff)
+    )
+    for source_key, result_url, result_hls_url in _stream(session, jobs):
+        refs.add_key(source_key)
+        refs.add_url(result_url)
+        refs.add_url(result_hls_url)
+    
+    for url in _stream(session, select(UploadSession.result_url).where(UploadSession.result_url.is_not(None))):
+        refs.add_url(url)
+    
+    stale_ids = []
+    assets = select(MediaAsset.id, MediaAsset.url, MediaAsset.hls_url, MediaAsset.created_at, MediaAsset.last_hit_at)
+    for asset_id, url, hls_url, created_at, last_hit_at in _stream(session, assets):
+        recent = created_at >= cutoff or (last_hit_at is not None and last_hit_at >= cutoff)
+        key = url_to_key(url)
+        if recent or key is None or key in refs:
+            refs.add_url(url)
+            refs.add_url(hls_url)
+        else:
+            stale_ids.append(asset_id)
+    
+    stale_rows = len(stale_ids)
+    if stale_ids and not dry_run:
+        stale_rows = 0
+        for start in range(0, len(stale_ids), REFERENCE_BATCH_SIZE):
+            batch = stale_ids[start:start + REFERENCE_BATCH_SIZE]
+            result = session.execute(
+                delete(MediaAsset).where(
+                    MediaAsset.id.in_(batch),
+                    MediaAsset.created_at < cutoff,
+                    or_(MediaAsset.last_hit_at.is_(None), MediaAsset.last_hit_at < cutoff)
+                )
+            )
+            session.commit()
+            stale_rows += result.rowcount
+            # Reused between the scan and the delete: alive again
+            for url, hls_url in session.exec(
+                select(MediaAsset.url, MediaAsset.hls_url).where(MediaAsset.id.in_(batch))
+            ):
+                refs.add_url(url)
+                refs.add_url(hls_url)
+    
+    for source_url, url in _stream(session, select(ImageVariant.source_url, ImageVariant.url)):
+        source_key = url_to_key(source_url)
+        if source_key is None or source_key in refs:
+            refs.add_url(url)
+    
+    return refs, stale_rows
+
+
+def _sweep(
+    session: Session,
+    storage,
+    refs: _References,
+    stats: MediaGCStats,
+    cutoff_timestamp: float,
+    progress: Optional[Callable[[MediaGCStats], None]]
+) -> None:
+    """List one storage backend and delete its orphaned objects in batches."""
+    batch_size = max(1, min(1000, settings.MEDIA_GC_BATCH_SIZE))
+    batch: List[Tuple[str, int]] = []
+    
+    def flush():
+        if not batch:
+            return
+        if not stats.dry_run:
+            sizes = dict(batch)
+            deleted = storage.delete(list(sizes))
+            stats.deleted_objects += len(deleted)
+            stats.deleted_bytes += sum(sizes[key] for key in deleted)
+            stats.failed_deletes += len(sizes) - len(deleted)
+            if deleted:
+                urls = [storage.url(key) for key in deleted]
+                result = session.execute(
+                    delete(ImageVariant).where(or_(ImageVariant.source_url.in_(urls), ImageVariant.url.in_(urls)))
+                )
+                session.commit()
+                stats.removed_variant_rows += result.rowcount
+        batch.clear()
+    
+    for key, size, modified in storage.list():
+        stats.scanned_objects += 1
+        stats.scanned_bytes += size
+        if key not in refs:
+            if modified >= cutoff_timestamp:
+                stats.kept_recent += 1
+            else:
+                stats.orphaned_objects += 1
+                stats.orphaned_bytes += size
+                batch.append((key, size))
+                if len(batch) >= batch_size:
+                    flush()
+        
+        if stats.scanned_objects % PROGRESS_INTERVAL == 0:
+            logger.info(
+                f"Media GC ({storage.name}): scanned {stats.scanned_objects}, "
+                f"orphaned {stats.orphaned_objects}, deleted {stats.deleted_objects}"
+            )
+            if progress:
+                progress(stats)
+    
+    flush()
+    if not stats.dry_run:
+        storage.finish()
+
+
+def collect_orphaned_media(
+    storages: Optional[List[str]] = None,
+    dry_run: bool = False,
+    grace_hours: Optional[float] = None,
+    progress: Optional[Callable[[MediaGCStats], None]] = None
+) -> List[MediaGCStats]:
+    """
+    Delete stored objects no database row refers to.
+    
+    Args:
+        storages: Backends to sweep ("r2", "local"); defaults to available_storages()
+        dry_run: Only count what would be deleted; change nothing
+        grace_hours: Minimum age of a deleted object (default MEDIA_GC_GRACE_HOURS)
+        progress: Called with the running stats every PROGRESS_INTERVAL objects
+    
+    Returns:
+        One MediaGCStats per storage backend swept
+    """
+    storages = available_storages() if storages is None else storages
+    grace = timedelta(hours=settings.MEDIA_GC_GRACE_HOURS if grace_hours is None else grace_hours)
+    cutoff = datetime.utcnow() - grace
+    cutoff_timestamp = time.time() - grace.total_seconds()
+    
+    results = []
+    with Session(engine) as session:
+        started = time.monotonic()
+        refs, stale_assets = _collect_references(session, cutoff, dry_run)
+        logger.info(f"Media GC: {len(refs.keys)} referenced keys, {stale_assets} stale media assets")
+        
+        for name in storages:
+            if name == STORAGE_R2 and not s3_service.is_available():
+                logger.warning("Media GC: R2 is not configured, skipping")
+                continue
+            storage = _R2Storage() if name == STORAGE_R2 else _LocalStorage()
+            stats = MediaGCStats(
+                storage=name,
+                dry_run=dry_run,
+                referenced_keys=len(refs.keys),
+                stale_asset_rows=stale_assets
+            )
+            _sweep(session, storage, refs, stats, cutoff_timestamp, progress)
+            stats.seconds = round(time.monotonic() - started, 2)
+            started = time.monotonic()
+            
+            logger.info(
+                f"Media GC ({name}){' [dry run]' if dry_run else ''}: scanned {stats.scanned_objects} "
+                f"({stats.scanned_bytes/1024/1024:.1f}MB), orphaned {stats.orphaned_objects} "
+                f"({stats.orphaned_bytes/1024/1024:.1f}MB), deleted {stats.deleted_objects}, "
+                f"failed {stats.failed_deletes}, kept {stats.kept_recent} inside grace period"
+            )
+            if progress:
+                progress(stats)
+            results.append(stats)
+    
+    return results
+
+
+def _storage_for_url(url: str):
+    """Backend holding the object behind an upload URL."""
+    if s3_service.public_url and url.startswith(s3_service.public_url + "/"):
+        return _R2Storage() if s3_service.is_available() else None
+    return _LocalStorage()
+
+
+def _live_urls(session: Session, urls: List[str], cutoff: datetime) -> Set[str]:
+    """Those of urls that a row still refers to, or that dedup handed out recently."""
+    live: Set[str] = set()
+    for column in REFERENCE_COLUMNS + [TranscodeJob.result_url, TranscodeJob.result_hls_url, UploadSession.result_url]:
+        live.update(session.exec(select(column).where(column.in_(urls))).all())
+    # A recent hit may belong to an upload not attached to a row yet
+    live.update(session.exec(
+        select(MediaAsset.url).where(MediaAsset.url.in_(urls), MediaAsset.last_hit_at >= cutoff)
+    ).all())
+    # A variant lives as long as its full-size image
+    sources = dict(session.exec(
+        select(ImageVariant.url, ImageVariant.source_url).where(ImageVariant.url.in_(urls))
+    ).all())
+    if sources:
+        live_sources = _live_urls(session, list(set(sources.values())), cutoff)
+        live.update(url for url, source in sources.items() if source in live_sources)
+    return live
+
+
+def delete_unreferenced_media(
+    session: Session,
+    urls: Iterable[str],
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Tuple[int, int]:
+    """
+    Delete the objects behind urls that nothing refers to any more.
+    
+    Meant for bulk row deletes: collect the URLs the rows held, delete the
+    rows, then call this. URLs are checked again first because a
+    deduplicated upload shares one object between users. Image variants
+    and the HLS ladder of each deleted file go with it, and its dedup and
+    variant records are removed.
+    
+    Args:
+        session: Database session
+        urls: Upload URLs (R2 or local); external links are ignored
+        progress: Called with (objects done, objects total) after each batch
+    
+    Returns:
+        (objects deleted, objects that failed to delete)
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settings.MEDIA_GC_GRACE_HOURS)
+    urls = sorted({url for url in urls if url_to_key(url)})
+    
+    doomed: List[str] = []
+    for start in range(0, len(urls), REFERENCE_BATCH_SIZE):
+        batch = urls[start:start + REFERENCE_BATCH_SIZE]
+        batch = batch + session.exec(
+            select(ImageVariant.url).where(ImageVariant.source_url.in_(batch))
+        ).all() + [
+            url for url in session.exec(select(MediaAsset.hls_url).where(MediaAsset.url.in_(batch))).all() if url
+        ]
+        live = _live_urls(session, batch, cutoff)
+        doomed.extend(url for url in dict.fromkeys(batch) if url not in live)
+    
+    # Objects per backend; HLS ladders are listed by folder
+    by_storage = {}
+    for url in doomed:
+        storage = _storage_for_url(url)
+        if storage is None:
+            continue
+        keys = by_storage.setdefault(storage.name, (storage, {}))[1]
+        key = url_to_key(url)
+        keys[key] = url
+        if key.lower().endswith(VIDEO_EXTENSIONS):
+            folder = _hls_folder(key) or os.path.splitext(key)[0] + HLS_FOLDER_SUFFIX
+            for ladder_key, _, _ in storage.list(folder):
+                keys.setdefault(ladder_key, storage.url(ladder_key))
+    
+    for start in range(0, len(doomed), REFERENCE_BATCH_SIZE):
+        batch = doomed[start:start + REFERENCE_BATCH_SIZE]
+        session.execute(delete(MediaAsset).where(MediaAsset.url.in_(batch)))
+        session.execute(
+            delete(ImageVariant).where(or_(ImageVariant.source_url.in_(batch), ImageVariant.url.in_(batch)))
+        )
+        session.commit()
+    
+    total = sum(len(keys) for _, keys in by_storage.values())
+    batch_size = max(1, min(1000, settings.MEDIA_GC_BATCH_SIZE))
+    deleted = failed = 0
+    for storage, keys in by_storage.values():
+        keys = list(keys)
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            done = len(storage.delete(batch))
+            deleted += done
+            failed += len(batch) - done
+            if progress:
+                progress(deleted + failed, total)
+        storage.finish()
+    
+    logger.info(f"Deleted {deleted} unreferenced media objects ({failed} failed) of {len(urls)} URLs")
+    return deleted, failed
@@ -0,0 +1,489 @@
+"""Compress-and-store pipeline for uploaded media files.
+
+Shared by the synchronous upload endpoint and the background transcode
+worker so both paths produce the same keys, content types and fallbacks.
+Uploads identical to an earlier one (same SHA-256, preset and format) reuse
+the stored result; see app.services.media_assets.
+"""
+import os
+import time
+import uuid
+import shutil
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db.base import engine
+from app.db.models import MediaAsset
+from app.services.s3_service import s3_service
+from app.services.media_compression_service import (
+    compression_service, PLAN_REJECT, PLAN_REMUX, PLAN_SKIP, PLAN_TRANSCODE
+)
+from app.services.image_variants import get_variants, pick_thumbnail
+from app.services.media_assets import (
+    asset_key, decode_waveform, encode_waveform, find_asset, hash_file, save_asset
+)
+
+logger = logging.getLogger(__name__)
+
+# Local uploads directory (fallback for development)
+UPLOAD_DIR = Path("uploads")
+
+# Processing paths besides the plan actions (transcode, remux, skip)
+PATH_STORE = "store"  # Compression disabled or not applicable (PDF)
+PATH_DEDUP = "dedup"  # Reused an identical earlier upload
+
+
+class MediaStorageError(Exception):
+    """Raised when a processed file could not be stored."""
+    pass
+
+
+class MediaRejectedError(Exception):
+    """Raised when probing shows an upload breaks a limit (e.g. too long)."""
+    pass
+
+
+@dataclass
+class StoredMedia:
+    """Result of processing and storing one media file."""
+    url: str
+    filename: str
+    content_type: str
+    original_size: int
+    final_size: int
+    compression_applied: bool = False
+    compression_error: Optional[str] = None
+    variants: List[Tuple[int, str]] = field(default_factory=list)  # (width, url) of resized copies
+    hls_url: Optional[str] = None  # HLS master playlist (videos)
+    waveform: Optional[List[int]] = None  # Peaks 0-127 (audio)
+    deduplicated: bool = False  # Reused from an identical earlier upload
+    processing_path: str = PATH_STORE  # transcode, remux, skip, store or dedup
+    duration: Optional[float] = None  # Seconds, for audio/video
+    processing_seconds: float = 0.0  # Time spent in FFmpeg
+    
+    @property
+    def savings_percent(self) -> float:
+        """Size reduction in percent."""
+        if self.original_size <= 0:
+            return 0
+        return (self.original_size - self.final_size) / self.original_size * 100
+    
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        """Variant to use as thumbnail, if any were generated."""
+        return pick_thumbnail(self.variants)
+
+
+def store_media_file(file_path: str, folder: str, filename: str, content_type: str) -> str:
+    """
+    Store a file in R2, or in the local uploads directory when R2 is not configured.
+    
+    Args:
+        file_path: Local path of the file to store
+        folder: Key prefix / subdirectory (e.g. "video")
+        filename: Final file name
+        content_type: MIME type of the file
+    
+    Returns:
+        Public URL of the stored file
+    
+    Raises:
+        MediaStorageError: If the file could not be stored
+    """
+    if s3_service.is_available():
+        file_url = s3_service.upload_file_path(
+            file_path=file_path,
+            file_key=f"{folder}/{filename}",
+            content_type=content_type
+        )
+        if not file_url:
+            raise MediaStorageError(
+                "Failed to upload to R2. Please check credentials and bucket configuration."
+            )
+        logger.info(f"Media uploaded to R2: {file_url} ({os.path.getsize(file_path)/1024/1024:.2f}MB)")
+        return file_url
+    
+    # Fallback to local storage (development only)
+    logger.warning("R2 not available, using local storage (NOT recommended for production)")
+    try:
+        local_path = UPLOAD_DIR / folder / filename
+        local_path.parent.mkdir(exist_ok=True, parents=True)
+        shutil.copyfile(file_path, local_path)
+    except Exception as e:
+        logger.error(f"Failed to save file locally: {str(e)}")
+        raise MediaStorageError(
+            "File upload failed. R2 is not configured and local storage is unavailable."
+        )
+    
+    file_url = f"/uploads/{folder}/{filename}"
+    logger.info(f"Media uploaded locally: {file_url}")
+    return file_url
+
+
+def store_image_variants(
+    input_path: str,
+    folder: str,
+    filename: str,
+    preset: str = "standard"
+) -> List[Tuple[int, str]]:
+    """
+    Generate and store responsive copies of an image next to the original.
+    
+    Variants are stored as "<folder>/<stem>_w<width><ext>", where stem is
+    the stored original's filename without extension.
+    
+    Args:
+        input_path: Path of the source image (the uncompressed original)
+        folder: Key prefix / subdirectory of the stored original
+        filename: Stored filename of the original
+        preset: Compression quality preset (high, standard, low)
+    
+    Returns:
+        (width, url) pairs, smallest first; empty if generation failed
+    """
+    if not (settings.IMAGE_VARIANTS_ENABLED and compression_service.is_image_available()):
+        return []
+    
+    output_format = settings.COMPRESSION_IMAGE_FORMAT
+    content_type = "image/webp" if output_format == "webp" else "image/jpeg"
+    stem = os.path.splitext(filename)[0]
+    
+    paths = compression_service.generate_image_variants(
+        input_path, settings.IMAGE_VARIANT_WIDTHS, preset, output_format
+    )
+    variants = []
+    try:
+        for width, path in sorted(paths.items()):
+            variant_name = f"{stem}_w{width}{os.path.splitext(path)[1]}"
+            variants.append((width, store_media_file(path, folder, variant_name, content_type)))
+    except MediaStorageError as e:
+        # Variants are an optimization; the original is already stored
+        logger.warning(f"Failed to store image variants for {filename}: {str(e)}")
+    finally:
+        for path in paths.values():
+            try:
+                os.unlink(path)
+            except Exception:
+                pass
+    return variants
+
+
+def store_hls_ladder(
+    input_path: str,
+    folder: str,
+    filename: str,
+    preset: str = "standard"
+) -> Optional[str]:
+    """
+    Package a video as an HLS ladder and store it next to the MP4.
+    
+    Files are stored under "<folder>/<stem>_hls/". Segments go up in
+    parallel, then the variant playlists, then the master playlist, so a
+    stored playlist never points at a missing file.
+    
+    Args:
+        input_path: Path of the source video (the uncompressed original)
+        folder: Key prefix / subdirectory of the stored MP4
+        filename: Stored filename of the MP4
+        preset: Compression quality preset (high, standard, low)
+    
+    Returns:
+        URL of the master playlist, or None if packaging or storage failed
+    """
+    if not (settings.VIDEO_HLS_ENABLED and compression_service.is_available()):
+        return None
+    
+    output_dir = compression_service.generate_hls_ladder(
+        input_path,
+        settings.VIDEO_HLS_RUNGS,
+        preset,
+        settings.VIDEO_HLS_SEGMENT_SECONDS
+    )
+    if not output_dir:
+        return None
+    
+    hls_folder = f"{folder}/{os.path.splitext(filename)[0]}_hls"
+    segments, playlists = [], []
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), output_dir)
+            (playlists if name.endswith(".m3u8") else segments).append(relative)
+    
+    def store(relative: str) -> str:
+        sub_folder, name = os.path.split(relative)
+        content_type = "application/vnd.apple.mpegurl" if name.endswith(".m3u8") else "video/mp2t"
+        return store_media_file(
+            os.path.join(output_dir, relative),
+            f"{hls_folder}/{sub_folder}" if sub_folder else hls_folder,
+            name,
+            content_type
+        )
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, settings.R2_MULTIPART_CONCURRENCY)) as pool:
+            list(pool.map(store, segments))
+            list(pool.map(store, [r for r in playlists if r != "master.m3u8"]))
+        url = store("master.m3u8")
+        logger.info(f"HLS ladder stored: {url} ({len(segments)} segments)")
+        return url
+    except MediaStorageError as e:
+        # The MP4 is already stored and stays the playback fallback
+        logger.warning(f"Failed to store HLS ladder for {filename}: {str(e)}")
+        return None
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def find_stored_media(sha256: str, preset: str, format: str, original_size: int) -> Optional[StoredMedia]:
+    """
+    Reuse the stored result of an identical earlier upload, if any.
+    
+    Counts the hit on the MediaAsset row.
+    
+    Returns:
+        StoredMedia for the existing object (deduplicated=True), or None
+    """
+    with Session(engine) as session:
+        asset = find_asset(session, sha256, preset, format)
+        if not asset:
+            return None
+        rows = get_variants(session, [asset.url]).get(asset.url, [])
+        stored = StoredMedia(
+            url=asset.url,
+            filename=asset.filename,
+            content_type=asset.content_type,
+            original_size=original_size,
+            final_size=asset.size,
+            compression_applied=asset.compression_applied,
+            variants=[(v.width, v.url) for v in rows],
+            hls_url=asset.hls_url,
+            waveform=decode_waveform(asset.waveform),
+            deduplicated=True,
+            processing_path=PATH_DEDUP,
+            duration=asset.duration
+        )
+        session.commit()
+    
+    logger.info(f"Duplicate upload {sha256[:12]} ({preset}/{format}), reusing {stored.url}")
+    return stored
+
+
+def process_media_file(
+    input_path: str,
+    original_filename: Optional[str],
+    content_type: Optional[str],
+    media_type: str,
+    compress: bool = True,
+    quality: str = "standard",
+    progress_callback: Optional[Callable[[int], None]] = None,
+    folder: Optional[str] = None,
+    sha256: Optional[str] = None
+) -> StoredMedia:
+    """
+    Compress (when enabled) and store a spooled media file.
+    
+    Photos also get responsive variants (see store_image_variants), and
+    videos an HLS ladder when enabled (see store_hls_ladder); both are
+    returned on the result for the caller to record.
+    
+    When MEDIA_DEDUP_ENABLED, an upload whose bytes were already processed
+    with the same preset and format skips FFmpeg and storage entirely and
+    returns the earlier result.
+    
+    Otherwise the file is probed first (see plan_processing): over-long
+    media is rejected, web-ready videos are remuxed and small images are
+    stored as-is. The path taken is recorded on the result and in
+    media_assets.
+    
+    The input file is left in place; the caller owns it. Any compression
+    output is removed before returning.
+    
+    Args:
+        input_path: Path of the spooled original
+        original_filename: Client-supplied filename
+        content_type: Client-supplied MIME type
+        media_type: photo, video, audio or pdf
+        compress: Whether to compress the file
+        quality: Compression quality preset (high, standard, low)
+        progress_callback: Optional callable receiving a 0-100 progress value
+        folder: Storage key prefix (defaults to media_type)
+        sha256: Digest of the input computed while spooling (hashed here if omitted)
+    
+    Returns:
+        StoredMedia describing the stored object
+    
+    Raises:
+        MediaRejectedError: If the upload is longer than the configured maximum
+        MediaStorageError: If the file could not be stored
+    """
+    def report(progress: int):
+        if progress_callback:
+            progress_callback(progress)
+    
+    original_size = os.path.getsize(input_path)
+    final_path = input_path
+    file_ext = os.path.splitext(original_filename)[1] if original_filename else ""
+    final_filename = f"{uuid.uuid4()}{file_ext}"
+    final_content_type = content_type or "application/octet-stream"
+    compression_applied = False
+    compression_error = None
+    output_path = None
+    folder = folder or media_type
+    # Use quality from request or fall back to config
+    preset = quality if quality in ["high", "standard", "low"] else settings.COMPRESSION_VIDEO_PRESET
+    
+    # Use compression settings from config if not explicitly disabled
+    should_compress = compress and settings.COMPRESSION_ENABLED and (
+        compression_service.is_image_available() if media_type == "photo" else compression_service.is_available()
+    )
+    
+    sha256 = sha256 or hash_file(input_path)
+    asset_preset, asset_format = asset_key(media_type, should_compress, preset)
+    if settings.MEDIA_DEDUP_ENABLED:
+        existing = find_stored_media(sha256, asset_preset, asset_format, original_size)
+        if existing:
+            report(100)
+            return existing
+    
+    # Probe before spending CPU: reject over-long media, find remux/skip shortcuts
+    plan = None
+    if media_type != "pdf":
+        plan = compression_service.plan_processing(input_path, media_type, preset)
+        logger.info(f"Processing plan for {media_type} upload: {plan.action} ({plan.reason})")
+        if plan.action == PLAN_REJECT:
+            raise MediaRejectedError(plan.reason)
+    duration = plan.duration if plan else None
+    processing_path = PATH_STORE
+    processing_seconds = 0.0
+    waveform = None
+    
+    report(10)
+    
+    try:
+        if should_compress and plan and plan.action == PLAN_SKIP:
+            # Already small enough; the original is stored under a fresh name
+            processing_path = PLAN_SKIP
+        
+        elif should_compress and media_type != "pdf":
+            started = time.perf_counter()
+            result = None
+            if media_type == "video" and plan.action == PLAN_REMUX:
+                logger.info("Video is already web-ready, remuxing without re-encode")
+                result = compression_service.remux_video_file(input_path)
+                if result.success:
+                    processing_path = PLAN_REMUX
+                else:
+                    logger.warning(f"Remux failed, falling back to transcode: {result.error}")
+            
+            if processing_path != PLAN_REMUX:
+                processing_path = PLAN_TRANSCODE
+                if media_type == "video":
+                    logger.info(f"Compressing video with preset: {preset}")
+                    result = compression_service.compress_video_file(
+                        input_path,
+                        original_filename or "video.mp4",
+                        preset
+                    )
+                elif media_type == "photo":
+                    logger.info(f"Compressing image with preset: {preset}")
+                    result = compression_service.compress_image_file(
+                        input_path,
+                        original_filename or "image.jpg",
+                        preset,
+                        settings.COMPRESSION_IMAGE_FORMAT
+                    )
+                else:
+                    logger.info(f"Compressing audio with preset: {preset}")
+                    result = compression_service.compress_audio_file(
+                        input_path,
+                        original_filename or "audio.mp3",
+                        preset
+                    )
+            processing_seconds = time.perf_counter() - started
+            
+            if result.success and result.output_path:
+                if result.output_path != input_path:
+                    output_path = result.output_path
+                final_path = result.output_path
+                final_filename = result.output_filename
+                final_content_type = result.content_type
+                waveform = result.waveform
+                compression_applied = True
+                logger.info(f"{media_type.capitalize()} compressed: {result.savings_percent} reduction")
+            else:
+                compression_error = result.error
+                logger.warning(f"{media_type.capitalize()} compression failed, using original: {result.error}")
+        
+        elif media_type == "pdf":
+            # PDFs are not compressed, keep original
+            final_filename = f"{uuid.uuid4()}.pdf"
+            final_content_type = "application/pdf"
+        
+        report(80)
+        
+        final_size = os.path.getsize(final_path)
+        file_url = store_media_file(final_path, folder, final_filename, final_content_type)
+        
+        variants = []
+        if media_type == "photo":
+            report(90)
+            variants = store_image_variants(input_path, folder, final_filename, preset)
+        
+        hls_url = None
+        if media_type == "video":
+            report(85)
+            hls_url = store_hls_ladder(input_path, folder, final_filename, preset)
+        
+        if media_type == "audio" and waveform is None:
+            # Stored without an encode (compression off or failed): separate pass
+            waveform = compression_service.generate_waveform(input_path)
+        
+        # Failed compressions are not recorded so the next copy gets another try
+        if not compression_error:
+            with Session(engine) as session:
+                save_asset(session, MediaAsset(
+                    sha256=sha256,
+                    preset=asset_preset,
+                    format=asset_format,
+                    media_type=media_type,
+                    url=file_url,
+                    filename=final_filename,
+                    content_type=final_content_type,
+                    size=final_size,
+                    original_size=original_size,
+                    compression_applied=compression_applied,
+                    hls_url=hls_url,
+                    waveform=encode_waveform(waveform),
+                    processing_path=processing_path,
+                    duration=duration,
+                    processing_seconds=round(processing_seconds, 3)
+                ))
+        
+        report(100)
+        
+        return StoredMedia(
+            url=file_url,
+            filename=final_filename,
+            content_type=final_content_type,
+            original_size=original_size,
+            final_size=final_size,
+            compression_applied=compression_applied,
+            compression_error=compression_error,
+            variants=variants,
+            hls_url=hls_url,
+            waveform=waveform,
+            processing_path=processing_path,
+            duration=duration,
+            processing_seconds=processing_seconds
+        )
+    finally:
+        if output_path and os.path.exists(output_path):
+            try:
+                os.unlink(output_path)
+            except Exception:
+                pass
@@ -1,9 +1,13 @@
 """Cloudflare R2 / S3-compatible service for persistent file storage."""
+import os
+import threading
+import time
 import boto3
 from botocore.exceptions import ClientError
 from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
-from typing import Optional
+from typing import Iterator, List, Optional
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -101,6 +105,167 @@ class R2Service:
             logger.error(f"Unexpected error during R2 upload: {str(e)}")
             return None
     
+    def upload_file_path(
+        self,
+        file_path: str,
+        file_key: str,
+        content_type: str = 'application/octet-stream'
+    ) -> Optional[str]:
+        """
+        Upload a file from disk to R2 without loading it into memory.
+        
+        Files at or above R2_MULTIPART_THRESHOLD use a parallel multipart
+        upload (see _multipart_upload); smaller files are streamed in a
+        single put_object call from the file handle.
+        
+        Args:
+            file_path: Local path of the file to upload
+            file_key: R2 key (path) for the file
+            content_type: MIME type of the file
+        
+        Returns:
+            Public URL of uploaded file, or None if upload failed
+        """
+        if not self.is_available():
+            logger.error("R2 service not available - check credentials and R2_PUBLIC_URL")
+            return None
+        
+        try:
+            file_size = os.path.getsize(file_path)
+            if file_size >= settings.R2_MULTIPART_THRESHOLD:
+                if not self._multipart_upload(file_path, file_size, file_key, content_type):
+                    return None
+            else:
+                with open(file_path, "rb") as f:
+                    self.s3_client.put_object(
+                        Bucket=self.bucket_name,
+                        Key=file_key,
+                        Body=f,
+                        ContentType=content_type
+                    )
+            
+            url = f"{self.public_url}/{file_key}"
+            logger.info(f"File uploaded successfully to R2: {url}")
+            return url
+        
+        except ClientError as e:
+            logger.error(f"R2 upload failed: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error during R2 upload: {str(e)}")
+            return None
+    
+    def _upload_part(
+        self,
+        file_path: str,
+        file_key: str,
+        upload_id: str,
+        part_number: int,
+        offset: int,
+        length: int,
+        stop: Optional[threading.Event] = None
+    ) -> dict:
+        """Upload one part, retrying only this part on failure (until stop is set)."""
+        max_attempts = max(1, settings.R2_MULTIPART_PART_RETRIES)
+        
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with open(file_path, "rb") as f:
+                    f.seek(offset)
+                    body = f.read(length)
+                response = self.s3_client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body
+                )
+                return {"PartNumber": part_number, "ETag": response["ETag"]}
+            except Exception as e:
+                if attempt == max_attempts or (stop and stop.is_set()):
+                    raise
+                delay = 0.5 * (2 ** (attempt - 1))
+                logger.warning(
+                    f"R2 part {part_number} of {file_key} failed (attempt {attempt}/{max_attempts}), "
+                    f"retrying in {delay:.1f}s: {str(e)}"
+                )
+                time.sleep(delay)
+    
+    def _multipart_upload(
+        self,
+        file_path: str,
+        file_size: int,
+        file_key: str,
+        content_type: str
+    ) -> bool:
+        """
+        Upload a large file as concurrent multipart parts.
+        
+        Parts are R2_MULTIPART_PART_SIZE bytes (R2 requires equal-sized parts
+        except the last) and at most R2_MULTIPART_CONCURRENCY are in flight,
+        so memory stays at concurrency * part size. A failed part is retried
+        on its own; if it still fails, parts not yet started are cancelled,
+        the ones in flight are waited for, and the whole upload is aborted
+        so no incomplete parts are left billed in the bucket.
+        
+        Returns:
+            True if the object was assembled successfully
+        """
+        part_size = max(5 * 1024 * 1024, settings.R2_MULTIPART_PART_SIZE)
+        parts = [
+            (index + 1, offset, min(part_size, file_size - offset))
+            for index, offset in enumerate(range(0, file_size, part_size))
+        ]
+        
+        upload = self.s3_client.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=file_key,
+            ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        
+        try:
+            completed = []
+            stop = threading.Event()
+            pool = ThreadPoolExecutor(max_workers=max(1, settings.R2_MULTIPART_CONCURRENCY))
+            try:
+                futures = [
+                    pool.submit(self._upload_part, file_path, file_key, upload_id, number, offset, length, stop)
+                    for number, offset, length in parts
+                ]
+                for future in as_completed(futures):
+                    completed.append(future.result())
+            except BaseException:
+                # Drop queued parts and stop retries; only the parts already
+                # in flight are waited for, so none lands after the abort
+                stop.set()
+                pool.shutdown(cancel_futures=True)
+                raise
+            finally:
+                pool.shutdown()
+            
+            completed.sort(key=lambda part: part["PartNumber"])
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": completed}
+            )
+            logger.info(f"Multipart upload of {file_key} completed ({len(parts)} parts, {file_size/1024/1024:.2f}MB)")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Multipart upload of {file_key} failed, aborting: {str(e)}")
+            try:
+                self.s3_client.abort_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    UploadId=upload_id
+                )
+            except Exception as abort_error:
+                logger.error(f"Failed to abort multipart upload {upload_id}: {str(abort_error)}")
+            return False
+    
     def delete_file(self, file_key: str) -> bool:
         """
         Delete file from R2.
@@ -130,6 +295,58 @@ class R2Service:
             logger.error(f"Unexpected error during R2 delete: {str(e)}")
             return False
     
+    def list_files(self, prefix: str = "") -> Iterator[dict]:
+        """
+        Iterate over all objects in the bucket, one list_objects_v2 page at a time.
+        
+        Args:
+            prefix: Only list keys starting with this prefix
+        
+        Yields:
+            Dicts with 'key', 'size' and 'last_modified' (timezone-aware datetime)
+        """
+        if not self.is_available():
+            logger.error("R2 service not available")
+            return
+        
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield {
+                    "key": obj["Key"],
+                    "size": obj["Size"],
+                    "last_modified": obj["LastModified"]
+                }
+    
+    def delete_files(self, file_keys: List[str]) -> List[str]:
+        """
+        Delete up to 1000 objects in one delete_objects call.
+        
+        Args:
+            file_keys: R2 keys (paths) of the files
+        
+        Returns:
+            Keys that were deleted; failures are logged and left out
+        """
+        if not self.is_available():
+            logger.error("R2 service not available")
+            return []
+        if not file_keys:
+            return []
+        
+        try:
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in file_keys], "Quiet": False}
+            )
+        except ClientError as e:
+            logger.error(f"R2 batch delete failed: {str(e)}")
+            return []
+        
+        for error in response.get("Errors", []):
+            logger.error(f"R2 delete failed for {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+        return [deleted["Key"] for deleted in response.get("Deleted", [])]
+    
     def get_presigned_url(self, file_key: str, expiration: int = 3600) -> Optional[str]:
         """
         Generate a presigned URL for temporary access to a private file.
@@ -160,6 +377,124 @@ class R2Service:
             logger.error(f"Failed to generate presigned URL: {str(e)}")
             return None
 
+    def get_presigned_upload_url(
+        self,
+        file_key: str,
+        content_type: str,
+        content_length: int,
+        expiration: int = 900
+    ) -> Optional[str]:
+        """
+        Generate a presigned PUT URL so a client can upload straight to R2.
+        
+        Content-Type and Content-Length are part of the signature, so the
+        client must send exactly the declared type and size. R2 does not
+        support POST policies, so this is how the size cap is enforced.
+        
+        Args:
+            file_key: R2 key (path) the object will be stored under
+            content_type: MIME type the client must send
+            content_length: Exact size in bytes the client must send
+            expiration: URL expiration time in seconds
+        
+        Returns:
+            Presigned URL or None if generation failed
+        """
+        if not self.is_available():
+            logger.error("R2 service not available")
+            return None
+        
+        try:
+            return self.s3_client.generate_presigned_url(
+                'put_object',
+                Params={
+                    'Bucket': self.bucket_name,
+                    'Key': file_key,
+                    'ContentType': content_type,
+                    'ContentLength': content_length
+                },
+                ExpiresIn=expiration
+            )
+        
+        except ClientError as e:
+            logger.error(f"Failed to generate presigned upload URL: {str(e)}")
+            return None
+    
+    def get_public_url(self, file_key: str) -> str:
+        """Public URL of an object key."""
+        return f"{self.public_url}/{file_key}"
+    
+    def head_file(self, file_key: str) -> Optional[dict]:
+        """
+        Fetch object metadata (size, content type) without downloading it.
+        
+        Args:
+            file_key: R2 key (path) of the file
+        
+        Returns:
+            Dict with 'size' and 'content_type', or None if the object is missing
+        """
+        if not self.is_available():
+            return None
+        
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
+            return {
+                "size": response["ContentLength"],
+                "content_type": response.get("ContentType")
+            }
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                logger.error(f"R2 head failed for {file_key}: {str(e)}")
+            return None
+    
+    def read_file_header(self, file_key: str, length: int = 8192) -> Optional[bytes]:
+        """
+        Read the first bytes of an object with a ranged GET (for magic-byte checks).
+        
+        Args:
+            file_key: R2 key (path) of the file
+            length: Number of bytes to read
+        
+        Returns:
+            Up to `length` bytes, or None if the read failed
+        """
+        if not self.is_available():
+            return None
+        
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                Range=f"bytes=0-{length - 1}"
+            )
+            return response["Body"].read()
+        except ClientError as e:
+            logger.error(f"R2 ranged read failed for {file_key}: {str(e)}")
+            return None
+    
+    def download_file(self, file_key: str, file_path: str) -> bool:
+        """
+        Download an object to a local file (multipart/concurrent for large objects).
+        
+        Args:
+            file_key: R2 key (path) of the file
+            file_path: Local destination path
+        
+        Returns:
+            True if downloaded successfully, False otherwise
+        """
+        if not self.is_available():
+            logger.error("R2 service not available")
+            return False
+        
+        try:
+            self.s3_client.download_file(self.bucket_name, file_key, file_path)
+            return True
+        except Exception as e:
+            logger.error(f"R2 download failed for {file_key}: {str(e)}")
+            return False
+    
     def file_exists(self, file_key: str) -> bool:
         """
         Check if a file exists in R2.
@@ -0,0 +1,505 @@
+"""Database-backed transcode queue for asynchronous media uploads.
+
+Upload requests spool the original to TRANSCODE_SPOOL_DIR and insert a
+TranscodeJob row. A bounded pool of worker threads (embedded in the API
+process, or run standalone via transcode_worker.py) claims queued jobs with
+an atomic conditional UPDATE, runs the shared compress-and-store pipeline and
+writes the result back. Because all state lives in the database, jobs
+survive worker restarts: rows left in "processing" by a dead worker are
+requeued once TRANSCODE_JOB_TIMEOUT_SECONDS has passed. While a job runs, a
+heartbeat thread keeps its lock fresh (FFmpeg steps alone can take longer
+than the timeout), and a worker only writes the outcome if it still owns
+the job. A worker that finds it lost the job (heartbeat or progress
+update) kills its FFmpeg run and leaves the job to the new owner.
+"""
+import os
+import uuid
+import socket
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.base import engine
+from app.db.models import TranscodeJob, PortfolioItem, ProjectMedia, Project
+from app.services.media_compression_service import compression_service, ProcessingCancelledError
+from app.services.media_pipeline import process_media_file, MediaRejectedError, StoredMedia
+from app.services.s3_service import s3_service
+from app.services.image_variants import save_variants
+from app.services.media_assets import encode_waveform
+from app.services.upload_spool import SpooledUpload
+from app.services.upload_sessions import upload_session_service
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+TARGET_PORTFOLIO_ITEM = "portfolio_item"
+TARGET_PROJECT_MEDIA = "project_media"
+
+# Seconds between lock refreshes of a running job, well inside the stale timeout
+HEARTBEAT_INTERVAL = max(1.0, min(60.0, settings.TRANSCODE_JOB_TIMEOUT_SECONDS / 5))
+
+
+class TranscodeQueue:
+    """Enqueue, claim and finish transcode jobs."""
+    
+    @staticmethod
+    def enqueue(
+        session: Session,
+        user_id: int,
+        spooled: SpooledUpload,
+        media_type: str,
+        content_type: Optional[str],
+        compress: bool = True,
+        quality: str = "standard",
+        target_type: Optional[str] = None,
+        target_id: Optional[int] = None
+    ) -> TranscodeJob:
+        """
+        Create a queued job for a spooled upload.
+        
+        The spooled file must live in TRANSCODE_SPOOL_DIR; the job takes
+        ownership of it and deletes it when finished.
+        """
+        job = TranscodeJob(
+            user_id=user_id,
+            media_type=media_type,
+            compress=compress,
+            quality=quality,
+            input_path=os.path.abspath(spooled.path),
+            original_filename=spooled.filename or None,
+            content_type=content_type,
+            original_size=spooled.size,
+            sha256=spooled.sha256 or None,
+            target_type=target_type,
+            target_id=target_id
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        
+        logger.info(f"Queued transcode job {job.id} ({media_type}, {spooled.size/1024/1024:.2f}MB) for user {user_id}")
+        return job
+    
+    @staticmethod
+    def enqueue_stored(
+        session: Session,
+        user_id: int,
+        source_key: str,
+        size: int,
+        filename: Optional[str],
+        media_type: str,
+        content_type: Optional[str],
+        compress: bool = True,
+        quality: str = "standard",
+        target_type: Optional[str] = None,
+        target_id: Optional[int] = None
+    ) -> TranscodeJob:
+        """
+        Create a queued job for an object the client uploaded directly to R2.
+        
+        The worker downloads the object into TRANSCODE_SPOOL_DIR before
+        processing and deletes it from R2 once the processed copy is stored.
+        """
+        ext = os.path.splitext(filename)[1].lower() if filename else ""
+        job = TranscodeJob(
+            user_id=user_id,
+            media_type=media_type,
+            compress=compress,
+            quality=quality,
+            input_path=os.path.abspath(
+                os.path.join(settings.TRANSCODE_SPOOL_DIR, f"upload_r2_{uuid.uuid4().hex}{ext}")
+            ),
+            source_key=source_key,
+            original_filename=filename or None,
+            content_type=content_type,
+            original_size=size,
+            target_type=target_type,
+            target_id=target_id
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        
+        logger.info(f"Queued transcode job {job.id} for R2 object {source_key} ({size/1024/1024:.2f}MB)")
+        return job
+    
+    @staticmethod
+    def claim_next(session: Session, worker_id: str) -> Optional[TranscodeJob]:
+        """
+        Atomically claim the oldest queued job.
+        
+        Uses a conditional UPDATE on status so concurrent workers (threads or
+        processes) never claim the same job.
+        
+        Returns:
+            The claimed job, or None if the queue is empty
+        """
+        for _ in range(5):
+            job_id = session.exec(
+                select(TranscodeJob.id)
+                .where(TranscodeJob.status == JOB_QUEUED)
+                .order_by(TranscodeJob.created_at, TranscodeJob.id)
+                .limit(1)
+            ).first()
+            if job_id is None:
+                return None
+            
+            now = datetime.utcnow()
+            result = session.execute(
+                update(TranscodeJob)
+                .where(TranscodeJob.id == job_id, TranscodeJob.status == JOB_QUEUED)
+                .values(
+                    status=JOB_PROCESSING,
+                    worker_id=worker_id,
+                    locked_at=now,
+                    started_at=now,
+                    progress=5,
+                    attempts=TranscodeJob.attempts + 1,
+                    updated_at=now
+                )
+            )
+            session.commit()
+            
+            if result.rowcount == 1:
+                return session.get(TranscodeJob, job_id)
+            # Another worker won the race, try the next one
+        return None
+    
+    @staticmethod
+    def recover_stale(session: Session) -> int:
+        """
+        Requeue jobs whose worker stopped heartbeating (crash or restart).
+        
+        Jobs that already used TRANSCODE_MAX_ATTEMPTS are failed instead,
+        and their spooled input removed.
+        
+        Returns:
+            Number of jobs requeued
+        """
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.TRANSCODE_JOB_TIMEOUT_SECONDS)
+        
+        exhausted = (
+            TranscodeJob.status == JOB_PROCESSING,
+            TranscodeJob.locked_at < cutoff,
+            TranscodeJob.attempts >= settings.TRANSCODE_MAX_ATTEMPTS
+        )
+        failed_ids = session.exec(select(TranscodeJob.id).where(*exhausted)).all()
+        if failed_ids:
+            session.execute(
+                update(TranscodeJob)
+                .where(TranscodeJob.id.in_(failed_ids), *exhausted)
+                .values(
+                    status=JOB_FAILED,
+                    error="Worker stopped responding too many times",
+                    completed_at=now,
+                    updated_at=now
+                )
+            )
+            session.commit()
+            # A heartbeat may have refreshed a job in between; only remove
+            # the inputs of the jobs the UPDATE actually failed
+            failed = session.exec(
+                select(TranscodeJob).where(
+                    TranscodeJob.id.in_(failed_ids),
+                    TranscodeJob.status == JOB_FAILED,
+                    TranscodeJob.completed_at == now
+                )
+            ).all()
+            for job in failed:
+                TranscodeQueue._remove_input(job)
+            logger.warning(f"Failed {len(failed)} transcode job(s) that stopped responding too many times")
+        
+        result = session.execute(
+            update(TranscodeJob)
+            .where(
+                TranscodeJob.status == JOB_PROCESSING,
+                TranscodeJob.locked_at < cutoff
+            )
+            .values(
+                status=JOB_QUEUED,
+                worker_id=None,
+                locked_at=None,
+                progress=0,
+                updated_at=now
+            )
+        )
+        session.commit()
+        
+        if result.rowcount:
+            logger.warning(f"Requeued {result.rowcount} stale transcode job(s)")
+        return result.rowcount
+    
+    @staticmethod
+    def _owned(job_id: int, worker_id: str):
+        """WHERE clause matching the job only while worker_id still holds it."""
+        return (
+            TranscodeJob.id == job_id,
+            TranscodeJob.worker_id == worker_id,
+            TranscodeJob.status == JOB_PROCESSING
+        )
+    
+    def set_progress(self, job_id: int, worker_id: str, progress: Optional[int] = None) -> bool:
+        """
+        Refresh the job's lock (heartbeat), recording progress if given.
+        
+        Returns:
+            False if the worker no longer owns the job (requeued as stale)
+        """
+        now = datetime.utcnow()
+        values = {"locked_at": now, "updated_at": now}
+        if progress is not None:
+            values["progress"] = progress
+        with Session(engine) as session:
+            result = session.execute(
+                update(TranscodeJob).where(*self._owned(job_id, worker_id)).values(**values)
+            )
+            session.commit()
+        return result.rowcount == 1
+    
+    def _heartbeat(self, job_id: int, worker_id: str, stop: threading.Event, lost: threading.Event) -> None:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                if not self.set_progress(job_id, worker_id):
+                    logger.warning(f"Transcode job {job_id} is no longer owned by worker {worker_id}")
+                    lost.set()
+                    return
+            except Exception as e:
+                logger.error(f"Transcode job {job_id} heartbeat failed: {str(e)}")
+    
+    @staticmethod
+    def _apply_to_target(session: Session, job: TranscodeJob, stored: StoredMedia) -> None:
+        """Fill in the portfolio item / project media row the job was created for."""
+        if job.target_type == TARGET_PORTFOLIO_ITEM:
+            item = session.get(PortfolioItem, job.target_id)
+            if item and item.user_id == job.user_id:
+                item.content_url = stored.url
+                item.file_size = stored.final_size
+                if stored.thumbnail_url:
+                    item.thumbnail_url = stored.thumbnail_url
+                if stored.hls_url:
+                    item.hls_url = stored.hls_url
+                if item.content_type == "audio":
+                    item.waveform = encode_waveform(stored.waveform)
+                item.updated_at = datetime.utcnow()
+                session.add(item)
+        elif job.target_type == TARGET_PROJECT_MEDIA:
+            media = session.get(ProjectMedia, job.target_id)
+            project = session.get(Project, media.project_id) if media else None
+            if media and project and project.user_id == job.user_id:
+                media.media_url = stored.url
+                if stored.thumbnail_url:
+                    media.thumbnail_url = stored.thumbnail_url
+                session.add(media)
+    
+    @staticmethod
+    def _remove_input(job: TranscodeJob) -> None:
+        if job.input_path and os.path.exists(job.input_path):
+            try:
+                os.unlink(job.input_path)
+            except Exception:
+                pass
+    
+    def process(self, job_id: int) -> None:
+        """Run a claimed job to completion (or failure), heartbeating throughout."""
+        with Session(engine) as session:
+            job = session.get(TranscodeJob, job_id)
+            if not job:
+                return
+            session.expunge(job)
+        
+        stop = threading.Event()
+        lost = threading.Event()  # Set once another worker holds the job
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(job_id, job.worker_id, stop, lost),
+            name=f"transcode-heartbeat-{job_id}",
+            daemon=True
+        )
+        heartbeat.start()
+        try:
+            self._process(job, lost)
+        finally:
+            stop.set()
+            heartbeat.join()
+    
+    def _process(self, job: TranscodeJob, lost: threading.Event) -> None:
+        job_id = job.id
+        worker_id = job.worker_id
+        if job.source_key and not os.path.exists(job.input_path):
+            os.makedirs(os.path.dirname(job.input_path), exist_ok=True)
+            if not s3_service.download_file(job.source_key, job.input_path):
+                self._finish_failed(
+                    job_id,
+                    worker_id,
+                    "Could not download uploaded object from R2",
+                    retry=job.attempts < settings.TRANSCODE_MAX_ATTEMPTS
+                )
+                return
+        
+        if not os.path.exists(job.input_path):
+            self._finish_failed(job_id, worker_id, "Spooled upload is missing", retry=False)
+            return
+        
+        def report(progress: int) -> None:
+            if lost.is_set() or not self.set_progress(job_id, worker_id, progress):
+                lost.set()
+                raise ProcessingCancelledError(f"Worker {worker_id} lost transcode job {job_id}")
+        
+        try:
+            # FFmpeg is killed as soon as the heartbeat finds the job lost
+            with compression_service.cancellable(lost):
+                stored = process_media_file(
+                    job.input_path,
+                    job.original_filename,
+                    job.content_type,
+                    job.media_type,
+                    compress=job.compress,
+                    quality=job.quality,
+                    progress_callback=report,
+                    sha256=job.sha256
+                )
+        except ProcessingCancelledError:
+            # The new owner works from the same input and writes the outcome
+            logger.warning(f"Transcode job {job_id} stopped: worker {worker_id} no longer owns it")
+            return
+        except MediaRejectedError as e:
+            logger.info(f"Transcode job {job_id} rejected: {str(e)}")
+            self._finish_failed(job_id, worker_id, str(e), retry=False)
+            return
+        except Exception as e:
+            logger.error(f"Transcode job {job_id} failed: {str(e)}")
+            self._finish_failed(job_id, worker_id, str(e), retry=job.attempts < settings.TRANSCODE_MAX_ATTEMPTS)
+            return
+        
+        with Session(engine) as session:
+            now = datetime.utcnow()
+            result = session.execute(
+                update(TranscodeJob)
+                .where(*self._owned(job_id, worker_id))
+                .values(
+                    status=JOB_COMPLETED,
+                    progress=100,
+                    result_url=stored.url,
+                    result_filename=stored.filename,
+                    result_hls_url=stored.hls_url,
+                    final_size=stored.final_size,
+                    compression_applied=stored.compression_applied,
+                    deduplicated=stored.deduplicated,
+                    processing_path=stored.processing_path,
+                    error=stored.compression_error,
+                    completed_at=now,
+                    updated_at=now
+                )
+            )
+            if result.rowcount != 1:
+                # Requeued as stale meanwhile: the worker that holds it now writes the result
+                session.rollback()
+                logger.warning(f"Transcode job {job_id} finished after worker {worker_id} lost it; result discarded")
+                return
+            save_variants(session, stored.url, stored.variants)
+            self._apply_to_target(session, job, stored)
+            session.commit()
+            self._remove_input(job)
+            
+            # The processed copy lives under a new key; drop the raw direct upload
+            if job.source_key:
+                s3_service.delete_file(job.source_key)
+        
+        logger.info(f"Transcode job {job_id} completed: {stored.url}")
+    
+    def _finish_failed(self, job_id: int, worker_id: str, error: str, retry: bool) -> None:
+        now = datetime.utcnow()
+        values = {"error": error[:500], "worker_id": None, "locked_at": None, "updated_at": now}
+        if retry:
+            values.update(status=JOB_QUEUED, progress=0)
+        else:
+            values.update(status=JOB_FAILED, completed_at=now)
+        with Session(engine) as session:
+            result = session.execute(
+                update(TranscodeJob).where(*self._owned(job_id, worker_id)).values(**values)
+            )
+            session.commit()
+            if result.rowcount != 1:
+                logger.warning(f"Transcode job {job_id} failed after worker {worker_id} lost it; left to its new worker")
+                return
+            if not retry:
+                self._remove_input(session.get(TranscodeJob, job_id))
+
+
+class TranscodeWorkerPool:
+    """Bounded pool of threads that drain the transcode queue.
+    
+    FFmpeg runs as a subprocess, so threads give real parallelism here;
+    the pool size caps how many encodes run at once per process.
+    """
+    
+    def __init__(self, queue: TranscodeQueue):
+        self.queue = queue
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+    
+    def _worker_id(self, index: int) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{index}"
+    
+    def _run(self, index: int) -> None:
+        worker_id = self._worker_id(index)
+        while not self._stop.is_set():
+            try:
+                with Session(engine) as session:
+                    # One thread per pool handles stale-job recovery and
+                    # expired upload-session cleanup (throttled internally)
+                    if index == 0:
+                        self.queue.recover_stale(session)
+                        upload_session_service.collect_garbage(session)
+                    job = self.queue.claim_next(session, worker_id)
+                    job_id = job.id if job else None
+                if job_id is not None:
+                    logger.info(f"Worker {worker_id} processing transcode job {job_id}")
+                    self.queue.process(job_id)
+                    continue
+            except Exception as e:
+                logger.error(f"Transcode worker {worker_id} error: {str(e)}")
+            self._stop.wait(settings.TRANSCODE_POLL_INTERVAL_SECONDS)
+    
+    def start(self, concurrency: Optional[int] = None) -> None:
+        """Start worker threads (no-op if already running)."""
+        if self._threads:
+            return
+        concurrency = max(1, concurrency or settings.TRANSCODE_WORKER_CONCURRENCY)
+        self._stop.clear()
+        for index in range(concurrency):
+            thread = threading.Thread(
+                target=self._run,
+                args=(index,),
+                name=f"transcode-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Transcode worker pool started with {concurrency} worker(s)")
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Signal workers to stop and wait for in-flight jobs."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+    
+    def wait(self) -> None:
+        """Block until the pool is stopped."""
+        for thread in self._threads:
+            thread.join()
+
+
+# Singleton instances
+transcode_queue = TranscodeQueue()
+transcode_worker_pool = TranscodeWorkerPool(transcode_queue)
@@ -0,0 +1,322 @@
+"""Resumable chunked uploads.
+
+Mobile clients on flaky connections upload in chunks instead of one long
+multipart request: create a session, PATCH chunks at increasing offsets,
+GET the session after a dropped connection to learn where to resume, then
+complete it. Chunks are appended to a spool file in TRANSCODE_SPOOL_DIR;
+the file's length is the authoritative offset, so bytes received before a
+disconnect are never lost or double-counted.
+
+The declared size is enforced on every chunk and the magic bytes are
+checked as soon as the first SNIFF_BYTES arrive, so a bad upload is
+rejected early rather than after the whole body. Completed files go
+through the same pipeline as POST /media.
+
+Sessions idle for longer than UPLOAD_SESSION_TTL_SECONDS expire; the
+transcode worker deletes them and their partial files.
+"""
+import os
+import time
+import fcntl
+import secrets
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.models import UploadSession
+from app.services.file_validation import file_validator, SNIFF_BYTES
+from app.services.upload_spool import SpooledUpload
+
+logger = logging.getLogger(__name__)
+
+# Session status values
+SESSION_ACTIVE = "active"
+SESSION_COMPLETED = "completed"
+
+# Spool file prefix for partial uploads (orphan sweep matches on it)
+SESSION_FILE_PREFIX = "session_"
+
+
+class UploadSessionError(Exception):
+    """Raised when a chunk cannot be applied to a session."""
+    
+    def __init__(self, message: str, status_code: int = 400, offset: Optional[int] = None):
+        self.status_code = status_code
+        self.offset = offset
+        super().__init__(message)
+
+
+class UploadSessionService:
+    """Stores upload sessions and appends chunks to their spool files."""
+    
+    def __init__(self):
+        self._last_gc = 0.0
+    
+    @staticmethod
+    def create(
+        session: Session,
+        user_id: int,
+        media_type: str,
+        size: int,
+        filename: Optional[str],
+        content_type: Optional[str],
+        compress: bool = True,
+        quality: str = "standard",
+        async_processing: bool = False,
+        target_type: Optional[str] = None,
+        target_id: Optional[int] = None
+    ) -> UploadSession:
+        """Create an active session with an empty spool file."""
+        session_id = secrets.token_urlsafe(24)
+        ext = Path(filename).suffix.lower() if filename else ""
+        os.makedirs(settings.TRANSCODE_SPOOL_DIR, exist_ok=True)
+        path = os.path.abspath(
+            os.path.join(settings.TRANSCODE_SPOOL_DIR, f"{SESSION_FILE_PREFIX}{session_id}{ext}")
+        )
+        open(path, "wb").close()
+        
+        now = datetime.utcnow()
+        upload = UploadSession(
+            id=session_id,
+            user_id=user_id,
+            media_type=media_type,
+            filename=filename,
+            content_type=content_type,
+            size=size,
+            path=path,
+            compress=compress,
+            quality=quality,
+            async_processing=async_processing,
+            target_type=target_type,
+            target_id=target_id,
+            expires_at=now + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS),
+            created_at=now,
+            updated_at=now
+        )
+        session.add(upload)
+        session.commit()
+        session.refresh(upload)
+        
+        logger.info(f"Created upload session {session_id} ({media_type}, {size/1024/1024:.2f}MB) for user {user_id}")
+        return upload
+    
+    def get(self, session: Session, session_id: str, user_id: int) -> Optional[UploadSession]:
+        """Return the user's session, or None if it does not exist or has expired."""
+        upload = session.get(UploadSession, session_id)
+        if not upload or upload.user_id != user_id:
+            return None
+        if upload.expires_at < datetime.utcnow():
+            self.delete(session, upload)
+            return None
+        return upload
+    
+    @staticmethod
+    def current_offset(upload: UploadSession) -> int:
+        """Bytes received so far (the spool file's length)."""
+        if upload.status != SESSION_ACTIVE:
+            return upload.size
+        try:
+            return os.path.getsize(upload.path)
+        except OSError:
+            return 0
+    
+    async def append_chunk(self, session: Session, upload: UploadSession, offset: int, stream) -> int:
+        """
+        Append a request body to the session's spool file.
+        
+        Bytes received before a client disconnect are kept; the client
+        resumes from the offset GET returns.
+        
+        Args:
+            session: Database session
+            upload: Active upload session
+            offset: Offset the client believes it is writing at
+            stream: Async iterator of body chunks
+        
+        Returns:
+            New offset
+        
+        Raises:
+            UploadSessionError: 409 on offset mismatch or a concurrent write,
+                413 past the declared size, 400 if the magic bytes do not match
+        """
+        if upload.status != SESSION_ACTIVE:
+            raise UploadSessionError("Upload session is already completed", 409, upload.size)
+        
+        with open(upload.path, "r+b") as out:
+            try:
+                fcntl.flock(out, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadSessionError("Another chunk is being written to this session", 409)
+            
+            current = os.fstat(out.fileno()).st_size
+            if offset != current:
+                raise UploadSessionError(
+                    f"Upload-Offset {offset} does not match current offset {current}", 409, current
+                )
+            
+            out.seek(current)
+            written = current
+            try:
+                async for chunk in stream:
+                    if not chunk:
+                        continue
+                    if written + len(chunk) > upload.size:
+                        # Drop the whole chunk so the offset stays where the client can resume
+                        out.truncate(current)
+                        raise UploadSessionError(
+                            f"Chunk exceeds declared upload size of {upload.size} bytes", 413, current
+                        )
+                    out.write(chunk)
+                    written += len(chunk)
+            finally:
+                out.flush()
+        
+        upload.expires_at = datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+        upload.updated_at = datetime.utcnow()
+        session.add(upload)
+        session.commit()
+        
+        if not upload.validated and written >= min(SNIFF_BYTES, upload.size):
+            self.validate(session, upload)
+        
+        return written
+    
+    def validate(self, session: Session, upload: UploadSession) -> None:
+        """
+        Check the magic bytes against the declared media type.
+        
+        Raises:
+            UploadSessionError: 400 if they do not match (the session is deleted)
+        """
+        with open(upload.path, "rb") as f:
+            header = f.read(SNIFF_BYTES)
+        is_valid, mime, error = file_validator.sniff_media_type(header, upload.media_type)
+        if not is_valid:
+            logger.warning(f"Upload session {upload.id} rejected: {error}")
+            self.delete(session, upload)
+            raise UploadSessionError(error, 400)
+        
+        upload.validated = True
+        session.add(upload)
+        session.commit()
+    
+    def claim_for_completion(self, session: Session, upload: UploadSession) -> Optional[SpooledUpload]:
+        """
+        Mark a fully received session completed and hand over its file.
+        
+        The status change is a conditional UPDATE so only one of several
+        concurrent complete calls gets the file. The file is renamed out of
+        the session prefix; whoever processes it owns it from here on.
+        
+        Returns:
+            The spooled file, or None if another request completed the session first
+        
+        Raises:
+            UploadSessionError: 409 if bytes are still missing, 400 on a magic-byte mismatch
+        """
+        received = self.current_offset(upload)
+        if received != upload.size:
+            raise UploadSessionError(
+                f"Upload incomplete: received {received} of {upload.size} bytes", 409, received
+            )
+        if not upload.validated:
+            self.validate(session, upload)
+        
+        now = datetime.utcnow()
+        result = session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == upload.id, UploadSession.status == SESSION_ACTIVE)
+            .values(
+                status=SESSION_COMPLETED,
+                expires_at=now + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS),
+                updated_at=now
+            )
+        )
+        session.commit()
+        if result.rowcount != 1:
+            return None
+        session.refresh(upload)
+        
+        ext = Path(upload.path).suffix
+        path = os.path.join(os.path.dirname(upload.path), f"upload_{upload.id}{ext}")
+        os.replace(upload.path, path)
+        return SpooledUpload(path=path, size=upload.size, filename=upload.filename or "")
+    
+    @staticmethod
+    def record_result(
+        session: Session,
+        upload: UploadSession,
+        job_id: Optional[int] = None,
+        result_url: Optional[str] = None
+    ) -> None:
+        """Remember the job or URL so a repeated complete call can return it."""
+        upload.job_id = job_id
+        upload.result_url = result_url
+        upload.updated_at = datetime.utcnow()
+        session.add(upload)
+        session.commit()
+    
+    @staticmethod
+    def delete(session: Session, upload: UploadSession) -> None:
+        """Delete a session and its partial file."""
+        if upload.status == SESSION_ACTIVE:
+            try:
+                os.unlink(upload.path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Could not delete upload session file {upload.path}: {str(e)}")
+        session.delete(upload)
+        session.commit()
+    
+    def collect_garbage(self, session: Session, force: bool = False) -> int:
+        """
+        Delete expired sessions and orphaned partial files.
+        
+        Throttled to once per UPLOAD_SESSION_GC_INTERVAL_SECONDS unless forced,
+        so it can be called on every worker poll.
+        
+        Returns:
+            Number of sessions and files removed
+        """
+        if not force and time.monotonic() - self._last_gc < settings.UPLOAD_SESSION_GC_INTERVAL_SECONDS:
+            return 0
+        self._last_gc = time.monotonic()
+        
+        removed = 0
+        expired = session.exec(
+            select(UploadSession).where(UploadSession.expires_at < datetime.utcnow())
+        ).all()
+        for upload in expired:
+            self.delete(session, upload)
+            removed += 1
+        
+        # Partial files whose row is gone (e.g. deleted by hand or a crash mid-create)
+        spool_dir = settings.TRANSCODE_SPOOL_DIR
+        if os.path.isdir(spool_dir):
+            active = set(session.exec(
+                select(UploadSession.path).where(UploadSession.status == SESSION_ACTIVE)
+            ).all())
+            cutoff = time.time() - settings.UPLOAD_SESSION_TTL_SECONDS
+            for entry in os.scandir(spool_dir):
+                if not entry.name.startswith(SESSION_FILE_PREFIX) or os.path.abspath(entry.path) in active:
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        
+        if removed:
+            logger.info(f"Removed {removed} expired upload sessions/files")
+        return removed
+
+
+# Singleton instance
+upload_session_service = UploadSessionService()
@@ -0,0 +1,117 @@
+"""Disk spooling for large uploads.
+
+Copies an incoming upload to a named temp file in fixed-size chunks so the
+request body never has to be held in memory. The size limit is enforced while
+copying, and the resulting path can be handed straight to FFmpeg and R2.
+The SHA-256 of the body is computed on the same pass for deduplication.
+When a media type is given, the first chunk's magic bytes are checked
+before anything is written.
+"""
+import os
+import hashlib
+import tempfile
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from fastapi import UploadFile
+
+from app.services.file_validation import file_validator, SNIFF_BYTES
+
+logger = logging.getLogger(__name__)
+
+# 1MB chunks keep peak memory per upload at a few MB regardless of file size
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds its size limit while spooling."""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"Upload exceeds maximum size of {max_size} bytes")
+
+
+class UploadRejectedError(Exception):
+    """Raised when an upload's magic bytes do not match its declared media type."""
+
+
+@dataclass
+class SpooledUpload:
+    """An upload written to a local temp file."""
+    path: str
+    size: int
+    filename: str
+    sha256: str = ""  # Hex digest of the uploaded bytes
+    
+    def cleanup(self) -> None:
+        """Delete the spooled file."""
+        if self.path and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+            except Exception:
+                pass
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_size: int,
+    chunk_size: int = SPOOL_CHUNK_SIZE,
+    directory: Optional[str] = None,
+    media_type: Optional[str] = None
+) -> SpooledUpload:
+    """
+    Stream an UploadFile to a named temp file, enforcing max_size.
+    
+    Args:
+        file: Incoming upload
+        max_size: Maximum allowed size in bytes
+        chunk_size: Bytes read per iteration
+        directory: Where to create the file (system temp dir by default)
+        media_type: Declared media type to check the magic bytes against (photo, video, audio, pdf)
+    
+    Returns:
+        SpooledUpload pointing at the temp file (caller must cleanup()), with its SHA-256
+    
+    Raises:
+        UploadTooLargeError: If the body exceeds max_size
+        UploadRejectedError: If the content does not match media_type
+    """
+    # Reject early when the multipart parser already knows the size
+    if file.size is not None and file.size > max_size:
+        raise UploadTooLargeError(max_size)
+    
+    if media_type:
+        header = await file.read(SNIFF_BYTES)
+        await file.seek(0)
+        is_valid, _, error = file_validator.sniff_media_type(header, media_type)
+        if not is_valid:
+            raise UploadRejectedError(error)
+    
+    suffix = Path(file.filename).suffix.lower() if file.filename else ""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="upload_", dir=directory)
+    size = 0
+    digest = hashlib.sha256()
+    
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(max_size)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.unlink(path)
+        except Exception:
+            pass
+        raise
+    
+    logger.debug(f"Spooled upload '{file.filename}' to {path} ({size} bytes)")
+    return SpooledUpload(path=path, size=size, filename=file.filename or "", sha256=digest.hexdigest())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Async Session Benchmark
+Compares sync (get_session) and async (get_async_session) database sessions
+inside async route handlers, the situation every router was in before the
+public read paths moved to the async engine.
+
+Both routes run the queries of the public profile read (user, profile,
+points, srcset lookup) through the app's own engines. A fixed delay is
+added to every SQL statement at the driver, like a network round trip to
+PostgreSQL: on the sync session it blocks the event loop, on the async
+session only aiosqlite's connection thread waits. Requests are sent
+in-process through httpx's ASGI transport with --concurrency in flight,
+and requests/sec and p50/p95/p99 latency are reported per session type.
+
+Keep --concurrency below the sync pool size (pool_size + max_overflow, 15
+for SQLite): past that, a sync handler blocks the event loop waiting for a
+pooled connection that can only be returned once the loop runs again, and
+requests stall until pool_timeout.
+
+Pass --database-url postgresql://... (and --latency-ms 0) to measure
+against a real server instead; the tables must already exist there.
+
+Usage:
+    python benchmarks/async_sessions.py [--requests N] [--concurrency N] [--latency-ms MS] [--json]
+
+Examples:
+    python benchmarks/async_sessions.py
+    python benchmarks/async_sessions.py --latency-ms 5 --concurrency 14
+    python benchmarks/async_sessions.py --database-url postgresql://localhost/webstar --latency-ms 0 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production-use")
+
+BENCH_USERNAME = "bench_user"
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def add_latency(latency_s: float):
+    """Delay every statement by latency_s, in the thread that runs it."""
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+    from app.db.base import engine, async_engine
+    
+    def delay(statement):
+        time.sleep(latency_s)
+    
+    @event.listens_for(engine, "connect")
+    def sync_connect(dbapi_conn, connection_record):
+        dbapi_conn.set_trace_callback(delay)
+    
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def async_connect(dbapi_conn, connection_record):
+        # aiosqlite runs the callback on its connection thread
+        await_only(dbapi_conn.driver_connection.set_trace_callback(delay))
+
+
+def seed():
+    from sqlmodel import Session, select
+    from app.db.base import engine, create_db_and_tables
+    from app.db.models import User, Profile, UserPoints, ImageVariant
+    
+    create_db_and_tables()
+    with Session(engine) as session:
+        if session.exec(select(User).where(User.username == BENCH_USERNAME)).first():
+            return
+        user = User(email="bench@example.com", username=BENCH_USERNAME, is_active=True)
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        session.add(Profile(user_id=user.id, profile_picture="/uploads/photo/bench.webp"))
+        session.add(UserPoints(user_id=user.id, total_points=100))
+        for width in (320, 640, 1280):
+            session.add(ImageVariant(
+                source_url="/uploads/photo/bench.webp", width=width, url=f"/uploads/photo/bench_{width}.webp"
+            ))
+        session.commit()
+
+
+def build_app():
+    """Two routes with the same reads, one per session type."""
+    from fastapi import Depends, FastAPI
+    from sqlmodel import Session, select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.db.base import get_session, get_async_session
+    from app.db.models import User, Profile, UserPoints
+    from app.services.image_variants import get_srcset, get_srcset_async
+    
+    app = FastAPI()
+    
+    @app.get("/sync/{username}")
+    async def read_sync(username: str, session: Session = Depends(get_session)):
+        user = session.exec(select(User).where(User.username == username)).first()
+        profile = session.exec(select(Profile).where(Profile.user_id == user.id)).first()
+        points = session.exec(select(UserPoints).where(UserPoints.user_id == user.id)).first()
+        return {
+            "id": profile.id,
+            "points": points.total_points,
+            "variants": get_srcset(session, profile.profile_picture),
+        }
+    
+    @app.get("/async/{username}")
+    async def read_async(username: str, session: AsyncSession = Depends(get_async_session)):
+        user = (await session.exec(select(User).where(User.username == username))).first()
+        profile = (await session.exec(select(Profile).where(Profile.user_id == user.id))).first()
+        points = (await session.exec(select(UserPoints).where(UserPoints.user_id == user.id))).first()
+        return {
+            "id": profile.id,
+            "points": points.total_points,
+            "variants": await get_srcset_async(session, profile.profile_picture),
+        }
+    
+    return app
+
+
+async def run_mode(app, mode: str, args) -> dict:
+    import httpx
+    
+    url = f"/{mode}/{BENCH_USERNAME}"
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm-up: open pool connections
+        await asyncio.gather(*(client.get(url) for _ in range(min(args.concurrency, 10))))
+        
+        latencies = []
+        queue = iter(range(args.requests))
+        
+        async def worker():
+            for _ in queue:
+                started = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} returned {response.status_code}: {response.text}")
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+    
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "wall_s": round(wall, 3),
+        "requests_per_sec": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def run(args):
+    workdir = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix="webstar_async_bench_")
+        os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    
+    from app.db.base import async_engine
+    
+    seed()
+    if args.latency_ms > 0:
+        if "sqlite" not in os.environ["DATABASE_URL"]:
+            print("❌ --latency-ms is only supported on SQLite; use --latency-ms 0 with a real server")
+            sys.exit(1)
+        add_latency(args.latency_ms / 1000)
+    app = build_app()
+    
+    async def main():
+        try:
+            return [await run_mode(app, mode, args) for mode in args.modes.split(",")]
+        finally:
+            await async_engine.dispose()
+    
+    results = asyncio.run(main())
+    
+    if workdir:
+        for name in os.listdir(workdir):
+            os.unlink(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    
+    if args.json:
+        print(json.dumps({
+            "latency_ms": args.latency_ms,
+            "concurrency": args.concurrency,
+            "database": "sqlite" if workdir else args.database_url.split(":")[0],
+            "results": results,
+        }, indent=2))
+        return
+    
+    for row in results:
+        print(
+            f"🗄️  {row['mode']:<6} {row['requests_per_sec']:>8.1f} req/s   "
+            f"p50 {row['p50_ms']:>8.1f}ms   p95 {row['p95_ms']:>8.1f}ms   p99 {row['p99_ms']:>8.1f}ms"
+        )
+    rows = {row["mode"]: row for row in results}
+    if "sync" in rows and "async" in rows:
+        speedup = rows["async"]["requests_per_sec"] / rows["sync"]["requests_per_sec"]
+        print(f"\n📊 async sessions: {speedup:.1f}x the throughput of sync sessions "
+              f"({args.latency_ms}ms per statement, {args.concurrency} in flight)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async database sessions in async handlers")
+    parser.add_argument("--modes", default="sync,async", help="Session types to compare")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per session type")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Delay added to each SQL statement (SQLite only)")
+    parser.add_argument("--database-url", default="", help="Benchmark this database instead of a temporary SQLite file")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    run(parser.parse_args())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Compression Preset Benchmark
+Generates deterministic test media with FFmpeg lavfi sources (testsrc2,
+sine, anoisesrc, noise) and runs every VIDEO_PRESETS / IMAGE_PRESETS /
+AUDIO_PRESETS entry through MediaCompressionService. Reports per encode:
+wall time, CPU time and peak RSS of the FFmpeg process, compression ratio,
+and SSIM/PSNR against the source (video and images).
+
+Each encode runs in a fresh worker process so CPU time and peak RSS cover
+exactly one FFmpeg run. Save the JSON from two commits and diff them to see
+what a preset change costs.
+
+Requires FFmpeg on PATH.
+
+Usage:
+    python benchmarks/compression_presets.py [--kinds video,image,audio] [--presets high,standard,low] [--json] [--output FILE]
+
+Examples:
+    python benchmarks/compression_presets.py
+    python benchmarks/compression_presets.py --kinds video --resolutions 1920x1080 --durations 10,30
+    python benchmarks/compression_presets.py --quick --output bench-$(git rev-parse --short HEAD).json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production-use")
+
+# Fixed seeds keep the noise sources identical between runs
+NOISE_SEED = 42
+
+
+def ffmpeg(*args: str):
+    subprocess.run(["ffmpeg", "-v", "error", "-y", *args], check=True)
+
+
+def make_video(path: Path, size: str, duration: int):
+    """High-bitrate H.264/AAC clip with grain, like a phone upload."""
+    ffmpeg(
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30,noise=alls=6:allf=t:all_seed={NOISE_SEED}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(duration),
+        "-c:v", "libx264", "-crf", "12", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "256k",
+        "-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact",
+        str(path),
+    )
+
+
+def make_image(path: Path, size: str):
+    """Single lossless frame with fine detail and noise."""
+    ffmpeg(
+        "-f", "lavfi", "-i", f"testsrc2=size={size},noise=alls=20:allf=u:all_seed={NOISE_SEED}",
+        "-frames:v", "1",
+        str(path),
+    )
+
+
+def make_audio(path: Path, duration: int):
+    """Uncompressed stereo tone plus pink noise."""
+    ffmpeg(
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.1:sample_rate=48000:seed={NOISE_SEED}",
+        "-filter_complex", "[0:a][1:a]amix=inputs=2,aformat=channel_layouts=stereo",
+        "-t", str(duration),
+        "-c:a", "pcm_s16le",
+        str(path),
+    )
+
+
+def measure(kind: str, preset: str, path: str, image_format: str) -> dict:
+    """Run one compression in this (fresh) process and collect FFmpeg resource usage."""
+    from app.services.media_compression_service import compression_service
+    
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    if kind == "video":
+        result = compression_service.compress_video_file(path, os.path.basename(path), preset)
+    elif kind == "image":
+        result = compression_service.compress_image_file(path, os.path.basename(path), preset, image_format)
+    else:
+        result = compression_service.compress_audio_file(path, os.path.basename(path), preset)
+    wall = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    
+    return {
+        "success": result.success,
+        "error": result.error,
+        "output_path": result.output_path,
+        "output_size": result.compressed_size,
+        "wall_s": round(wall, 3),
+        "cpu_s": round((after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime), 3),
+        # ru_maxrss is KB on Linux; the max over this process's children is the encode
+        "peak_rss_mb": round(after.ru_maxrss / 1024, 1),
+    }
+
+
+def quality(distorted: str, reference: str, size: str) -> dict:
+    """SSIM and PSNR of an encode against its source, scaled back to the source size."""
+    width, height = size.split("x")
+    graph = (
+        f"[0:v]scale={width}:{height}:flags=bicubic,format=yuv420p,split[d1][d2];"
+        f"[1:v]format=yuv420p,split[r1][r2];"
+        f"[d1][r1]ssim;[d2][r2]psnr"
+    )
+    out = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-i", distorted, "-i", reference, "-lavfi", graph, "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    ssim = re.search(r"SSIM .*All:([\d.]+)", out.stderr)
+    psnr = re.search(r"PSNR .*average:([\d.]+|inf)", out.stderr)
+    return {
+        "ssim": float(ssim.group(1)) if ssim else None,
+        "psnr_db": float(psnr.group(1)) if psnr and psnr.group(1) != "inf" else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def build_fixtures(workdir: Path, args) -> list:
+    """Return (kind, label, path, size) for every fixture requested."""
+    fixtures = []
+    kinds = args.kinds.split(",")
+    if "video" in kinds:
+        for size in args.resolutions.split(","):
+            for duration in [int(d) for d in args.durations.split(",")]:
+                path = workdir / f"video_{size}_{duration}s.mp4"
+                make_video(path, size, duration)
+                fixtures.append(("video", f"{size} {duration}s", path, size))
+    if "image" in kinds:
+        for size in args.image_sizes.split(","):
+            path = workdir / f"image_{size}.png"
+            make_image(path, size)
+            fixtures.append(("image", size, path, size))
+    if "audio" in kinds:
+        for duration in [int(d) for d in args.audio_durations.split(",")]:
+            path = workdir / f"audio_{duration}s.wav"
+            make_audio(path, duration)
+            fixtures.append(("audio", f"{duration}s", path, None))
+    return fixtures
+
+
+def run(args):
+    if args.quick:
+        args.resolutions, args.durations = "640x360,1280x720", "5"
+        args.image_sizes, args.audio_durations = "1024x768,2048x1536", "10"
+    
+    from app.services.media_compression_service import compression_service
+    preset_tables = {
+        "video": compression_service.VIDEO_PRESETS,
+        "image": compression_service.IMAGE_PRESETS,
+        "audio": compression_service.AUDIO_PRESETS,
+    }
+    presets = args.presets.split(",")
+    workdir = Path(tempfile.mkdtemp(prefix="webstar_preset_bench_"))
+    results = []
+    
+    try:
+        if not args.json:
+            print("🎬 Generating fixtures...")
+        fixtures = build_fixtures(workdir, args)
+        
+        for kind, label, path, size in fixtures:
+            input_size = path.stat().st_size
+            for preset in presets:
+                # New process per encode: RUSAGE_CHILDREN then covers one FFmpeg run
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    m = pool.submit(measure, kind, preset, str(path), args.image_format).result()
+                
+                row = {
+                    "kind": kind,
+                    "fixture": label,
+                    "preset": preset,
+                    "settings": preset_tables[kind].get(preset),
+                    "input_bytes": input_size,
+                    "output_bytes": m["output_size"] if m["success"] else None,
+                    "ratio": round(m["output_size"] / input_size, 4) if m["success"] and input_size else None,
+                    "kept_original": m["success"] and m["output_path"] == str(path),
+                    "wall_s": m["wall_s"],
+                    "cpu_s": m["cpu_s"],
+                    "peak_rss_mb": m["peak_rss_mb"],
+                    "ssim": None,
+                    "psnr_db": None,
+                    "error": m["error"],
+                }
+                if m["success"] and size and not args.no_quality:
+                    row.update(quality(m["output_path"], str(path), size))
+                if m["output_path"] and m["output_path"] != str(path):
+                    os.unlink(m["output_path"])
+                results.append(row)
+                
+                if not args.json:
+                    status = "✅" if m["success"] else "❌"
+                    quality_text = f"SSIM {row['ssim']:.4f} PSNR {row['psnr_db'] or 0:5.2f}dB" if row["ssim"] else ""
+                    print(
+                        f"{status} {kind:>5} {label:<16} {preset:<8} "
+                        f"{m['wall_s']:>7.2f}s wall {m['cpu_s']:>7.2f}s cpu {m['peak_rss_mb']:>7.1f}MB "
+                        f"ratio {row['ratio'] or 0:.3f} {quality_text}"
+                    )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    ffmpeg_version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    report = {
+        "commit": git_commit(),
+        "ffmpeg": ffmpeg_version,
+        "host": {
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "image_format": args.image_format,
+        "results": results,
+    }
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        if not args.json:
+            print(f"📄 Results written to {args.output}")
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark media compression presets on synthetic fixtures")
+    parser.add_argument("--kinds", default="video,image,audio", help="Media kinds to benchmark")
+    parser.add_argument("--presets", default="high,standard,low", help="Presets to run")
+    parser.add_argument("--resolutions", default="640x360,1280x720,1920x1080", help="Video fixture sizes")
+    parser.add_argument("--durations", default="5,15", help="Video fixture lengths in seconds")
+    parser.add_argument("--image-sizes", default="1024x768,2048x1536,4000x3000", help="Image fixture sizes")
+    parser.add_argument("--audio-durations", default="30", help="Audio fixture lengths in seconds")
+    parser.add_argument("--image-format", default="webp", choices=["webp", "jpeg"], help="Image output format")
+    parser.add_argument("--quick", action="store_true", help="Small fixture set for a fast comparison")
+    parser.add_argument("--no-quality", action="store_true", help="Skip SSIM/PSNR measurement")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    run(parser.parse_args())
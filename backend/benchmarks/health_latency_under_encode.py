@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+/health Latency Under Concurrent Video Encodes
+Starts the API under uvicorn against a throwaway SQLite database, uploads N
+synthetic videos to /api/uploads/media at once, and samples /health latency
+before and during the encodes. With FFmpeg off the event loop the p99 should
+stay flat; a blocking encode shows up as multi-second stalls.
+
+Requires FFmpeg on PATH.
+
+Usage:
+    python benchmarks/health_latency_under_encode.py [--videos N] [--duration SECONDS] [--json]
+
+Examples:
+    python benchmarks/health_latency_under_encode.py
+    python benchmarks/health_latency_under_encode.py --videos 8 --duration 30 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies_ms):
+    return {
+        "samples": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+        "mean_ms": round(statistics.mean(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_video(path: Path, duration: int, size: str):
+    """Generate a deterministic test clip that needs a real re-encode."""
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30",
+            "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+            "-t", str(duration),
+            "-c:v", "mpeg4", "-q:v", "2",
+            "-c:a", "pcm_s16le",
+            "-y", str(path),
+        ],
+        check=True,
+    )
+
+
+def prepare_database(env: dict) -> str:
+    """Create tables and a benchmark user; return an access token."""
+    script = (
+        "from sqlmodel import Session\n"
+        "from app.db.base import engine, create_db_and_tables\n"
+        "from app.db.models import User\n"
+        "from app.core.security import create_access_token\n"
+        "create_db_and_tables()\n"
+        "with Session(engine) as s:\n"
+        "    u = User(email='bench@example.com', username='bench')\n"
+        "    s.add(u); s.commit(); s.refresh(u)\n"
+        "    print(create_access_token({'sub': u.id}))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env, cwd=env["BENCH_WORKDIR"], capture_output=True, text=True, check=True
+    )
+    return out.stdout.strip().splitlines()[-1]
+
+
+async def sample_health(client, base_url, stop: asyncio.Event, interval: float):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get(f"{base_url}/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(args):
+    import httpx
+    
+    workdir = Path(tempfile.mkdtemp(prefix="webstar_bench_"))
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": str(BACKEND_DIR),
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "SECRET_KEY": secrets.token_urlsafe(48),
+        "TRANSCODE_EMBEDDED_WORKER": "false",
+        "R2_ACCOUNT_ID": "",
+        "BENCH_WORKDIR": str(workdir),
+    })
+    
+    video = workdir / "input.mov"
+    print(f"🎬 Generating {args.duration}s {args.size} test clip...")
+    make_video(video, args.duration, args.size)
+    token = prepare_database(env)
+    
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=workdir
+    )
+    try:
+        async with httpx.AsyncClient(timeout=900) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get(f"{base_url}/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            
+            # Phase 1: idle baseline
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(sample_health(client, base_url, stop, args.interval))
+            await asyncio.sleep(args.baseline)
+            stop.set()
+            idle = await sampler
+            
+            # Phase 2: N concurrent video uploads
+            async def upload():
+                with open(video, "rb") as f:
+                    r = await client.post(
+                        f"{base_url}/api/uploads/media",
+                        headers={"Authorization": f"Bearer {token}"},
+                        data={"media_type": "video"},
+                        files={"file": ("input.mov", f, "video/quicktime")},
+                    )
+                return r.status_code
+            
+            print(f"⏱  Encoding {args.videos} video(s) concurrently...")
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(sample_health(client, base_url, stop, args.interval))
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(upload() for _ in range(args.videos)))
+            encode_seconds = time.perf_counter() - started
+            stop.set()
+            loaded = await sampler
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    report = {
+        "videos": args.videos,
+        "clip_duration_s": args.duration,
+        "clip_size": args.size,
+        "upload_statuses": statuses,
+        "encode_wall_s": round(encode_seconds, 2),
+        "health_idle": summarize(idle),
+        "health_during_encode": summarize(loaded),
+    }
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print()
+        print("=" * 50)
+        print(f"Uploads: {statuses} in {encode_seconds:.1f}s")
+        for label, key in (("Idle", "health_idle"), ("Encoding", "health_during_encode")):
+            s = report[key]
+            print(
+                f"{label:>9}: n={s['samples']:<5} p50={s['p50_ms']:>8.2f}ms "
+                f"p99={s['p99_ms']:>8.2f}ms max={s['max_ms']:>8.2f}ms"
+            )
+        print("=" * 50)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure /health latency while videos encode")
+    parser.add_argument("--videos", type=int, default=4, help="Concurrent video uploads")
+    parser.add_argument("--duration", type=int, default=20, help="Test clip length in seconds")
+    parser.add_argument("--size", default="1920x1080", help="Test clip resolution")
+    parser.add_argument("--baseline", type=float, default=3.0, help="Idle sampling time in seconds")
+    parser.add_argument("--interval", type=float, default=0.02, help="Delay between /health probes")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    asyncio.run(run(parser.parse_args()))
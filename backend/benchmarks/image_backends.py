@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Image Backend Benchmark
+Compares the in-process Pillow image backend with the FFmpeg backend
+(one FFmpeg process per image) on the work a photo upload does:
+compress_image_file() and, with --variants, generate_image_variants().
+
+Fixtures are deterministic JPEG/PNG photo-like images (gradient plus
+seeded noise) at typical upload sizes. Each backend processes the same
+images from a thread pool the size of --concurrency, the way request
+handlers and transcode workers share MediaCompressionService. Reports
+images/sec and p50/p95/p99 latency per backend and fixture size.
+
+Requires FFmpeg on PATH for the ffmpeg backend.
+
+Usage:
+    python benchmarks/image_backends.py [--images N] [--concurrency N] [--variants] [--json]
+
+Examples:
+    python benchmarks/image_backends.py
+    python benchmarks/image_backends.py --sizes 640x480 --images 200 --concurrency 8
+    python benchmarks/image_backends.py --variants --format jpeg --json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production-use")
+
+from PIL import Image, ImageFilter
+
+# Fixed seed keeps the fixtures identical between runs
+NOISE_SEED = 42
+
+
+def make_image(path: Path, size: str, seed: int):
+    """Smooth gradient with grain, saved as JPEG or PNG by extension."""
+    width, height = (int(v) for v in size.split("x"))
+    rng = random.Random(seed)
+    base = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    image = Image.blend(base, noise.filter(ImageFilter.GaussianBlur(1)), 0.35)
+    if path.suffix == ".png":
+        image.save(path)
+    else:
+        image.save(path, quality=95)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def process_one(service, path: Path, preset: str, output_format: str, widths: list) -> float:
+    """Compress one image (and optionally render variants); return latency in seconds."""
+    started = time.perf_counter()
+    result = service.compress_image_file(str(path), path.name, preset, output_format)
+    if not result.success:
+        raise RuntimeError(result.error)
+    outputs = service.generate_image_variants(str(path), widths, preset, output_format) if widths else {}
+    elapsed = time.perf_counter() - started
+    
+    if result.output_path != str(path):
+        os.unlink(result.output_path)
+    for variant in outputs.values():
+        os.unlink(variant)
+    return elapsed
+
+
+def run_backend(service, backend: str, fixtures: list, args, widths: list) -> dict:
+    service.image_backend = backend
+    # Warm-up: first FFmpeg spawn and Pillow plugin imports are one-off costs
+    process_one(service, fixtures[0], args.preset, args.format, widths)
+    
+    jobs = [fixtures[i % len(fixtures)] for i in range(args.images)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(
+            lambda path: process_one(service, path, args.preset, args.format, widths), jobs
+        ))
+    wall = time.perf_counter() - started
+    
+    return {
+        "images": len(latencies),
+        "wall_s": round(wall, 3),
+        "images_per_sec": round(len(latencies) / wall, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def run(args):
+    from app.services.media_compression_service import compression_service
+    
+    backends = args.backends.split(",")
+    if "ffmpeg" in backends and not compression_service.ffmpeg_available:
+        print("❌ FFmpeg not found on PATH; run with --backends pillow")
+        sys.exit(1)
+    
+    widths = [int(w) for w in args.widths.split(",")] if args.variants else []
+    workdir = Path(tempfile.mkdtemp(prefix="webstar_image_bench_"))
+    results = []
+    
+    try:
+        for size in args.sizes.split(","):
+            # A few distinct files per size, half JPEG and half PNG like real uploads
+            fixtures = []
+            for i in range(4):
+                path = workdir / f"image_{size}_{i}{'.png' if i % 2 else '.jpg'}"
+                make_image(path, size, NOISE_SEED + i)
+                fixtures.append(path)
+            
+            for backend in backends:
+                row = {"size": size, "backend": backend, **run_backend(compression_service, backend, fixtures, args, widths)}
+                results.append(row)
+                if not args.json:
+                    print(
+                        f"🖼️  {size:<10} {backend:<7} {row['images_per_sec']:>8.2f} img/s   "
+                        f"p50 {row['p50_ms']:>8.1f}ms   p95 {row['p95_ms']:>8.1f}ms   p99 {row['p99_ms']:>8.1f}ms"
+                    )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    if not args.json and "pillow" in backends and "ffmpeg" in backends:
+        print()
+        for size in args.sizes.split(","):
+            rows = {r["backend"]: r for r in results if r["size"] == size}
+            speedup = rows["pillow"]["images_per_sec"] / rows["ffmpeg"]["images_per_sec"]
+            print(f"📊 {size:<10} pillow is {speedup:.1f}x the throughput of ffmpeg")
+    
+    if args.json:
+        print(json.dumps({
+            "preset": args.preset,
+            "format": args.format,
+            "concurrency": args.concurrency,
+            "variants": widths,
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark Pillow vs FFmpeg image backends")
+    parser.add_argument("--backends", default="pillow,ffmpeg", help="Backends to compare")
+    parser.add_argument("--sizes", default="640x480,1920x1080,4032x3024", help="Fixture sizes")
+    parser.add_argument("--images", type=int, default=50, help="Images processed per backend and size")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1, help="Worker threads")
+    parser.add_argument("--preset", default="standard", choices=["high", "standard", "low"], help="Image preset")
+    parser.add_argument("--format", default="webp", choices=["webp", "jpeg"], help="Output format")
+    parser.add_argument("--variants", action="store_true", help="Also render responsive variants per image")
+    parser.add_argument("--widths", default="320,640,1280,1920", help="Variant widths for --variants")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    run(parser.parse_args())
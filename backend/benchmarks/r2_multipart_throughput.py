@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+R2 Multipart Upload Throughput
+Uploads files of several sizes through R2Service.upload_file_path() against
+a local S3-compatible stand-in (moto server) and reports MB/s for the single
+put_object path and the parallel multipart path. --fail-rate injects part
+failures to exercise per-part retries and abort-on-error.
+
+Requires: pip install "moto[server]"
+
+Usage:
+    python benchmarks/r2_multipart_throughput.py [--sizes MB,MB,...] [--fail-rate 0.1] [--json]
+
+Examples:
+    python benchmarks/r2_multipart_throughput.py
+    python benchmarks/r2_multipart_throughput.py --sizes 5,100,1024 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production-use")
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from app.core.config import settings
+from app.services.s3_service import R2Service
+
+BUCKET = "webstar-bench"
+
+
+def make_file(directory: str, size_mb: int) -> str:
+    """Write a file of random-ish bytes in 1MB chunks."""
+    path = os.path.join(directory, f"bench_{size_mb}mb.bin")
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def build_service(endpoint: str, fail_rate: float) -> R2Service:
+    service = R2Service()
+    service.s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+        region_name="us-east-1",
+        config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+    )
+    service.bucket_name = BUCKET
+    service.public_url = endpoint
+    service.s3_client.create_bucket(Bucket=BUCKET)
+    
+    if fail_rate > 0:
+        real_upload_part = service.s3_client.upload_part
+        rng = random.Random(42)
+        
+        def flaky_upload_part(**kwargs):
+            if rng.random() < fail_rate:
+                raise ClientError({"Error": {"Code": "InternalError", "Message": "injected"}}, "UploadPart")
+            return real_upload_part(**kwargs)
+        
+        service.s3_client.upload_part = flaky_upload_part
+    return service
+
+
+def run(args):
+    from moto.server import ThreadedMotoServer
+    
+    server = ThreadedMotoServer(port=args.port, verbose=False)
+    server.start()
+    endpoint = f"http://127.0.0.1:{args.port}"
+    results = []
+    
+    try:
+        service = build_service(endpoint, args.fail_rate)
+        settings.R2_MULTIPART_CONCURRENCY = args.concurrency
+        settings.R2_MULTIPART_PART_SIZE = args.part_size * 1024 * 1024
+        
+        with tempfile.TemporaryDirectory(prefix="webstar_r2_bench_") as workdir:
+            for size_mb in [int(s) for s in args.sizes.split(",")]:
+                path = make_file(workdir, size_mb)
+                for mode, threshold in (("single", 1 << 62), ("multipart", 0)):
+                    settings.R2_MULTIPART_THRESHOLD = threshold
+                    key = f"bench/{mode}/{size_mb}mb.bin"
+                    started = time.perf_counter()
+                    url = service.upload_file_path(path, key, "application/octet-stream")
+                    elapsed = time.perf_counter() - started
+                    ok = False
+                    if url:
+                        head = service.s3_client.head_object(Bucket=BUCKET, Key=key)
+                        ok = head["ContentLength"] == size_mb * 1024 * 1024
+                    results.append({
+                        "size_mb": size_mb,
+                        "mode": mode,
+                        "ok": ok,
+                        "seconds": round(elapsed, 3),
+                        "mb_per_s": round(size_mb / elapsed, 1) if elapsed > 0 else None,
+                    })
+                    if url:
+                        service.s3_client.delete_object(Bucket=BUCKET, Key=key)
+                os.unlink(path)
+            
+            pending = service.s3_client.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+    finally:
+        server.stop()
+    
+    report = {
+        "part_size_mb": args.part_size,
+        "concurrency": args.concurrency,
+        "fail_rate": args.fail_rate,
+        "incomplete_uploads_left": len(pending),
+        "results": results,
+    }
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print("=" * 50)
+    print(f"Part size {args.part_size}MB, concurrency {args.concurrency}, fail rate {args.fail_rate}")
+    for r in results:
+        status = "✅" if r["ok"] else "❌"
+        print(f"{status} {r['size_mb']:>6}MB {r['mode']:>9}: {r['seconds']:>8.2f}s  {r['mb_per_s'] or 0:>7.1f} MB/s")
+    print(f"Incomplete multipart uploads left in bucket: {len(pending)}")
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure R2 single vs multipart upload throughput")
+    parser.add_argument("--sizes", default="5,50,200,1024", help="Comma-separated file sizes in MB")
+    parser.add_argument("--part-size", type=int, default=8, help="Multipart part size in MB")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parts in flight")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Probability of an injected part failure")
+    parser.add_argument("--port", type=int, default=5055, help="Local moto server port")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    run(parser.parse_args())
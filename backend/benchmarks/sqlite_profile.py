@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+SQLite Profile Benchmark
+Compares the default SQLite setup with the tuned single-node profile
+(SQLITE_TUNED, app/db/sqlite_tuning.py) under concurrent reads and writes
+through the async engines the request handlers use.
+
+Each profile gets its own copy of a seeded database (--users users with a
+profile and --items portfolio items each). For --seconds, --readers tasks
+run the public portfolio read (profile plus published items of a random
+user) while --writers tasks record profile views (insert a ProfileView
+and bump the profile's counter, like the profile route). Reads/sec,
+writes/sec, p50/p99 latency, failed operations ("database is locked") and
+lost counter updates (views whose increment a concurrent writer
+overwrote) are reported per profile.
+
+Usage:
+    python benchmarks/sqlite_profile.py [--seconds S] [--readers N] [--writers N] [--json]
+
+Examples:
+    python benchmarks/sqlite_profile.py
+    python benchmarks/sqlite_profile.py --readers 32 --writers 8 --seconds 20
+    python benchmarks/sqlite_profile.py --profiles tuned --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("SECRET_KEY", "benchmark-only-secret-key-not-for-production-use")
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seed(path: str, users: int, items: int):
+    from sqlmodel import Session, create_engine
+    from app.db.migrations import run_migrations
+    from app.db.models import User, Profile, PortfolioItem
+    
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    with Session(engine) as session:
+        for user_id in range(1, users + 1):
+            session.add(User(id=user_id, email=f"bench{user_id}@example.com", username=f"bench{user_id}"))
+        session.commit()
+        for user_id in range(1, users + 1):
+            session.add(Profile(user_id=user_id, display_name=f"Bench {user_id}"))
+            session.add_all(
+                PortfolioItem(
+                    user_id=user_id,
+                    content_type="photo",
+                    content_url=f"/uploads/bench/{user_id}-{order}.webp",
+                    title=f"Item {order}",
+                    is_draft=order % 10 == 0,
+                    order=order,
+                )
+                for order in range(items)
+            )
+        session.commit()
+    engine.dispose()
+
+
+def build_profile(name: str, path: str):
+    """
+    Engines of a profile as app.db.base builds them: reads go where
+    get_async_read_session sends them (async_read_engine), view tracking
+    where the profile route writes it (async_engine).
+    """
+    from app.core.config import settings
+    from app.db.base import async_database_url, make_async_engine
+    from app.db.sqlite_tuning import create_tuned_async_engines
+    
+    url = f"sqlite:///{path}"
+    if name == "default":
+        engine = make_async_engine(url)
+        return engine, engine
+    return create_tuned_async_engines(async_database_url(url), settings.SQLITE_READ_POOL_SIZE)
+
+
+async def run_profile(name: str, path: str, args) -> dict:
+    from sqlmodel import func, select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.db.models import PortfolioItem, Profile, ProfileView
+    
+    writer, reader = build_profile(name, path)
+    read_latencies, write_latencies = [], []
+    errors = {"read": 0, "write": 0}
+    deadline = 0.0
+    
+    async def read_portfolio():
+        user_id = random.randint(1, args.users)
+        async with AsyncSession(reader, expire_on_commit=False) as session:
+            await session.exec(select(Profile).where(Profile.user_id == user_id))
+            (await session.exec(
+                select(PortfolioItem)
+                .where(PortfolioItem.user_id == user_id)
+                .where(PortfolioItem.is_draft == False)
+                .order_by(PortfolioItem.order)
+            )).all()
+    
+    async def record_view():
+        user_id = random.randint(1, args.users)
+        async with AsyncSession(writer) as session:
+            profile = (await session.exec(select(Profile).where(Profile.user_id == user_id))).first()
+            profile.profile_views_count += 1
+            session.add(profile)
+            session.add(ProfileView(profile_user_id=user_id))
+            await session.commit()
+    
+    async def worker(operation, latencies, kind):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await operation()
+            except Exception:
+                errors[kind] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+    
+    # Warm-up: open pool connections
+    await asyncio.gather(*(read_portfolio() for _ in range(args.readers)), record_view())
+    
+    deadline = time.perf_counter() + args.seconds
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(worker(read_portfolio, read_latencies, "read") for _ in range(args.readers)),
+        *(worker(record_view, write_latencies, "write") for _ in range(args.writers)),
+    )
+    wall = time.perf_counter() - started
+    
+    # Views whose counter increment was overwritten by a concurrent writer
+    async with AsyncSession(reader) as session:
+        views = (await session.exec(select(func.count(ProfileView.id)))).one()
+        counted = (await session.exec(select(func.coalesce(func.sum(Profile.profile_views_count), 0)))).one()
+    await writer.dispose()
+    if reader is not writer:
+        await reader.dispose()
+    
+    return {
+        "profile": name,
+        "wall_s": round(wall, 3),
+        "reads": len(read_latencies),
+        "reads_per_sec": round(len(read_latencies) / wall, 1),
+        "read_p50_ms": round(statistics.median(read_latencies) * 1000, 1) if read_latencies else 0.0,
+        "read_p99_ms": round(percentile(read_latencies, 99) * 1000, 1),
+        "writes": len(write_latencies),
+        "writes_per_sec": round(len(write_latencies) / wall, 1),
+        "write_p50_ms": round(statistics.median(write_latencies) * 1000, 1) if write_latencies else 0.0,
+        "write_p99_ms": round(percentile(write_latencies, 99) * 1000, 1),
+        "read_errors": errors["read"],
+        "write_errors": errors["write"],
+        "lost_updates": views - counted,
+    }
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="webstar_sqlite_bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/app.db"
+    seeded = os.path.join(workdir, "seed.db")
+    seed(seeded, args.users, args.items)
+    
+    async def main():
+        results = []
+        for name in args.profiles.split(","):
+            path = os.path.join(workdir, f"{name}.db")
+            shutil.copyfile(seeded, path)
+            results.append(await run_profile(name, path, args))
+        return results
+    
+    try:
+        results = asyncio.run(main())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    if args.json:
+        print(json.dumps({
+            "seconds": args.seconds,
+            "readers": args.readers,
+            "writers": args.writers,
+            "users": args.users,
+            "items_per_user": args.items,
+            "results": results,
+        }, indent=2))
+        return
+    
+    for row in results:
+        print(
+            f"🗄️  {row['profile']:<8} reads {row['reads_per_sec']:>8.1f}/s "
+            f"(p50 {row['read_p50_ms']:>6.1f}ms, p99 {row['read_p99_ms']:>7.1f}ms)   "
+            f"writes {row['writes_per_sec']:>7.1f}/s "
+            f"(p50 {row['write_p50_ms']:>6.1f}ms, p99 {row['write_p99_ms']:>7.1f}ms)   "
+            f"errors {row['read_errors'] + row['write_errors']}   lost updates {row['lost_updates']}"
+        )
+    rows = {row["profile"]: row for row in results}
+    if "default" in rows and "tuned" in rows and rows["default"]["reads_per_sec"] and rows["default"]["writes_per_sec"]:
+        print(
+            f"\n📊 tuned: {rows['tuned']['reads_per_sec'] / rows['default']['reads_per_sec']:.2f}x reads/sec, "
+            f"{rows['tuned']['writes_per_sec'] / rows['default']['writes_per_sec']:.2f}x writes/sec "
+            f"({args.readers} readers, {args.writers} writers, {args.seconds:g}s)"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the default vs tuned SQLite profile under concurrent load")
+    parser.add_argument("--profiles", default="default,tuned", help="Profiles to compare")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Load duration per profile")
+    parser.add_argument("--readers", type=int, default=16, help="Concurrent reader tasks")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent writer tasks")
+    parser.add_argument("--users", type=int, default=200, help="Seeded users")
+    parser.add_argument("--items", type=int, default=20, help="Portfolio items per seeded user")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    run(parser.parse_args())
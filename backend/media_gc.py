@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Media Garbage Collector
+Deletes stored media (R2 bucket and the local uploads/ directory) that no
+profile, portfolio item, project, pending transcode job or recent upload
+refers to any more, e.g. replaced profile pictures and files of deleted
+portfolio items. Objects younger than MEDIA_GC_GRACE_HOURS are kept.
+
+Run it periodically (e.g. a daily cron job) against the production
+database. Start with --dry-run to see what would be deleted.
+
+Usage:
+    python media_gc.py [--dry-run] [--storage all|r2|local] [--grace-hours N] [--json]
+
+Examples:
+    python media_gc.py --dry-run
+    python media_gc.py --storage r2 --grace-hours 168
+    python media_gc.py --json
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.config import settings
+from app.db.base import create_db_and_tables
+from app.services.media_gc import collect_orphaned_media, available_storages, STORAGE_R2, STORAGE_LOCAL
+
+
+def print_progress(stats):
+    print(
+        f"   {stats.storage}: scanned {stats.scanned_objects} ({stats.scanned_bytes/1024/1024:.1f}MB), "
+        f"orphaned {stats.orphaned_objects}, deleted {stats.deleted_objects}",
+        flush=True
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Delete stored media no database row refers to")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    parser.add_argument("--storage", default="all", choices=["all", STORAGE_R2, STORAGE_LOCAL], help="Backend to sweep")
+    parser.add_argument("--grace-hours", type=float, default=settings.MEDIA_GC_GRACE_HOURS,
+                        help="Keep unreferenced objects younger than this")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.WARNING if args.json else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    
+    storages = available_storages() if args.storage == "all" else [args.storage]
+    create_db_and_tables()
+    if not args.json:
+        mode = "dry run" if args.dry_run else "deleting"
+        print(f"🧹 Media GC ({mode}) on {', '.join(storages) or 'no storage'}, grace period {args.grace_hours:g}h")
+    
+    results = collect_orphaned_media(
+        storages=storages,
+        dry_run=args.dry_run,
+        grace_hours=args.grace_hours,
+        progress=None if args.json else print_progress
+    )
+    
+    if args.json:
+        print(json.dumps([stats.as_dict() for stats in results], indent=2))
+    else:
+        for stats in results:
+            verb = "Would delete" if args.dry_run else "Deleted"
+            count = stats.orphaned_objects if args.dry_run else stats.deleted_objects
+            size = stats.orphaned_bytes if args.dry_run else stats.deleted_bytes
+            print(
+                f"✅ {stats.storage}: {verb} {count} objects ({size/1024/1024:.1f}MB) of {stats.scanned_objects} "
+                f"in {stats.seconds:.1f}s; {stats.kept_recent} unreferenced kept inside grace period, "
+                f"{stats.stale_asset_rows} stale dedup records"
+            )
+            if stats.failed_deletes:
+                print(f"❌ {stats.storage}: {stats.failed_deletes} deletes failed (see log)")
@@ -0,0 +1,48 @@
+"""Test settings: a throwaway SQLite database, set before the app is imported.
+
+Run from backend/: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_tmp = tempfile.mkdtemp(prefix="webstar-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-for-webstar-tests-0123456789")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient signed in as a fresh user."""
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+    
+    from app.core.security import create_access_token
+    from app.db.base import engine
+    from app.db.models import User
+    from app.main import app
+    
+    with TestClient(app) as test_client:
+        with Session(engine) as session:
+            user = User(email="tester@example.com", username="tester", hashed_password="x")
+            session.add(user)
+            session.commit()
+            session.refresh(user)
+            token = create_access_token({"sub": str(user.id)})
+        test_client.headers["Authorization"] = f"Bearer {token}"
+        yield test_client
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Store local uploads under tmp_path instead of backend/uploads."""
+    from app.routers import uploads
+    from app.services import media_pipeline
+    
+    monkeypatch.setattr(media_pipeline, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", tmp_path)
+    return tmp_path
@@ -0,0 +1,42 @@
+"""iOS voice recordings (CoreAudio .caf) are accepted as audio uploads.
+
+libmagic reports CAF as application/octet-stream, so without an explicit
+signature every sniffing step (upload guard, spool, upload sessions)
+rejected these files with 400.
+"""
+import struct
+
+from app.services.file_validation import file_validator
+
+
+def caf_recording(seconds: float = 0.1, sample_rate: float = 44100.0) -> bytes:
+    """Minimal 16-bit mono linear PCM CAF file, as iOS writes voice memos."""
+    frames = int(seconds * sample_rate)
+    desc = struct.pack(">dIIIIII", sample_rate, int.from_bytes(b"lpcm", "big"), 0x2, 2, 1, 1, 16)
+    audio = b"\x00\x00\x00\x00" + b"\x00\x01" * frames  # edit count, then samples
+    return (
+        b"caff" + struct.pack(">HH", 1, 0)
+        + b"desc" + struct.pack(">q", len(desc)) + desc
+        + b"data" + struct.pack(">q", len(audio)) + audio
+    )
+
+
+def test_caf_header_sniffs_as_audio():
+    is_valid, mime, error = file_validator.sniff_media_type(caf_recording()[:8192], "audio")
+    assert is_valid, error
+    assert mime == "audio/x-caf"
+
+
+def test_caf_is_not_accepted_as_other_media():
+    is_valid, _, _ = file_validator.sniff_media_type(caf_recording()[:8192], "video")
+    assert not is_valid
+
+
+def test_upload_caf_recording(client, upload_dir):
+    response = client.post(
+        "/api/uploads/media",
+        data={"media_type": "audio", "compress": "false"},
+        files={"file": ("voice-memo.caf", caf_recording(), "audio/x-caf")},
+    )
+    assert response.status_code == 200, response.text
+    assert list(upload_dir.rglob("*.caf"))
@@ -0,0 +1,54 @@
+"""Small photos are only stored as uploaded when they carry no metadata.
+
+Phone photos embed the camera and GPS position in EXIF; storing such an
+image as-is would publish where it was taken.
+"""
+import os
+
+import pytest
+from PIL import Image
+
+from app.services import image_codec
+from app.services.media_compression_service import (
+    PLAN_SKIP, PLAN_TRANSCODE, compression_service
+)
+
+GPS_IFD = 0x8825
+
+
+def small_jpeg(path, gps: bool = False) -> str:
+    img = Image.new("RGB", (64, 48), (200, 120, 40))
+    exif = Image.Exif()
+    if gps:
+        exif[0x010F] = "PhoneMaker"  # Make
+        exif[GPS_IFD] = {1: "N", 2: (48.0, 51.0, 29.0), 3: "E", 4: (2.0, 17.0, 40.0)}
+    img.save(path, "JPEG", exif=exif)
+    return path
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    return tmp_path
+
+
+def test_clean_small_image_is_stored_as_is(workdir):
+    path = small_jpeg(str(workdir / "clean.jpg"))
+    assert not image_codec.has_metadata(path)
+    assert compression_service.plan_processing(path, "photo").action == PLAN_SKIP
+
+
+def test_small_image_with_gps_is_reencoded_without_it(workdir):
+    path = small_jpeg(str(workdir / "gps.jpg"), gps=True)
+    assert image_codec.has_metadata(path)
+    
+    plan = compression_service.plan_processing(path, "photo")
+    assert plan.action == PLAN_TRANSCODE
+    
+    result = compression_service.compress_image_file(path, "gps.jpg")
+    assert result.success, result.error
+    try:
+        assert result.output_path != path
+        assert not image_codec.has_metadata(result.output_path)
+    finally:
+        if result.output_path != path and os.path.exists(result.output_path):
+            os.unlink(result.output_path)
@@ -0,0 +1,14 @@
+"""Every SELECT behind the hot routes is served by an index (see app/db/query_plans.py)."""
+from app.db.base import engine
+from app.db.query_plans import HOT_ROUTES, check_query_plans
+
+
+def test_hot_routes_use_indexes(client, monkeypatch):
+    monkeypatch.delitem(client.headers, "Authorization")  # Anonymous routes must stay anonymous
+    results = check_query_plans(client, engine)
+    assert {result.route.split(" as ")[0] for result in results} == {
+        f"{route.method} {route.path}" for route in HOT_ROUTES
+    }
+    assert [
+        (result.route, result.full_scans, result.statement) for result in results if not result.ok
+    ] == []
@@ -0,0 +1,21 @@
+"""Per-route stats are keyed by the full route template, never the raw path."""
+from app.core.query_stats import query_stats
+from app.core.route_labels import UNMATCHED, prometheus_label
+
+
+def test_route_keeps_router_prefix_and_drops_ids(client):
+    client.get("/api/projects/user/someone")
+    client.get("/api/projects/user/someone-else")
+    assert "/api/projects/user/{username}" in query_stats.routes
+    assert not any("someone" in route for route in query_stats.routes)
+
+
+def test_unmatched_paths_share_one_label(client):
+    for path in ("/wp-login.php", "/.env", "/api/nope/123"):
+        assert client.get(path).status_code == 404
+    assert UNMATCHED in query_stats.routes
+    assert not any(route in query_stats.routes for route in ("/wp-login.php", "/.env", "/api/nope/123"))
+
+
+def test_prometheus_label_escapes_quotes_backslashes_and_newlines():
+    assert prometheus_label('/a"b\\c\nd') == '/a\\"b\\\\c\\nd'
@@ -0,0 +1,78 @@
+"""The upload guard checks the file against its media_type whatever the field order.
+
+Browsers send FormData fields in append order, and the frontend appends
+the file before media_type, so the guard often sees the file first.
+"""
+import mimetypes
+import uuid
+
+from app.core.upload_guard import UploadRule, _MultipartInspector
+
+PDF = b"%PDF-1.4\n1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n" + b"%" * 200 + b"\n%%EOF\n"
+MP4 = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom" + b"\x00" * 5000
+
+
+def multipart(parts):
+    """(boundary, body) for [(name, value, filename or None)] in the given order."""
+    boundary = uuid.uuid4().hex
+    body = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        body += f"--{boundary}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if filename:
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            body += f"Content-Type: {content_type}\r\n".encode()
+        body += b"\r\n" + value + b"\r\n"
+    body += f"--{boundary}--\r\n".encode()
+    return boundary, body
+
+
+def post_file_first(client, media_type, filename, content):
+    boundary, body = multipart([
+        ("file", content, filename),
+        ("media_type", media_type.encode(), None),
+        ("compress", b"false", None),
+    ])
+    return client.post(
+        "/api/uploads/media",
+        content=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+
+
+def inspect(rule, parts, chunk_size=1024):
+    boundary, body = multipart(parts)
+    inspector = _MultipartInspector(rule)
+    inspector.start(boundary.encode())
+    for offset in range(0, len(body), chunk_size):
+        inspector.feed(body[offset:offset + chunk_size])
+    return inspector
+
+
+def test_pdf_sent_before_media_type_is_accepted(client, upload_dir):
+    response = post_file_first(client, "pdf", "cv.pdf", PDF)
+    assert response.status_code == 200, response.text
+
+
+def test_file_sent_before_media_type_is_sniffed_against_it(client, upload_dir):
+    response = post_file_first(client, "photo", "cv.jpg", PDF)
+    assert response.status_code == 400, response.text
+
+
+def test_size_limit_waits_for_media_type():
+    rule = UploadRule(limits={"photo": 1000, "video": 10000})
+    assert inspect(rule, [("file", MP4, "clip.mp4"), ("media_type", b"video", None)]).error is None
+    
+    inspector = inspect(rule, [("file", MP4, "clip.mp4"), ("media_type", b"photo", None)])
+    assert inspector.error and inspector.error[0] == 413
+    
+    inspector = inspect(rule, [("file", MP4 * 3, "clip.mp4"), ("media_type", b"video", None)])
+    assert inspector.error and inspector.error[0] == 413
+
+
+def test_form_without_media_type_uses_default():
+    rule = UploadRule(limits={"photo": 100000, "pdf": 100000})
+    inspector = inspect(rule, [("file", PDF, "cv.pdf")])
+    assert inspector.error and inspector.error[0] == 400
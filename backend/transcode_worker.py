@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Transcode Worker
+Drains the database-backed transcode queue used by async media uploads.
+
+Run this as a separate process (and set TRANSCODE_EMBEDDED_WORKER=false on
+the API) to keep FFmpeg off the web workers. It must see the same
+TRANSCODE_SPOOL_DIR as the API. Jobs left behind by a crashed or restarted
+worker are picked up again automatically. Queued account deletions run here
+too.
+
+Usage:
+    python transcode_worker.py [concurrency]
+
+Examples:
+    python transcode_worker.py
+    python transcode_worker.py 4
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.config import settings
+from app.db.base import create_db_and_tables
+from app.services.transcode_queue import transcode_worker_pool
+from app.services.account_deletion import account_deletion_worker
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else settings.TRANSCODE_WORKER_CONCURRENCY
+    
+    create_db_and_tables()
+    print(f"🎬 Transcode worker starting with {concurrency} worker(s)")
+    print(f"   Spool directory: {settings.TRANSCODE_SPOOL_DIR}")
+    
+    transcode_worker_pool.start(concurrency)
+    account_deletion_worker.start()
+    try:
+        transcode_worker_pool.wait()
+    except KeyboardInterrupt:
+        print("\nStopping transcode worker (waiting for in-flight jobs)...")
+        transcode_worker_pool.stop()
+        account_deletion_worker.stop()